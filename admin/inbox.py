@@ -0,0 +1,59 @@
+from sqlalchemy import func
+from models import db, ContactInquiry
+
+# ==============================================================================
+# ADMIN INBOX QUERIES (Contact form inquiries)
+# ==============================================================================
+# Everything here walks ix_contact_inquiry_status_id (status, id) or the
+# primary key, newest first by id - so the first page, the "new since" delta
+# and the unread badge cost the same with 50 or 50k historical inquiries.
+INBOX_PAGE_SIZE = 50
+MAX_INBOX_PAGE_SIZE = 200
+
+# Filter name -> stored status values ('Pending' is the contact form default)
+INBOX_FILTERS = {
+    'new': ['Pending', 'New'],
+    'in-progress': ['In Progress'],
+    'resolved': ['Resolved'],
+}
+
+def filtered_inquiries(status_filter=None):
+    query = ContactInquiry.query
+    statuses = INBOX_FILTERS.get(status_filter)
+    if statuses:
+        query = query.filter(ContactInquiry.status.in_(statuses))
+    return query
+
+# --- 1. Keyset pages (older inquiries on "Load older") ---
+def query_inbox(status_filter=None, before_id=None, limit=INBOX_PAGE_SIZE):
+    query = filtered_inquiries(status_filter)
+    if before_id:
+        query = query.filter(ContactInquiry.id < before_id)
+
+    rows = query.order_by(ContactInquiry.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+# --- 2. Delta (inquiries that arrived after the newest one on screen) ---
+def inquiries_since(since_id, up_to_id, status_filter=None, limit=MAX_INBOX_PAGE_SIZE):
+    # Oldest first so a burst bigger than one batch is finished on the next poll
+    rows = filtered_inquiries(status_filter)\
+        .filter(ContactInquiry.id > since_id, ContactInquiry.id <= up_to_id)\
+        .order_by(ContactInquiry.id.asc())\
+        .limit(limit).all()
+    new_cursor = rows[-1].id if len(rows) == limit else up_to_id
+    return rows[::-1], max(new_cursor, since_id)
+
+def latest_inquiry_id():
+    # MAX on the primary key is a single index seek
+    return db.session.query(func.max(ContactInquiry.id)).scalar() or 0
+
+# --- 3. Badge counts ---
+def inbox_counts(last_seen_id):
+    by_status = dict(db.session.query(ContactInquiry.status, func.count(ContactInquiry.id))
+                     .group_by(ContactInquiry.status).all())
+    counts = {name: sum(by_status.get(s, 0) for s in statuses) for name, statuses in INBOX_FILTERS.items()}
+    counts['all'] = sum(by_status.values())
+    counts['unread'] = db.session.query(func.count(ContactInquiry.id))\
+        .filter(ContactInquiry.id > last_seen_id).scalar()
+    return counts
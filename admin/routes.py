@@ -1,45 +1,38 @@
-from flask import Blueprint, render_template, redirect, url_for, request, session, flash, jsonify
-from models import db, ContactInquiry, Product, StockAlert  # Added StockAlert
+import io
+import csv
+from flask import Blueprint, render_template, redirect, url_for, request, session, flash, jsonify, Response, stream_template
+from models import db, ContactInquiry, Product, StockAlert, GroupLeader, CommissionPeriod, get_sg_time  # Added StockAlert
 from sqlalchemy import func
 from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 import pytz
 
-# Import the broadcast helper from your whatsapp app file
-# Ensure the folder structure allows this import (whatspp.app)
-try:
-    from whatsapp.app import send_whatsapp_message
-except ImportError:
-    # Fallback if the folder is named differently or in a different path
-    def send_whatsapp_message(to, msg): 
-        print(f"Broadcast Helper not found. Would have sent to {to}: {msg}")
-        return False
+# Grouped restock fan-out (one WhatsApp message per waiting customer)
+from whatsapp.alerts import notify_restocked
+from analytics import reports as demand_reports
+from products.velocity import stock_signals
+from leader import commission
+from orders import picklists
+from querystats import query_budget, endpoint_stats
+from whatsapp import outbox
+from retention.archive import order_history
+from snapshot.backup import report_source, report_connection
+from orders.lifecycle import CANCELLED
+from admin.search import search, SEARCH_SCOPES, SEARCH_PAGE_SIZE
+from admin.inbox import query_inbox, inquiries_since, latest_inquiry_id, inbox_counts, MAX_INBOX_PAGE_SIZE, INBOX_PAGE_SIZE
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/admin/dashboard')
+@query_budget(14)
 def dashboard():
-    # --- INQUIRY LOGIC (SQLite) ---
-    max_id_query = db.session.query(func.max(ContactInquiry.id)).scalar()
-    current_real_max_id = int(max_id_query) if max_id_query else 0
-    
-    if 'visible_threshold_id' not in session:
-        session['visible_threshold_id'] = current_real_max_id
-        session['last_seen_id'] = current_real_max_id
-
-    is_explicit_refresh = request.args.get('refresh') == 'true'
+    # --- INQUIRY LOGIC (first page only; newer rows arrive via the delta API) ---
+    if 'last_seen_id' not in session:
+        session['last_seen_id'] = latest_inquiry_id()
+    last_seen_id = int(session['last_seen_id'])
 
-    if is_explicit_refresh:
-        session['last_seen_id'] = int(session['visible_threshold_id'])
-        session['visible_threshold_id'] = current_real_max_id
-    
-    visible_threshold = int(session['visible_threshold_id'])
-    inquiries = ContactInquiry.query\
-        .filter(ContactInquiry.id <= visible_threshold)\
-        .order_by(ContactInquiry.created_at.desc())\
-        .all()
-
-    last_seen_id = int(session.get('last_seen_id', 0))
+    status_filter = request.args.get('status', 'all')
+    inquiries, next_cursor = query_inbox(status_filter)
 
     # --- PRODUCT LOGIC ---
     products = Product.query.order_by(Product.id.desc()).all()
@@ -47,7 +40,17 @@ def dashboard():
     return render_template('admin.html', 
                             inquiries=inquiries, 
                             products=products, 
-                            last_seen_id=last_seen_id)
+                            last_seen_id=last_seen_id,
+                            next_cursor=next_cursor,
+                            status_filter=status_filter,
+                            inbox_counts=inbox_counts(last_seen_id),
+                            latest_inquiry_id=latest_inquiry_id(),
+                            product_forecasts=demand_reports.forecasts('product', limit=20),
+                            leader_forecasts=demand_reports.forecasts('leader', limit=10),
+                            analytics_updated=demand_reports.last_computed_at(),
+                            low_stock=stock_signals(at_risk_only=True),
+                            commission_payable=commission.total_payable(),
+                            report_snapshot_at=report_source()[1])
 
 # 1. LIVE SYNC API ROUTE
 @admin_bp.route('/admin/api/products')
@@ -59,6 +62,13 @@ def get_products_api():
         'status': p.status
     } for p in products])
 
+# 1b. STOCK VELOCITY API (Time-to-stockout + harvest suggestions for the farm)
+@admin_bp.route('/admin/api/stock-signals')
+@query_budget(2)
+def stock_signals_api():
+    at_risk_only = request.args.get('at_risk') == '1'
+    return jsonify(stock_signals(at_risk_only=at_risk_only))
+
 # 2. ADD PRODUCT
 @admin_bp.route("/admin/products/add", methods=['POST'])
 def add_product():
@@ -115,31 +125,14 @@ def edit_product(id):
         else:
             product.status = new_status
 
-        # 3. BROADCAST LOGIC: Notify waiting customers if item is now back in stock
-        if product.status == "In Stock" and old_status == "Out of Stock":
-            # Find all pending alerts for this product
-            pending_alerts = StockAlert.query.filter_by(
-                product_name=product.name, 
-                is_notified=False
-            ).all()
-            
-            for alert in pending_alerts:
-                restock_msg = (
-                    f"🌿 *Good News from Leaf Plant!*\n\n"
-                    f"*{product.name}* is now back in stock! We have {product.available_qty} units available.\n\n"
-                    f"Reply to this message if you'd like to place an order now! ✨"
-                )
-                
-                # Send the WhatsApp message
-                if send_whatsapp_message(alert.customer_phone, restock_msg):
-                    alert.is_notified = True
-                    alert.notified_at = datetime.now(pytz.timezone('Asia/Singapore'))
-            
-            print(f"📢 BROADCAST: Notified {len(pending_alerts)} customers waiting for {product.name}")
-
         flag_modified(product, "status")
         db.session.commit()
         print(f"✅ DB Updated ID {id}: {product.name} is now {product.status}")
+
+        # 3. BROADCAST LOGIC: Notify waiting customers if item is now back in stock
+        if product.status == "In Stock" and old_status == "Out of Stock":
+            result = notify_restocked([product.name])
+            print(f"📢 BROADCAST: Notified {result['customers']} customers waiting for {product.name}")
         
     except Exception as e:
         db.session.rollback()
@@ -172,7 +165,7 @@ def delete_inquiry(id):
         db.session.rollback()
         print(f"❌ Error: {e}")
         
-    return redirect(url_for('admin.dashboard') + '?refresh=true&tab=customer-service')
+    return redirect(url_for('admin.dashboard') + '?tab=customer-service')
 
 @admin_bp.route('/admin/update_status/<int:id>', methods=['POST'])
 def update_status(id):
@@ -187,4 +180,235 @@ def update_status(id):
             db.session.rollback()
             print(f"❌ Error updating status: {e}")
             
-    return redirect(url_for('admin.dashboard') + '?refresh=true&tab=customer-service')
\ No newline at end of file
+    return redirect(url_for('admin.dashboard') + '?tab=customer-service')
+
+# 6. INQUIRY INBOX API (Keyset pages + "new since" delta for polling)
+def render_inquiry_rows(inquiries):
+    return render_template('_inquiry_rows.html', inquiries=inquiries,
+                           last_seen_id=int(session.get('last_seen_id', 0)))
+
+@admin_bp.route('/admin/api/inquiries')
+@query_budget(2)
+def inquiries_api():
+    status_filter = request.args.get('status', 'all')
+    before_id = request.args.get('before', type=int)
+    limit = min(max(request.args.get('limit', INBOX_PAGE_SIZE, type=int), 1), MAX_INBOX_PAGE_SIZE)
+
+    inquiries, next_cursor = query_inbox(status_filter, before_id, limit)
+    return jsonify({
+        'html': render_inquiry_rows(inquiries),
+        'ids': [i.id for i in inquiries],
+        'next_cursor': next_cursor
+    })
+
+@admin_bp.route('/admin/api/inquiries/since')
+def inquiries_since_api():
+    since_id = request.args.get('since_id', 0, type=int)
+    status_filter = request.args.get('status', 'all')
+
+    # Read the ceiling first so a row inserted mid-request is picked up next poll
+    inquiries, latest_id = inquiries_since(since_id, latest_inquiry_id(), status_filter)
+    return jsonify({
+        'html': render_inquiry_rows(inquiries),
+        'ids': [i.id for i in inquiries],
+        'count': len(inquiries),
+        'latest_id': latest_id,
+        'counts': inbox_counts(int(session.get('last_seen_id', 0)))
+    })
+
+@admin_bp.route('/admin/api/inquiries/mark-seen', methods=['POST'])
+def mark_inquiries_seen():
+    seen_up_to = min(request.form.get('latest_id', 0, type=int), latest_inquiry_id())
+    session['last_seen_id'] = max(int(session.get('last_seen_id', 0)), seen_up_to)
+    return jsonify({'counts': inbox_counts(session['last_seen_id'])})
+
+# 7. DEMAND ANALYTICS (Reads the materialized demand_* tables only)
+@admin_bp.route('/admin/analytics/harvest-plan')
+def harvest_plan_csv():
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Product', 'Forecast Day', 'Forecast Qty', 'On Hand', 'Harvest Qty'])
+    plan = demand_reports.harvest_plan()
+    for row in plan:
+        writer.writerow([row['product'], row['forecast_day'], row['forecast_qty'], row['on_hand'], row['harvest_qty']])
+
+    forecast_day = plan[0]['forecast_day'] if plan else 'pending'
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-disposition": f"attachment; filename=harvest_plan_{forecast_day}.csv"}
+    )
+
+@admin_bp.route('/admin/api/analytics/curve')
+def demand_curve_api():
+    scope = request.args.get('scope', 'product')
+    key = request.args.get('key', '')
+    return jsonify({
+        'scope': scope,
+        'key': key,
+        'points': [{'day': p.day, 'qty': p.qty, 'sales': p.sales, 'rolling_7d': p.rolling_7d}
+                   for p in demand_reports.demand_curve(scope, key)],
+        'seasonality': demand_reports.seasonality(scope, key)
+    })
+
+# 8. COMMISSION LEDGER (Balances are read as-is; nothing re-sums orders)
+def balance_json(balance, names):
+    return {
+        'leader_id': balance.leader_id,
+        'leader_name': names.get(balance.leader_id, f"Leader #{balance.leader_id}"),
+        'open_sales': round(balance.open_sales, 2),
+        'open_amount': round(balance.open_amount, 2),
+        'unpaid_amount': round(balance.unpaid_amount, 2),
+        'paid_amount': round(balance.paid_amount, 2),
+        'lifetime_sales': round(balance.lifetime_sales, 2),
+        'lifetime_amount': round(balance.lifetime_amount, 2),
+        'order_count': balance.order_count
+    }
+
+@admin_bp.route('/admin/api/commissions')
+@query_budget(3)
+def commissions_api():
+    names = dict(db.session.query(GroupLeader.id, GroupLeader.name).all())
+    return jsonify([balance_json(b, names) for b in commission.all_balances()])
+
+@admin_bp.route('/admin/api/commission-rates', methods=['POST'])
+def set_commission_rate():
+    rate = request.form.get('rate', type=float)
+    if rate is None or not 0 <= rate <= 1:
+        return jsonify({'error': 'rate must be between 0 and 1'}), 400
+    row = commission.set_commission_rate(
+        rate,
+        leader_id=request.form.get('leader_id', type=int),
+        product_name=request.form.get('product_name') or None
+    )
+    return jsonify({'leader_id': row.leader_id, 'product_name': row.product_name, 'rate': row.rate})
+
+@admin_bp.route('/admin/commissions/<int:leader_id>/close', methods=['POST'])
+def close_commission_period(leader_id):
+    period = commission.close_period(leader_id)
+    if period is None:
+        return jsonify({'closed': False, 'reason': 'nothing to close'})
+    return jsonify({'closed': True, 'period_id': period.id, 'amount': round(period.amount, 2),
+                    'entries': period.entry_count})
+
+@admin_bp.route('/admin/commissions/periods/<int:period_id>/paid', methods=['POST'])
+def pay_commission_period(period_id):
+    period = commission.mark_period_paid(period_id)
+    if period is None:
+        return jsonify({'error': 'period not found'}), 404
+    return jsonify({'period_id': period.id, 'status': period.status, 'amount': round(period.amount, 2)})
+
+@admin_bp.route('/admin/commissions/payout-report')
+def commission_payout_report():
+    # One row per closed, unpaid period - what finance needs to transfer
+    names = dict(db.session.query(GroupLeader.id, GroupLeader.name).all())
+    periods = CommissionPeriod.query.filter_by(status='Closed').order_by(CommissionPeriod.closed_at.asc()).all()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Period', 'Leader', 'Closed At', 'Sales', 'Commission', 'Entries'])
+    for p in periods:
+        writer.writerow([p.id, names.get(p.leader_id, p.leader_id), p.closed_at.strftime('%Y-%m-%d %H:%M'),
+                         f"{p.sales_amount:.2f}", f"{p.amount:.2f}", p.entry_count])
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-disposition": "attachment; filename=commission_payouts.csv"}
+    )
+
+@admin_bp.route('/admin/reports/monthly-sales')
+@query_budget(1)
+def monthly_sales_report():
+    # All-time monthly totals: order_history includes orders moved to the archive.
+    # Reads the reporting snapshot when it's fresh (?source=live for up-to-the-minute)
+    source, taken_at = report_source(request.args.get('source'))
+    month = db.func.substr(order_history.c.timestamp, 1, 7).label('month')
+    query = db.select(
+        month,
+        order_history.c.product_name,
+        db.func.count(order_history.c.id),
+        db.func.sum(order_history.c.quantity),
+        db.func.sum(order_history.c.total_price)
+    ).where(db.or_(order_history.c.order_status.is_(None), order_history.c.order_status != CANCELLED))\
+     .group_by(month, order_history.c.product_name)\
+     .order_by(db.desc('month'), order_history.c.product_name)
+    with report_connection(source) as conn:
+        rows = conn.execute(query).all()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Month', 'Product', 'Orders', 'Quantity', 'Sales'])
+    for month, product, orders, qty, sales in rows:
+        writer.writerow([month, product, orders, qty or 0, f"{sales or 0:.2f}"])
+    as_of = taken_at or get_sg_time().replace(tzinfo=None)
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-disposition": f"attachment; filename=monthly_sales_{as_of:%Y-%m-%d_%H%M}.csv",
+                 "X-Report-Source": source,
+                 "X-Data-As-Of": as_of.isoformat(timespec='seconds')}
+    )
+
+# 9. PICK LISTS (Harvest-day packing, cached per day until its orders change)
+def pick_list_response(batch, fmt, filename):
+    if fmt == 'csv':
+        return Response(picklists.iter_csv(batch), mimetype="text/csv",
+                        headers={"Content-disposition": f"attachment; filename={filename}.csv"})
+    if fmt == 'xlsx':
+        try:
+            workbook = picklists.xlsx_bytes(batch)
+        except ImportError:
+            return jsonify({'error': 'XLSX export needs openpyxl (pip install openpyxl)'}), 501
+        return Response(workbook,
+                        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        headers={"Content-disposition": f"attachment; filename={filename}.xlsx"})
+    return Response(stream_template('pick_list.html', batch=batch), mimetype="text/html")
+
+@admin_bp.route('/admin/pick-list')
+@query_budget(3)
+def pick_list():
+    try:
+        day = datetime.strptime(request.args['day'], '%Y-%m-%d').date() if request.args.get('day') else None
+    except ValueError:
+        return jsonify({'error': 'day must be YYYY-MM-DD'}), 400
+    fmt = request.args.get('format', 'html')
+    if fmt not in ('html', 'csv', 'xlsx'):
+        return jsonify({'error': 'format must be html, csv or xlsx'}), 400
+
+    batch = picklists.select_leader(picklists.get_batch(day), request.args.get('leader_id', type=int))
+    return pick_list_response(batch, fmt, f"pick_list_{batch['day']}")
+
+# 10. QUERY STATS (Per-endpoint SQL counts/time since this worker started)
+@admin_bp.route('/admin/api/query-stats')
+def query_stats_api():
+    return jsonify(endpoint_stats())
+
+# 11. OUTBOX (Delivery backlog + dead letters; requeue after fixing the cause)
+@admin_bp.route('/admin/api/outbox')
+@query_budget(2)
+def outbox_api():
+    return jsonify({
+        'counts': outbox.outbox_counts(),
+        'dead': [{'id': m.id, 'to_phone': m.to_phone, 'kind': m.kind, 'attempts': m.attempts,
+                  'last_error': m.last_error, 'created_at': m.created_at.isoformat() if m.created_at else None}
+                 for m in outbox.dead_letters()],
+    })
+
+@admin_bp.route('/admin/outbox/<int:message_id>/retry', methods=['POST'])
+def retry_outbox_message(message_id):
+    if not outbox.requeue(message_id):
+        return jsonify({'error': 'dead message not found'}), 404
+    return jsonify({'status': 'queued', 'id': message_id})
+
+# 12. SEARCH (Ranked full-text search over inquiries, customers and orders)
+@admin_bp.route('/admin/api/search')
+@query_budget(3)
+def search_api():
+    q = request.args.get('q', '')
+    scope = request.args.get('scope', 'all')
+    if scope != 'all' and scope not in SEARCH_SCOPES:
+        return jsonify({'error': f"scope must be all, {', '.join(SEARCH_SCOPES)}"}), 400
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', SEARCH_PAGE_SIZE, type=int)
+    scopes = SEARCH_SCOPES if scope == 'all' else (scope,)
+    return jsonify({'q': q, 'page': page, 'results': {name: search(name, q, page, per_page) for name in scopes}})
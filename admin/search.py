@@ -0,0 +1,132 @@
+import re
+import html
+from sqlalchemy import text
+from models import db
+
+# ==============================================================================
+# ADMIN SEARCH (FTS5 over inquiries, customers and orders)
+# ==============================================================================
+# The *_fts tables and their sync triggers are created in migrations.py
+# (step 9). All words must match; the last one is a prefix, as it may still
+# be being typed ("kai la" -> "kai" "la"*). Earlier words are exact: FTS5 reads
+# an exact word's list lazily but merges a prefix's whole list up front.
+# - Inquiries and customers are ranked with bm25 (a hit in the name outweighs
+#   one in a long message), over the newest RANK_WINDOW matches only: bm25
+#   costs time per match, and a word found in 100k old inquiries should not
+#   make the search slow. The window's lowest rowid is a seek in the index.
+# - Orders only index the product name, where every hit ranks the same, so
+#   they come newest first straight off the index.
+# Each scope is one statement: rank/limit in the index first, then join the
+# page's rows. Pages are offsets capped at MAX_SEARCH_OFFSET.
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_OFFSET = 1000
+RANK_WINDOW = 2000
+MAX_TERMS = 8
+SNIPPET_CHARS = 90
+SEARCH_SCOPES = ('inquiries', 'customers', 'orders')
+
+TOKEN_RE = re.compile(r'\w{2,}')           # 1-letter prefixes would match half the index
+PHONE_RE = re.compile(r'[\d\s+()-]*\d[\d\s+()-]*')
+
+def ranked_query(fts, weights, table, columns):
+    return text(f"""
+        SELECT {columns}
+        FROM (
+            SELECT rowid AS id, bm25({fts}, {weights}) AS score
+            FROM {fts}
+            WHERE {fts} MATCH :match AND rowid >= COALESCE((
+                SELECT rowid FROM {fts} WHERE {fts} MATCH :match
+                ORDER BY rowid DESC LIMIT 1 OFFSET :window), 0)
+            ORDER BY score, rowid DESC
+            LIMIT :limit OFFSET :offset
+        ) AS ranked
+        JOIN {table} t ON t.id = ranked.id
+        ORDER BY ranked.score, ranked.id DESC
+    """)
+
+QUERIES = {
+    'inquiries': ranked_query('contact_inquiry_fts', '5.0, 3.0, 1.0', 'contact_inquiry',
+                              't.id, t.name, t.email, t.status, t.created_at, t.message'
+                              ).columns(created_at=db.DateTime),
+    'customers': ranked_query('customer_fts', '2.0, 1.0', 'customer', 't.id, t.name, t.phone, t.leader_id'),
+    'orders': text("""
+        SELECT o.id, o.product_name, o.customer_phone, c.name AS customer_name, o.quantity,
+               o.total_price, o.order_status, o.timestamp
+        FROM (
+            SELECT rowid AS id FROM whats_app_order_fts
+            WHERE whats_app_order_fts MATCH :match
+            ORDER BY rowid DESC
+            LIMIT :limit OFFSET :offset
+        ) AS hits
+        JOIN whats_app_order o ON o.id = hits.id
+        LEFT JOIN customer c ON c.id = o.customer_id
+        ORDER BY o.id DESC
+    """).columns(timestamp=db.DateTime),
+}
+
+# --- 1. Query text -> FTS5 MATCH expression ---
+def query_terms(q):
+    q = (q or '').strip()
+    if PHONE_RE.fullmatch(q):
+        q = re.sub(r'\D', '', q)  # "+65 9123 4567" -> one token, like the stored number
+    return TOKEN_RE.findall(q.lower())[:MAX_TERMS]
+
+def match_expression(terms):
+    parts = []
+    for i, term in enumerate(terms):
+        star = '*' if i == len(terms) - 1 else ''
+        if term.isdigit() and len(term) == 8:
+            # Local number: stored with or without the 65 country code
+            parts.append(f'("{term}"{star} OR "65{term}"{star})')
+        else:
+            parts.append(f'"{term}"{star}')  # \w only, so nothing to escape inside the quotes
+    return ' '.join(parts)
+
+def snippet_html(message, terms):
+    # Only the rows on the page get here; FTS5's snippet() would re-run the
+    # match once per row. Escaped first, then every matching word is marked.
+    message = message or ''
+    pattern = re.compile(r'(?<!\w)(?:' + '|'.join(map(re.escape, terms)) + r')\w*', re.IGNORECASE)
+    first = pattern.search(message)
+    start = max(0, first.start() - SNIPPET_CHARS // 3) if first else 0
+    piece = message[start:start + SNIPPET_CHARS]
+    parts, last = [], 0
+    for hit in pattern.finditer(piece):
+        parts.append(html.escape(piece[last:hit.start()]))
+        parts.append(f"<mark>{html.escape(hit.group())}</mark>")
+        last = hit.end()
+    parts.append(html.escape(piece[last:]))
+    return ('…' if start else '') + ''.join(parts) + ('…' if start + SNIPPET_CHARS < len(message) else '')
+
+# --- 2. Row -> JSON ---
+def inquiry_json(row, terms):
+    return {'id': row.id, 'name': row.name, 'email': row.email, 'status': row.status,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'snippet_html': snippet_html(row.message, terms)}
+
+def customer_json(row, terms):
+    return {'id': row.id, 'name': row.name, 'phone': row.phone, 'leader_id': row.leader_id}
+
+def order_json(row, terms):
+    return {'id': row.id, 'product_name': row.product_name, 'customer_phone': row.customer_phone,
+            'customer_name': row.customer_name, 'quantity': row.quantity,
+            'total_price': round(row.total_price, 2), 'order_status': row.order_status,
+            'timestamp': row.timestamp.isoformat() if row.timestamp else None}
+
+SHAPES = {'inquiries': inquiry_json, 'customers': customer_json, 'orders': order_json}
+
+# --- 3. One page of one scope ---
+def search(scope, q, page=1, per_page=SEARCH_PAGE_SIZE):
+    page = max(page, 1)
+    per_page = max(1, min(per_page, MAX_SEARCH_PAGE_SIZE))
+    offset = (page - 1) * per_page
+    terms = query_terms(q)
+    if not terms or offset > MAX_SEARCH_OFFSET:
+        return {'results': [], 'next_page': None}
+
+    params = {'match': match_expression(terms), 'limit': per_page + 1, 'offset': offset, 'window': RANK_WINDOW - 1}
+    rows = db.session.execute(QUERIES[scope], params).all()
+    has_more = len(rows) > per_page and offset + per_page <= MAX_SEARCH_OFFSET
+    return {'results': [SHAPES[scope](row, terms) for row in rows[:per_page]],
+            'next_page': page + 1 if has_more else None}
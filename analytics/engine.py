@@ -0,0 +1,219 @@
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+from sqlalchemy import text, func
+from models import (db, WhatsAppOrder, Product, GroupLeader, get_sg_time,
+                    DemandCurvePoint, DemandForecast, DemandSeasonality)
+from retention.archive import history_table
+
+# ==============================================================================
+# DEMAND ANALYTICS ENGINE (pandas / numpy)
+# ==============================================================================
+# 1. Walk WhatsAppOrder in primary-key chunks of CHUNK_SIZE; each chunk comes
+#    back already reduced to (day, product, leader) totals as a small frame,
+#    so memory stays flat no matter how many orders there are.
+# 2. Pivot the totals into dense (key x day) matrices and compute every metric
+#    for every product/leader at once with vectorized ops.
+# 3. Replace the materialized demand_* tables in one transaction. The admin
+#    dashboard and harvest plan only ever read those tables.
+CHUNK_SIZE = 250_000
+HISTORY_DAYS = int(os.getenv('ANALYTICS_HISTORY_DAYS', 91))
+CURVE_DAYS = 90           # Days of demand curve kept per product/leader
+AVERAGE_DAYS = 28         # Window for average daily demand + sell-through
+SEASONALITY_WEEKS = 8     # Window for day-of-week factors
+EWMA_SPAN = 7             # Baseline smoothing for the next-day forecast
+FACTOR_CLIP = (0.25, 3.0) # Keeps one odd week from blowing up a weekday factor
+
+# One chunk = one primary-key range, reduced to daily totals inside SQLite.
+# "+timestamp" stops SQLite from switching to the timestamp index, which turns
+# a sequential range read into one random table lookup per order.
+# order_history = live + archived orders (ids are kept when archiving), so a
+# long ANALYTICS_HISTORY_DAYS still sees orders moved out by retention/.
+# Databases without the view (never upgraded) read whats_app_order instead.
+ORDER_CHUNK_SQL = """
+    SELECT substr(timestamp, 1, 10) AS day, product_name, COALESCE(leader_id, 0) AS leader_id,
+           SUM(quantity) AS qty, SUM(total_price) AS sales
+    FROM {source}
+    WHERE id BETWEEN :first_id AND :last_id
+      AND +timestamp >= :cutoff
+      AND (order_status IS NULL OR order_status != 'Cancelled')
+    GROUP BY day, product_name, leader_id
+"""
+
+def sg_today():
+    return datetime.now(pytz.timezone('Asia/Singapore')).date()
+
+# ==============================================================================
+# 1. CHUNKED LOAD (Primary-key ranges, reduced per chunk)
+# ==============================================================================
+def order_id_range(start_day, source):
+    # ids grow with time, so the window starts at the first order on/after start_day
+    first_id = db.session.query(func.min(source.c.id))\
+        .filter(source.c.timestamp >= start_day.isoformat()).scalar()
+    last_id = db.session.query(func.max(source.c.id)).scalar()
+    return first_id, last_id
+
+def load_daily_totals(start_day, chunk_size=CHUNK_SIZE):
+    source = history_table()
+    first_id, last_id = order_id_range(start_day, source)
+    chunk_sql = text(ORDER_CHUNK_SQL.format(source=source.name))
+    partials = []
+    if first_id is not None:
+        with db.engine.connect() as conn:
+            for chunk_start in range(first_id, last_id + 1, chunk_size):
+                params = {'first_id': chunk_start, 'last_id': chunk_start + chunk_size - 1,
+                          'cutoff': start_day.isoformat()}
+                partials.append(pd.read_sql_query(chunk_sql, conn, params=params))
+
+    columns = ['day', 'product_name', 'leader_id', 'qty', 'sales']
+    if not partials:
+        return pd.DataFrame(columns=columns), 0
+    # Chunks can share keys (a day split across two id ranges): combine once more
+    totals = pd.concat(partials, ignore_index=True)\
+        .groupby(['day', 'product_name', 'leader_id'], sort=False, as_index=False)[['qty', 'sales']].sum()
+    rows_read = last_id - first_id + 1
+    return totals, rows_read
+
+def dense_matrix(totals, key_column, value, days):
+    # Rows = keys, columns = every calendar day (missing days are real zeros)
+    matrix = totals.pivot_table(index=key_column, columns='day', values=value, aggfunc='sum', fill_value=0.0)
+    return matrix.reindex(columns=days, fill_value=0.0).astype('float64')
+
+# ==============================================================================
+# 2. VECTORIZED METRICS (one pass over all keys)
+# ==============================================================================
+def weekday_factors(qty, weekdays):
+    # Mean demand per weekday / overall mean, over the last SEASONALITY_WEEKS
+    window = SEASONALITY_WEEKS * 7
+    recent, recent_weekdays = qty[:, -window:], weekdays[-window:]
+    overall = recent.mean(axis=1, keepdims=True)
+    per_weekday = np.stack([recent[:, recent_weekdays == d].mean(axis=1) for d in range(7)], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = np.where(overall > 0, per_weekday / overall, 1.0)
+    return np.clip(np.nan_to_num(factors, nan=1.0), *FACTOR_CLIP)
+
+def ewma_last(values, span):
+    # Final value of an EWMA along axis 1 for every row at once
+    alpha = 2.0 / (span + 1)
+    weights = (1 - alpha) ** np.arange(values.shape[1] - 1, -1, -1)
+    weights[1:] *= alpha  # Oldest point carries the initial-value weight (adjust=False)
+    return values @ weights
+
+def demand_metrics(qty, weekdays, target_weekday):
+    factors = weekday_factors(qty, weekdays)
+    # Deseasonalize, smooth, then re-apply tomorrow's weekday factor
+    deseasonalized = qty / factors[:, weekdays]
+    baseline = ewma_last(deseasonalized, EWMA_SPAN)
+
+    last_7, prior_7 = qty[:, -7:].sum(axis=1), qty[:, -14:-7].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trend = np.where(prior_7 > 0, (last_7 - prior_7) / prior_7 * 100, np.nan)
+
+    return {
+        'avg_daily_qty': qty[:, -AVERAGE_DAYS:].mean(axis=1),
+        'sold_window': qty[:, -AVERAGE_DAYS:].sum(axis=1),
+        'trend_pct': trend,
+        'forecast_qty': np.maximum(baseline * factors[:, target_weekday], 0.0),
+        'factors': factors,
+    }
+
+def rolling_mean(qty, window=7):
+    # Trailing mean via cumulative sums (partial windows at the start)
+    cumulative = np.cumsum(qty, axis=1)
+    shifted = np.zeros_like(cumulative)
+    shifted[:, window:] = cumulative[:, :-window]
+    counts = np.minimum(np.arange(1, qty.shape[1] + 1), window)
+    return (cumulative - shifted) / counts
+
+# ==============================================================================
+# 3. MATERIALIZE
+# ==============================================================================
+def build_rows(scope, keys, labels, qty, sales, days, weekdays, forecast_day, source_max_id, on_hand=None):
+    metrics = demand_metrics(qty, weekdays, datetime.fromisoformat(forecast_day).weekday())
+    now = get_sg_time().replace(tzinfo=None)
+
+    sell_through = None
+    if on_hand is not None:
+        sold = metrics['sold_window']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sell_through = np.where(sold + on_hand > 0, sold / (sold + on_hand), np.nan)
+
+    forecasts = [{
+        'scope': scope, 'key': str(key), 'label': labels.get(key, str(key)),
+        'avg_daily_qty': round(float(metrics['avg_daily_qty'][i]), 2),
+        'trend_pct': None if np.isnan(metrics['trend_pct'][i]) else round(float(metrics['trend_pct'][i]), 1),
+        'sell_through': None if sell_through is None or np.isnan(sell_through[i]) else round(float(sell_through[i]), 3),
+        'forecast_day': forecast_day,
+        'forecast_qty': round(float(metrics['forecast_qty'][i]), 1),
+        'source_max_id': source_max_id,
+        'computed_at': now,
+    } for i, key in enumerate(keys)]
+
+    seasonality = [{'scope': scope, 'key': str(key), 'weekday': d, 'factor': round(float(metrics['factors'][i, d]), 3)}
+                   for i, key in enumerate(keys) for d in range(7)]
+
+    curve_start = len(days) - CURVE_DAYS
+    rolling = rolling_mean(qty)
+    curves = [{'scope': scope, 'key': str(key), 'day': days[j],
+               'qty': float(qty[i, j]), 'sales': round(float(sales[i, j]), 2), 'rolling_7d': round(float(rolling[i, j]), 2)}
+              for i, key in enumerate(keys) for j in range(max(curve_start, 0), len(days))]
+    return forecasts, seasonality, curves
+
+def latest_source_id():
+    return db.session.query(func.max(DemandForecast.source_max_id), func.max(DemandForecast.forecast_day)).one()
+
+def refresh_demand_analytics(force=False):
+    today = sg_today()
+    forecast_day = (today + timedelta(days=1)).isoformat()
+    source_max_id = db.session.query(func.max(WhatsAppOrder.id)).scalar() or 0
+
+    # Nothing new since the last run (and still the same forecast day): keep the tables
+    last_id, last_forecast_day = latest_source_id()
+    if not force and last_id == source_max_id and last_forecast_day == forecast_day:
+        print("ℹ️ Demand analytics already up to date.")
+        return {'rows_read': 0, 'rows_written': 0}
+
+    started = time.perf_counter()
+    start_day = today - timedelta(days=HISTORY_DAYS - 1)
+    totals, rows_read = load_daily_totals(start_day)
+
+    days = [(start_day + timedelta(days=i)).isoformat() for i in range(HISTORY_DAYS)]
+    weekdays = np.array([(start_day + timedelta(days=i)).weekday() for i in range(HISTORY_DAYS)])
+
+    forecasts, seasonality, curves = [], [], []
+    if len(totals):
+        # --- Per product (with sell-through against current stock) ---
+        product_qty = dense_matrix(totals, 'product_name', 'qty', days)
+        product_sales = dense_matrix(totals, 'product_name', 'sales', days).reindex(product_qty.index)
+        stock = dict(db.session.query(Product.name, Product.available_qty).all())
+        on_hand = np.array([max(stock.get(name, 0) or 0, 0) for name in product_qty.index], dtype='float64')
+        parts = build_rows('product', list(product_qty.index), {}, product_qty.to_numpy(),
+                           product_sales.to_numpy(), days, weekdays, forecast_day, source_max_id, on_hand)
+        for target, rows in zip((forecasts, seasonality, curves), parts):
+            target.extend(rows)
+
+        # --- Per group leader ---
+        leader_qty = dense_matrix(totals, 'leader_id', 'qty', days)
+        leader_sales = dense_matrix(totals, 'leader_id', 'sales', days).reindex(leader_qty.index)
+        names = dict(db.session.query(GroupLeader.id, GroupLeader.name).all())
+        names[0] = 'No leader'
+        parts = build_rows('leader', list(leader_qty.index), names, leader_qty.to_numpy(),
+                           leader_sales.to_numpy(), days, weekdays, forecast_day, source_max_id)
+        for target, rows in zip((forecasts, seasonality, curves), parts):
+            target.extend(rows)
+
+    # Swap all three tables in one transaction so readers never see a half-built refresh
+    for model in (DemandForecast, DemandSeasonality, DemandCurvePoint):
+        db.session.query(model).delete()
+    for model, rows in ((DemandForecast, forecasts), (DemandSeasonality, seasonality), (DemandCurvePoint, curves)):
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+    rows_written = len(forecasts) + len(seasonality) + len(curves)
+    print(f"📈 Demand analytics: {rows_read:,} orders -> {rows_written:,} rows "
+          f"in {time.perf_counter() - started:.2f}s")
+    return {'rows_read': rows_read, 'rows_written': rows_written}
@@ -0,0 +1,40 @@
+import math
+from models import db, Product, DemandForecast, DemandCurvePoint, DemandSeasonality
+
+# ==============================================================================
+# READERS FOR THE MATERIALIZED DEMAND TABLES
+# ==============================================================================
+# Plain ORM reads - no pandas import on the web request path. The tables are
+# rebuilt by the demand_analytics job (scheduler/jobs.py).
+HARVEST_BUFFER = 1.1  # Pick 10% above forecast to cover damaged leaves
+
+def forecasts(scope, limit=None):
+    query = DemandForecast.query.filter_by(scope=scope).order_by(DemandForecast.forecast_qty.desc())
+    return query.limit(limit).all() if limit else query.all()
+
+def last_computed_at():
+    return db.session.query(db.func.max(DemandForecast.computed_at)).scalar()
+
+def demand_curve(scope, key):
+    return DemandCurvePoint.query.filter_by(scope=scope, key=str(key))\
+        .order_by(DemandCurvePoint.day.asc()).all()
+
+def seasonality(scope, key):
+    rows = DemandSeasonality.query.filter_by(scope=scope, key=str(key)).all()
+    return {row.weekday: row.factor for row in rows}
+
+def harvest_plan():
+    # Tomorrow's forecast per product vs what is already on hand
+    stock = {p.name: p for p in Product.query.all()}
+    plan = []
+    for forecast in forecasts('product'):
+        product = stock.get(forecast.key)
+        on_hand = max(product.available_qty or 0, 0) if product else 0
+        plan.append({
+            'product': forecast.key,
+            'forecast_day': forecast.forecast_day,
+            'forecast_qty': forecast.forecast_qty,
+            'on_hand': on_hand,
+            'harvest_qty': max(math.ceil(forecast.forecast_qty * HARVEST_BUFFER) - on_hand, 0),
+        })
+    return plan
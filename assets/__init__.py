@@ -0,0 +1,128 @@
+import os
+import json
+import mimetypes
+from flask import Blueprint, url_for, request, send_from_directory, abort
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+# ==============================================================================
+# STATIC ASSET PIPELINE (Runtime side)
+# ==============================================================================
+# python -m assets.build writes fingerprinted, minified and precompressed files
+# to static/dist plus a manifest.json. These helpers read that manifest; when it
+# hasn't been built (local dev) they fall back to the plain /static files.
+STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Every page loads the shared layout CSS plus its own stylesheet
+BASE_CSS = ['global.css', 'footer.css', 'navbar.css']
+CSS_BUNDLES = {
+    'index': BASE_CSS + ['index.css'],
+    'about': BASE_CSS + ['about.css'],
+    'article': BASE_CSS + ['article.css'],
+    'account': BASE_CSS + ['account.css'],
+    'contact': BASE_CSS + ['contact.css'],
+    'product': BASE_CSS + ['product.css'],
+    'admin': BASE_CSS + ['admin.css'],
+    'leader': BASE_CSS + ['admin.css'],
+    'myaccount': BASE_CSS + ['myaccount.css'],
+    'orders': BASE_CSS + ['orders.css'],
+    'payment': BASE_CSS + ['payment.css'],
+    'review': BASE_CSS + ['review.css'],
+}
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+assets_bp = Blueprint('assets', __name__)
+
+_manifest = {'mtime': None, 'data': {}}
+
+def load_manifest():
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        _manifest.update(mtime=None, data={})
+        return {}
+    if mtime != _manifest['mtime']:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            _manifest['data'] = json.load(f)
+        _manifest['mtime'] = mtime
+    return _manifest['data']
+
+def manifest_mtime():
+    # Changes on every build; cached pages that link to assets key on it
+    load_manifest()
+    return _manifest['mtime']
+
+# ==============================================================================
+# 1. TEMPLATE HELPERS
+# ==============================================================================
+def asset_url(filename):
+    built = load_manifest().get('files', {}).get(filename)
+    if built:
+        return url_for('assets.dist', filename=built)
+    return url_for('static', filename=filename)
+
+def css_bundle(page):
+    built = load_manifest().get('css', {}).get(page)
+    if built:
+        hrefs = [url_for('assets.dist', filename=built)]
+    else:
+        hrefs = [url_for('static', filename=name) for name in CSS_BUNDLES[page]]
+    return Markup("\n    ".join(f'<link rel="stylesheet" href="{href}">' for href in hrefs))
+
+def responsive_image(filename, alt='', sizes='100vw', lazy=True, **attrs):
+    # <picture> with WebP + JPEG srcsets; plain <img> if no variants were built
+    variants = load_manifest().get('images', {}).get(filename)
+    attr_html = "".join(f' {escape(k.rstrip("_").replace("_", "-"))}="{escape(v)}"' for k, v in attrs.items())
+    if not variants:
+        return Markup(f'<img src="{asset_url(filename)}" alt="{escape(alt)}"{attr_html}>')
+
+    def srcset(fmt):
+        return ", ".join(f"{url_for('assets.dist', filename=path)} {width}w" for width, path in variants[fmt])
+
+    fallback = url_for('assets.dist', filename=variants['jpeg'][-1][1])
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{srcset("webp")}" sizes="{escape(sizes)}">'
+        f'<img src="{fallback}" srcset="{srcset("jpeg")}" sizes="{escape(sizes)}" '
+        f'alt="{escape(alt)}" loading="{"lazy" if lazy else "eager"}" decoding="async"{attr_html}>'
+        f'</picture>'
+    )
+
+# ==============================================================================
+# 2. SERVING (Precompressed + immutable cache headers)
+# ==============================================================================
+@assets_bp.route('/assets/<path:filename>')
+def dist(filename):
+    full_path = safe_join(DIST_DIR, filename)
+    if not full_path or not os.path.isfile(full_path):
+        abort(404)
+
+    # Pick the smallest precompressed copy the browser accepts
+    accepted = request.accept_encodings
+    encoding = None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if accepted[name] and os.path.isfile(full_path + suffix):
+            encoding, served = name, filename + suffix
+            break
+
+    if encoding:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(DIST_DIR, served, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(DIST_DIR, filename)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def init_assets(app):
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals.update(
+        asset_url=asset_url,
+        css_bundle=css_bundle,
+        responsive_image=responsive_image,
+    )
@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+from io import BytesIO
+from assets import STATIC_DIR, DIST_DIR, MANIFEST_PATH, CSS_BUNDLES
+
+# Optional build-time dependencies: Pillow for image variants, brotli for .br
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ==============================================================================
+# STATIC ASSET BUILD
+# ==============================================================================
+# Usage: python -m assets.build   (run on deploy, before starting the app)
+#  - CSS: one minified bundle per page, content-hashed
+#  - Images: WebP + JPEG variants at several widths, content-hashed
+#  - Other files (logos, favicon): copied with a content hash
+#  - Text assets are precompressed to .gz (and .br when brotli is installed)
+IMAGE_WIDTHS = [480, 960, 1600]
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+RESIZE_MIN_BYTES = 50 * 1024  # Small images (logos, thumbnails) are just fingerprinted
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+def write_hashed(rel_dir, stem, ext, data):
+    name = f"{stem}.{content_hash(data)}{ext}"
+    rel_path = f"{rel_dir}/{name}" if rel_dir else name
+    out_path = os.path.join(DIST_DIR, rel_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+    if ext in COMPRESSIBLE:
+        precompress(out_path, data)
+    return rel_path
+
+def precompress(path, data):
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+# ==============================================================================
+# 1. CSS BUNDLES
+# ==============================================================================
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+def build_css():
+    built = {}
+    for page, files in CSS_BUNDLES.items():
+        parts = []
+        for name in files:
+            with open(os.path.join(STATIC_DIR, name), encoding='utf-8-sig') as f:
+                parts.append(f.read())
+        data = minify_css("\n".join(parts)).encode('utf-8')
+        built[page] = write_hashed('css', page, '.css', data)
+        print(f"🎨 {page}: {len(data) / 1024:.1f} KB -> {built[page]}")
+    return built
+
+# ==============================================================================
+# 2. IMAGES (Responsive WebP/JPEG variants)
+# ==============================================================================
+def encode_image(img, fmt, quality):
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, quality=quality, optimize=True, **({'progressive': True} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+def build_image_variants(rel_name):
+    stem = os.path.splitext(os.path.basename(rel_name))[0].replace(' ', '_')
+    rel_dir = os.path.dirname(rel_name)
+    variants = {'jpeg': [], 'webp': []}
+
+    with Image.open(os.path.join(STATIC_DIR, rel_name)) as original:
+        original = original.convert('RGB')
+        widths = [w for w in IMAGE_WIDTHS if w < original.width] + [min(original.width, IMAGE_WIDTHS[-1])]
+        for width in sorted(set(widths)):
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS)
+            variants['jpeg'].append([width, write_hashed(rel_dir, f"{stem}-{width}", '.jpg',
+                                                         encode_image(resized, 'JPEG', JPEG_QUALITY))])
+            variants['webp'].append([width, write_hashed(rel_dir, f"{stem}-{width}", '.webp',
+                                                         encode_image(resized, 'WEBP', WEBP_QUALITY))])
+    return variants
+
+# ==============================================================================
+# 3. EVERYTHING ELSE UNDER static/
+# ==============================================================================
+def build_files():
+    files, images = {}, {}
+    for root, _dirs, names in os.walk(STATIC_DIR):
+        if os.path.abspath(root).startswith(DIST_DIR):
+            continue
+        for name in names:
+            rel_name = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, '/')
+            with open(os.path.join(root, name), 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(os.path.basename(rel_name))
+            rel_dir = os.path.dirname(rel_name)
+
+            if ext.lower() in ('.jpg', '.jpeg') and Image and len(data) >= RESIZE_MIN_BYTES:
+                images[rel_name] = build_image_variants(rel_name)
+                # Plain asset_url() gets the largest JPEG variant instead of the original
+                files[rel_name] = images[rel_name]['jpeg'][-1][1]
+                sizes = ", ".join(f"{w}w {os.path.getsize(os.path.join(DIST_DIR, p)) / 1024:.0f} KB"
+                                  for w, p in images[rel_name]['webp'])
+                print(f"🖼️ {rel_name}: {len(data) / 1024:.0f} KB -> WebP {sizes}")
+            else:
+                files[rel_name] = write_hashed(rel_dir, stem.replace(' ', '_'), ext, data)
+    return files, images
+
+def main():
+    if Image is None:
+        print("⚠️ Pillow not installed: images will be fingerprinted but not resized.")
+    if brotli is None:
+        print("ℹ️ brotli not installed: only .gz copies will be written.")
+
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    css = build_css()
+    files, images = build_files()
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'css': css, 'files': files, 'images': images}, f, indent=2)
+    print(f"✅ Manifest written: {MANIFEST_PATH}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,9 @@
-import os
-import requests 
 from dotenv import load_dotenv 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from models import db, ContactInquiry
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from models import db
 from .forms import ContactForm
+from .verify import verify_recaptcha, token_done, VERIFIED, UNAVAILABLE, MISCONFIGURED, DUPLICATE, PENDING
+from .writer import inquiry_row, insert_inquiries
 
 # 1. Load environment variables from .env file
 load_dotenv()
@@ -19,42 +19,34 @@ def contact():
     if form.validate_on_submit():
         
         # --- START RECAPTCHA VERIFICATION ---
-        recaptcha_response = request.form.get('g-recaptcha-response')
-        google_secret_key = os.getenv('GOOGLE_RECAPTCHA_SECRET')
+        # Pooled + time-bounded; a reused token waits for the first request's result (see verify.py)
+        token = request.form.get('g-recaptcha-response')
+        outcome = verify_recaptcha(token, request.remote_addr)
 
-        # Safety Check: Ensure key exists in .env
-        if not google_secret_key:
-            print("Error: GOOGLE_RECAPTCHA_SECRET is missing in .env file")
-            flash('System configuration error: Captcha key missing.', 'danger')
+        # Same token again (double click): the first request saved it, this one just says so
+        if outcome == DUPLICATE:
+            flash('Message sent successfully! We will contact you within 24 hours.', 'success')
+            return redirect(url_for('contact.contact'))
+        if outcome == PENDING:
+            flash('Your message is still being sent. Please wait a moment before trying again.', 'warning')
             return render_template('contact.html', form=form)
 
-        # Verify with Google
-        verify_url = "https://www.google.com/recaptcha/api/siteverify"
-        payload = {
-            'secret': google_secret_key,
-            'response': recaptcha_response
-        }
-
-        try:
-            # Ask Google: "Is this user real?"
-            response = requests.post(verify_url, data=payload)
-            result = response.json()
-
-            # !!! SECURITY GATE !!!
-            # If Google says "False", we STOP here. We do NOT save to DB.
-            if not result.get('success'):
-                flash('Recaptcha verification failed. Please check the box.', 'danger')
-                return render_template('contact.html', form=form)
-
-        except Exception as e:
-            print(f"Recaptcha Connection Error: {e}")
+        # !!! SECURITY GATE !!!
+        # If Google says "False", we STOP here. We do NOT save to DB.
+        if outcome == MISCONFIGURED:
+            flash('System configuration error: Captcha key missing.', 'danger')
+            return render_template('contact.html', form=form)
+        if outcome == UNAVAILABLE:
             flash('Could not verify captcha. Please try again.', 'danger')
             return render_template('contact.html', form=form)
+        if outcome != VERIFIED:
+            flash('Recaptcha verification failed. Please check the box.', 'danger')
+            return render_template('contact.html', form=form)
         # --- END RECAPTCHA VERIFICATION ---
 
 
         # 4. Only if Captcha passed, Retrieve clean data
-        new_inquiry = ContactInquiry(
+        row = inquiry_row(
             name=form.name.data,
             email=form.email.data,
             phone=form.phone.data,
@@ -62,9 +54,13 @@ def contact():
         )
 
         try:
-            # 5. Save to Database
-            db.session.add(new_inquiry)
-            db.session.commit()
+            # 5. Save to Database (batched in the background when write-behind is on)
+            writer = current_app.extensions.get('inquiry_writer')
+            if writer:
+                writer.submit(row)
+            else:
+                insert_inquiries([row])
+            token_done(token, saved=True)
             
             # 6. Success: Show a message
             flash('Message sent successfully! We will contact you within 24 hours.', 'success')
@@ -74,6 +70,7 @@ def contact():
             
         except Exception as e:
             db.session.rollback()
+            token_done(token, saved=False)
             print(f"Database Error: {e}") 
             flash('An error occurred while sending your message. Please try again.', 'danger')
 
@@ -0,0 +1,148 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ==============================================================================
+# RECAPTCHA VERIFICATION (Pooled, time-bounded, cached)
+# ==============================================================================
+# - One shared requests.Session keeps the TLS connection to Google warm.
+# - Every call is bounded by VERIFY_TIMEOUT, so a slow Google can't hold a
+#   worker for long.
+# - Tokens are single-use, so each one is remembered for TOKEN_CACHE_SECONDS.
+#   A second request with the same token (a double click, or a script
+#   replaying one solved captcha) never verifies or saves again: it waits for
+#   the first request to finish, and only if that one saved the inquiry
+#   (token_done) does it get DUPLICATE - "already sent". If the first is
+#   still going it gets PENDING; if it failed, REJECTED (tick the box again).
+#   Rejected tokens stay rejected without asking Google a second time.
+# - RECAPTCHA_VERIFIER=local swaps Google for an offline stand-in (load tests).
+RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
+VERIFY_TIMEOUT = (3, 5)  # (connect, read) seconds
+TOKEN_CACHE_SECONDS = 120  # Google tokens expire after 2 minutes anyway
+TOKEN_CACHE_SIZE = 1024
+
+# Outcomes returned by verify_recaptcha()
+VERIFIED = 'verified'
+REJECTED = 'rejected'
+UNAVAILABLE = 'unavailable'
+MISCONFIGURED = 'misconfigured'
+DUPLICATE = 'duplicate'  # Same token already saved an inquiry
+PENDING = 'pending'      # Same token is still being verified/saved by another request
+
+CHECKING = 'checking'    # Cache states while the first request runs: Google, then the save
+SAVED = 'saved'
+WAIT_SECONDS = sum(VERIFY_TIMEOUT) + 2
+
+class GoogleVerifier:
+    def __init__(self):
+        # requests is imported here, with the first verification, not when
+        # the contact blueprint is registered
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        self.errors = (requests.RequestException, ValueError)
+
+    def verify(self, token, remote_ip=None):
+        secret = os.getenv('GOOGLE_RECAPTCHA_SECRET')
+        if not secret:
+            print("Error: GOOGLE_RECAPTCHA_SECRET is missing in .env file")
+            return MISCONFIGURED
+
+        payload = {'secret': secret, 'response': token}
+        if remote_ip:
+            payload['remoteip'] = remote_ip
+        try:
+            result = self.session.post(RECAPTCHA_VERIFY_URL, data=payload, timeout=VERIFY_TIMEOUT).json()
+        except self.errors as e:
+            print(f"Recaptcha Connection Error: {e}")
+            return UNAVAILABLE
+        return VERIFIED if result.get('success') else REJECTED
+
+class LocalVerifier:
+    # Offline stand-in: accepts any non-empty token except "fail", after an
+    # optional simulated round trip (LOCAL_RECAPTCHA_LATENCY_MS)
+    def __init__(self, latency_ms=None):
+        self.latency = float(latency_ms if latency_ms is not None else os.getenv('LOCAL_RECAPTCHA_LATENCY_MS', 0)) / 1000
+
+    def verify(self, token, remote_ip=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return VERIFIED if token and token != 'fail' else REJECTED
+
+VERIFIERS = {'google': GoogleVerifier, 'local': LocalVerifier}
+
+_verifier = None
+_token_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        name = os.getenv('RECAPTCHA_VERIFIER', 'google').lower()
+        _verifier = VERIFIERS.get(name, GoogleVerifier)()
+    return _verifier
+
+def set_verifier(verifier):
+    global _verifier
+    _verifier = verifier
+    with _cache_lock:
+        _token_cache.clear()
+
+class TokenUse:
+    def __init__(self, now):
+        self.state = CHECKING
+        self.expires_at = now + TOKEN_CACHE_SECONDS
+        self.done = threading.Event()  # Set once the first request has its final answer
+
+def _token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def verify_recaptcha(token, remote_ip=None):
+    # VERIFIED means "this request owns the token": the caller saves the
+    # inquiry and then reports back with token_done()
+    if not token:
+        return REJECTED
+
+    key = _token_key(token)
+    now = time.monotonic()
+    with _cache_lock:
+        use = _token_cache.get(key)
+        if use and use.expires_at > now:
+            first = False
+        else:
+            # Claim the token before the round trip, so a concurrent second
+            # click waits for this one instead of verifying (and saving) again
+            use = _token_cache[key] = TokenUse(now)
+            _token_cache.move_to_end(key)
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+            first = True
+
+    if not first:
+        use.done.wait(WAIT_SECONDS)
+        if use.state == SAVED:
+            return DUPLICATE
+        return PENDING if use.state in (CHECKING, VERIFIED) else REJECTED
+
+    outcome = get_verifier().verify(token, remote_ip)
+    with _cache_lock:
+        if outcome == VERIFIED:
+            use.state = VERIFIED  # Waiters keep waiting for the save
+            return outcome
+        use.state = REJECTED if outcome == REJECTED else outcome
+        if outcome != REJECTED:
+            _token_cache.pop(key, None)  # Only definite answers stick; a timeout can be retried
+    use.done.set()
+    return outcome
+
+def token_done(token, saved):
+    # Called by the route after a VERIFIED request tried to save its inquiry
+    with _cache_lock:
+        use = _token_cache.get(_token_key(token))
+        if use is None:
+            return
+        use.state = SAVED if saved else REJECTED  # Google won't accept the token again either way
+    use.done.set()
@@ -0,0 +1,180 @@
+import os
+import json
+import queue
+import atexit
+import threading
+import time
+from datetime import datetime
+from models import db, ContactInquiry, get_sg_time
+
+# ==============================================================================
+# WRITE-BEHIND QUEUE FOR CONTACT INQUIRIES
+# ==============================================================================
+# The contact form hands its row to this queue and returns straight away. One
+# background thread drains the queue and inserts in batches (one transaction
+# per batch), so a burst of 200 submissions costs a handful of short SQLite
+# write locks instead of 200 - and order writes don't queue up behind them.
+#
+# Nothing is dropped:
+#  - queue full           -> the request inserts synchronously (backpressure)
+#  - batch keeps failing  -> rows go to a JSONL spool file, replayed on start
+#                            (unreadable lines are moved to <spool>.bad)
+#  - process exiting      -> stop() flushes whatever is still queued
+# Set CONTACT_WRITE_BEHIND=0 to insert synchronously (e.g. when debugging).
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 0.5  # Max seconds a queued inquiry waits before being written
+QUEUE_SIZE = 1000
+MAX_ATTEMPTS = 3
+SPOOL_PATH = os.getenv('CONTACT_SPOOL_PATH') or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'contact_spool.jsonl'))
+
+def inquiry_row(name, email, phone, message):
+    # created_at is the submission time, not the time the batch lands
+    return {
+        'name': name,
+        'email': email,
+        'phone': phone,
+        'message': message,
+        'status': 'Pending',
+        'created_at': get_sg_time().replace(tzinfo=None),
+    }
+
+def insert_inquiries(rows):
+    db.session.execute(ContactInquiry.__table__.insert(), rows)
+    db.session.commit()
+
+class InquiryWriter:
+    def __init__(self, app, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'sync': 0, 'spooled': 0}
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def submit(self, row):
+        if not self._ensure_started():
+            # Shutting down: nothing would drain the queue any more
+            insert_inquiries([row])
+            self.stats['sync'] += 1
+            return
+        try:
+            self.queue.put_nowait(row)
+            self.stats['queued'] += 1
+        except queue.Full:
+            # Writer is behind: fall back to a normal insert for this request
+            insert_inquiries([row])
+            self.stats['sync'] += 1
+
+    def _ensure_started(self):
+        # Started on first use so CLI scripts importing the app don't spawn
+        # threads; started again if it ever died, so queued rows are not stranded
+        if self._stop_event.is_set():
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None:
+                    atexit.register(self.stop)
+                elif self._thread.is_alive():
+                    return True
+                else:
+                    print("⚠️ Inquiry writer thread had stopped - restarting it")
+                self._thread = threading.Thread(target=self._run, name='inquiry-writer', daemon=True)
+                self._thread.start()
+        return True
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                self.replay_spool()
+            except Exception as e:
+                print(f"❌ Could not replay {SPOOL_PATH}: {e}")
+            while not self._stop_event.is_set() or not self.queue.empty():
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    # e.g. the spool file itself can't be written: report it, keep the thread
+                    print(f"❌ {len(batch)} inquiries could not be written or spooled: {e}")
+
+    def write_batch(self, batch):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                insert_inquiries(batch)
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                return True
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Inquiry batch failed (attempt {attempt}/{MAX_ATTEMPTS}): {e}")
+                time.sleep(0.2 * attempt)
+        self.spool(batch)
+        return False
+
+    # --- Spool file: last resort so a locked/broken DB never loses an inquiry ---
+    def spool(self, batch):
+        with open(SPOOL_PATH, 'a', encoding='utf-8') as f:
+            for row in batch:
+                f.write(json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + "\n")
+        self.stats['spooled'] += len(batch)
+        print(f"❌ {len(batch)} inquiries spooled to {SPOOL_PATH}")
+
+    def replay_spool(self):
+        replay_path = SPOOL_PATH + '.replaying'
+        try:
+            os.replace(SPOOL_PATH, replay_path)
+        except FileNotFoundError:
+            return 0  # Nothing spooled, or another worker took it first
+        rows, bad = [], []
+        with open(replay_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row['created_at'] = datetime.fromisoformat(row['created_at'])
+                    rows.append(row)
+                except (ValueError, KeyError, TypeError):
+                    bad.append(line if line.endswith("\n") else line + "\n")  # e.g. cut off by a crash mid-append
+        if bad:
+            with open(SPOOL_PATH + '.bad', 'a', encoding='utf-8') as f:
+                f.writelines(bad)
+            print(f"⚠️ {len(bad)} unreadable spool lines moved to {SPOOL_PATH}.bad")
+        # Written, or spooled again by write_batch - either way this copy is done
+        if rows and self.write_batch(rows):
+            print(f"✅ Replayed {len(rows)} spooled inquiries")
+        os.remove(replay_path)
+        return len(rows)
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+def init_inquiry_writer(app):
+    if os.getenv('CONTACT_WRITE_BEHIND', '1') == '0':
+        return None
+    writer = InquiryWriter(app)
+    app.extensions['inquiry_writer'] = writer
+    return writer
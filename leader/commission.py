@@ -0,0 +1,188 @@
+import os
+from sqlalchemy import func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import (db, get_sg_time, CommissionRate, CommissionBalance,
+                    CommissionEntry, CommissionPeriod)
+
+# ==============================================================================
+# COMMISSION LEDGER
+# ==============================================================================
+# - accrue_commission() runs inside finalize_order's transaction: one entry per
+#   order line + one upsert that bumps the leader's running balance. If the
+#   order rolls back, so does the commission.
+# - Balances are what dashboards and payout reports read (one row per leader).
+# - close_period() moves the open balance into a payout period and tags the
+#   entries it covers; mark_period_paid() records the payout.
+DEFAULT_COMMISSION_RATE = float(os.getenv('DEFAULT_COMMISSION_RATE', 0.111))
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+# ==============================================================================
+# 1. RATES (Cached per process, keyed on a fingerprint every worker sees)
+# ==============================================================================
+# A rate saved by the admin app must reach the webhook workers before their
+# next order: amounts are written into the ledger for good.
+_rates = {'fingerprint': None, 'table': None}
+
+def rates_fingerprint():
+    # One aggregate over a tiny table: any insert/update/delete changes count or max(updated_at)
+    return tuple(db.session.query(func.count(CommissionRate.id), func.max(CommissionRate.updated_at)).one())
+
+def rate_table():
+    fingerprint = rates_fingerprint()
+    if _rates['fingerprint'] != fingerprint:
+        _rates['table'] = {(r.leader_id, r.product_name): r.rate for r in CommissionRate.query.all()}
+        _rates['fingerprint'] = fingerprint
+    return _rates['table']
+
+def commission_rate(leader_id, product_name, table=None):
+    table = rate_table() if table is None else table
+    for key in ((leader_id, product_name), (None, product_name), (leader_id, None), (None, None)):
+        if key in table:
+            return table[key]
+    return DEFAULT_COMMISSION_RATE
+
+def set_commission_rate(rate, leader_id=None, product_name=None):
+    # NULLs never collide in a SQLite unique index, so match the scope explicitly
+    row = CommissionRate.query.filter_by(leader_id=leader_id, product_name=product_name).first()
+    if row is None:
+        row = CommissionRate(leader_id=leader_id, product_name=product_name, rate=rate)
+        db.session.add(row)
+    row.rate = rate
+    db.session.commit()
+    return row
+
+# ==============================================================================
+# 2. WRITE PATH (Per confirmed order, caller commits)
+# ==============================================================================
+def _bump_balance(leader_id, sales, amount, orders):
+    # One upsert: running totals move with the order, no read-modify-write
+    values = dict(leader_id=leader_id, open_sales=sales, open_amount=amount,
+                  lifetime_sales=sales, lifetime_amount=amount, order_count=orders,
+                  unpaid_amount=0.0, paid_amount=0.0, updated_at=sg_now())
+    stmt = sqlite_insert(CommissionBalance).values(**values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['leader_id'],
+        set_={
+            'open_sales': db.func.round(CommissionBalance.open_sales + stmt.excluded.open_sales, 2),
+            'open_amount': db.func.round(CommissionBalance.open_amount + stmt.excluded.open_amount, 2),
+            'lifetime_sales': db.func.round(CommissionBalance.lifetime_sales + stmt.excluded.lifetime_sales, 2),
+            'lifetime_amount': db.func.round(CommissionBalance.lifetime_amount + stmt.excluded.lifetime_amount, 2),
+            'order_count': CommissionBalance.order_count + stmt.excluded.order_count,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    ))
+
+def accrue_commission(orders):
+    # orders: flushed WhatsAppOrder rows of one checkout (same leader)
+    entries, sales, amount = [], 0.0, 0.0
+    table = rate_table()  # Checked once per checkout, not per line
+    for order in orders:
+        if not order.leader_id:
+            continue
+        rate = commission_rate(order.leader_id, order.product_name, table)
+        order.commission_earned = round(order.total_price * rate, 2)
+        entries.append(dict(leader_id=order.leader_id, order_id=order.id, kind='accrual',
+                            sales_amount=order.total_price, rate=rate,
+                            amount=order.commission_earned, created_at=sg_now()))
+        sales += order.total_price
+        amount += order.commission_earned
+
+    if entries:
+        db.session.execute(CommissionEntry.__table__.insert(), entries)
+        _bump_balance(entries[0]['leader_id'], round(sales, 2), round(amount, 2), len(entries))
+    return amount
+
+def post_adjustment(leader_id, amount, order_id=None, sales_amount=0.0, kind='adjustment'):
+    # Manual corrections (and reversals) go through the ledger like any accrual
+    db.session.execute(CommissionEntry.__table__.insert(), [dict(
+        leader_id=leader_id, order_id=order_id, kind=kind, sales_amount=sales_amount,
+        rate=0.0, amount=amount, created_at=sg_now())])
+    _bump_balance(leader_id, sales_amount, amount, 0)
+
+def reverse_commission(orders):
+    # orders: cancelled rows (id, leader_id, total_price, commission_earned).
+    # One negative entry per order; paid-out periods stay untouched and the
+    # clawback lands in the leader's open period.
+    entries, totals = [], {}
+    for order in orders:
+        if not order.leader_id:
+            continue
+        amount = order.commission_earned or 0.0
+        entries.append(dict(leader_id=order.leader_id, order_id=order.id, kind='reversal',
+                            sales_amount=-order.total_price, rate=0.0, amount=-amount, created_at=sg_now()))
+        sales, earned, count = totals.get(order.leader_id, (0.0, 0.0, 0))
+        totals[order.leader_id] = (sales + order.total_price, earned + amount, count + 1)
+
+    if entries:
+        db.session.execute(CommissionEntry.__table__.insert(), entries)
+    for leader_id, (sales, earned, count) in totals.items():
+        _bump_balance(leader_id, -round(sales, 2), -round(earned, 2), -count)
+
+# ==============================================================================
+# 3. PAYOUT PERIODS
+# ==============================================================================
+def close_period(leader_id):
+    balance = db.session.get(CommissionBalance, leader_id)
+    if balance is None or not balance.open_amount:
+        return None
+
+    # Inserting the period takes SQLite's write lock first, so no accrual can
+    # slip in between tagging the entries and moving the balance
+    period = CommissionPeriod(leader_id=leader_id, closed_at=sg_now())
+    db.session.add(period)
+    db.session.flush()
+    db.session.refresh(balance)
+
+    tagged = db.session.execute(
+        update(CommissionEntry)
+        .where(CommissionEntry.leader_id == leader_id, CommissionEntry.period_id.is_(None))
+        .values(period_id=period.id)
+    ).rowcount
+    period.sales_amount = balance.open_sales
+    period.amount = balance.open_amount
+    period.entry_count = tagged
+
+    balance.unpaid_amount = round((balance.unpaid_amount or 0) + balance.open_amount, 2)
+    balance.open_sales = 0.0
+    balance.open_amount = 0.0
+    db.session.commit()
+    print(f"💰 Closed period #{period.id} for leader {leader_id}: ${period.amount:.2f} ({tagged} entries)")
+    return period
+
+def mark_period_paid(period_id):
+    # Guarded UPDATE: paying the same period twice is a no-op
+    period = db.session.get(CommissionPeriod, period_id)
+    if period is None:
+        return None
+    paid = db.session.execute(
+        update(CommissionPeriod)
+        .where(CommissionPeriod.id == period_id, CommissionPeriod.status == 'Closed')
+        .values(status='Paid', paid_at=sg_now())
+    ).rowcount
+    if paid:
+        db.session.execute(
+            update(CommissionBalance)
+            .where(CommissionBalance.leader_id == period.leader_id)
+            .values(unpaid_amount=CommissionBalance.unpaid_amount - period.amount,
+                    paid_amount=CommissionBalance.paid_amount + period.amount)
+        )
+    db.session.commit()
+    return period
+
+# ==============================================================================
+# 4. READS (O(1) per leader)
+# ==============================================================================
+def leader_balance(leader_id):
+    return db.session.get(CommissionBalance, leader_id) or CommissionBalance(
+        leader_id=leader_id, open_sales=0.0, open_amount=0.0, unpaid_amount=0.0,
+        paid_amount=0.0, lifetime_sales=0.0, lifetime_amount=0.0, order_count=0)
+
+def all_balances():
+    return CommissionBalance.query.order_by(CommissionBalance.open_amount.desc()).all()
+
+def total_payable():
+    totals = db.session.query(db.func.sum(CommissionBalance.open_amount),
+                              db.func.sum(CommissionBalance.unpaid_amount)).one()
+    return round((totals[0] or 0) + (totals[1] or 0), 2)
@@ -1,11 +1,18 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify
+from sqlalchemy.orm import joinedload
 from models import db, GroupLeader, WhatsAppOrder, Customer, WhatsAppLead
+from leader.commission import leader_balance
+from orders import picklists
+from querystats import query_budget
+from orders.lifecycle import (bulk_transition, transition_order, status_counts, order_history,
+                              InvalidTransition, TRANSITIONS, OPEN_STATUSES)
 from datetime import datetime
 import pytz
 
 leader_bp = Blueprint('leader', __name__)
 
 @leader_bp.route('/leader/dashboard')
+@query_budget(8)
 def dashboard():
     # --- AUTHENTICATION CHECK ---
     # In a production app, you'd get the ID from the login session
@@ -17,7 +24,9 @@ def dashboard():
 
     # --- 1. SYNC ORDERS ---
     # Fetch orders specifically for this leader's ID
-    orders = WhatsAppOrder.query.filter_by(leader_id=leader.id)\
+    # buyer is joined in: the table shows order.buyer.name on every row
+    orders = WhatsAppOrder.query.options(joinedload(WhatsAppOrder.buyer))\
+        .filter_by(leader_id=leader.id)\
         .order_by(WhatsAppOrder.timestamp.desc()).all()
 
     # --- 2. SYNC NEIGHBORS (CUSTOMERS) ---
@@ -33,17 +42,19 @@ def dashboard():
     ).all()
 
     # --- 4. DYNAMIC CALCULATIONS ---
-    # Total confirmed sales for this leader
-    total_sales = sum(order.total_price for order in orders if order.order_status == 'Confirmed')
-    
-    # Calculate commission (11.1%)
-    pending_commission = total_sales * 0.111
+    # Total confirmed sales + unpaid commission: one balance row from the ledger
+    balance = leader_balance(leader.id)
+    total_sales = balance.lifetime_sales
+    pending_commission = balance.open_amount + balance.unpaid_amount
     
     # Today's order count (Singapore Time)
     sgt = pytz.timezone('Asia/Singapore')
     today_date = datetime.now(sgt).date()
     today_orders_count = sum(1 for order in orders if order.timestamp.date() == today_date)
 
+    # Order status counts come from the lifecycle aggregate (no order scan)
+    counts = status_counts(leader.id)
+
     return render_template('leader.html', 
                            leader=leader, 
                            orders=orders, 
@@ -51,4 +62,70 @@ def dashboard():
                            pending_leads=pending_leads,
                            total_sales=total_sales,
                            pending_commission=pending_commission,
-                           today_orders_count=today_orders_count)
\ No newline at end of file
+                           today_orders_count=today_orders_count,
+                           status_counts=counts,
+                           open_orders_count=sum(counts[s] for s in OPEN_STATUSES),
+                           transitions=TRANSITIONS)
+
+# ==============================================================================
+# ORDER STATUS ACTIONS (Single order or a whole drop, one UPDATE either way)
+# ==============================================================================
+def back_to_orders():
+    return redirect((request.referrer or url_for('leader.dashboard')).split('#')[0] + '#orders')
+
+@leader_bp.route('/leader/orders/<int:order_id>/status', methods=['POST'])
+def update_order_status(order_id):
+    leader = GroupLeader.query.first()
+    try:
+        order = transition_order(order_id, request.form.get('status'), actor=f"leader:{leader.id}", leader_id=leader.id)
+    except InvalidTransition as e:
+        flash(str(e), 'danger')
+        return back_to_orders()
+    if order is None:
+        flash(f"Order #{order_id} not found.", 'danger')
+    return back_to_orders()
+
+@leader_bp.route('/leader/orders/bulk-status', methods=['POST'])
+def bulk_update_order_status():
+    # e.g. "mark all of today's orders for my block as Delivered"
+    # Without ticked orders the scope must be "today", or "all" confirmed by
+    # the form's dialog: an unknown/missing scope must never mean every order
+    leader = GroupLeader.query.first()
+    order_ids = request.form.getlist('order_ids', type=int) or None
+    day = None
+    if not order_ids:
+        scope = request.form.get('scope', 'today')
+        if scope == 'today':
+            day = datetime.now(pytz.timezone('Asia/Singapore')).date()
+        elif scope != 'all':
+            flash(f"Unknown scope '{scope}': nothing was changed.", 'danger')
+            return back_to_orders()
+        elif request.form.get('confirm') != 'all':
+            flash("Marking all open orders needs confirmation: nothing was changed.", 'danger')
+            return back_to_orders()
+    try:
+        moved = bulk_transition(request.form.get('status'), leader_id=leader.id, day=day,
+                                order_ids=order_ids, actor=f"leader:{leader.id}")
+    except InvalidTransition as e:
+        flash(str(e), 'danger')
+        return back_to_orders()
+    flash(f"{moved} order(s) marked as {request.form.get('status')}.", 'success')
+    return back_to_orders()
+
+@leader_bp.route('/leader/api/orders/<int:order_id>/history')
+@query_budget(2)
+def order_status_history(order_id):
+    return jsonify([{
+        'from': t.from_status,
+        'to': t.to_status,
+        'actor': t.actor,
+        'at': t.created_at.isoformat(timespec='seconds')
+    } for t in order_history(order_id)])
+
+@leader_bp.route('/leader/pick-list')
+@query_budget(4)
+def pick_list():
+    # Today's printable pick list for this leader's drop only
+    leader = GroupLeader.query.first()
+    batch = picklists.select_leader(picklists.get_batch(), leader.id)
+    return render_template('pick_list.html', batch=batch)
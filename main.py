@@ -2,7 +2,6 @@ import os
 import io
 import csv
 import pytz
-import requests
 from datetime import datetime
 from flask import Flask, send_from_directory, render_template, Response, request, redirect, url_for, jsonify
 from dotenv import load_dotenv
@@ -11,12 +10,23 @@ from sqlalchemy import event
 # Database and Model Imports
 # Note: set_sqlite_pragma is the helper function we defined in models.py
 from models import db, WhatsAppOrder, GroupLeader, Product, StockAlert, Customer, WhatsAppLead, set_sqlite_pragma
+from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.attributes import flag_modified
+from migrations import ensure_schema
 
 # Blueprint Imports
 from contact.route import contact_bp 
+from contact.writer import init_inquiry_writer
 from admin.routes import admin_bp 
 from leader.route import leader_bp
+from products.catalog import catalog_bp
+from assets import init_assets
+from pages import render_page, serve_file
+from whatsapp.alerts import notify_restocked
+from whatsapp.outbox import init_outbox
+from leader.commission import leader_balance
+from orders.lifecycle import status_counts, TRANSITIONS, OPEN_STATUSES
+from querystats import init_query_stats, query_budget
 
 # Load environment variables (.env file)
 load_dotenv()
@@ -26,7 +36,7 @@ def create_app():
 
     # --- Database Configuration ---
     basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'leafplant.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'leafplant.db'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-123')
 
@@ -40,64 +50,19 @@ def create_app():
     # This prevents the "Working outside of application context" error.
     with app.app_context():
         event.listen(db.engine, "connect", set_sqlite_pragma)
+    init_query_stats(app)  # X-Query-Count / Server-Timing + @query_budget checks
 
     # Register Blueprints
     app.register_blueprint(contact_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(leader_bp)
+    app.register_blueprint(catalog_bp)  # /product page + /api/products
+    init_assets(app)  # /assets/* + css_bundle()/asset_url() template helpers
+    init_inquiry_writer(app)  # Batched background inserts for the contact form
+    init_outbox(app)  # Restock alerts etc. are sent after commit, off the request
 
     # ==============================================================================
-    # 1. AUTOMATED STOCK ALERT TRIGGER (WHATSAPP BROADCAST)
-    # ==============================================================================
-    def send_restock_broadcast(product_name, new_qty):
-        access_token = os.getenv("WHATSAPP_ACCESS_TOKEN")
-        phone_id = os.getenv("PHONE_NUMBER_ID")
-        
-        if not access_token or not phone_id:
-            print("⚠️ ALERT: WhatsApp credentials missing. Broadcast skipped.")
-            return
-
-        # Fetch only users waiting for this specific item who haven't been notified
-        pending_alerts = StockAlert.query.filter_by(
-            product_name=product_name, 
-            is_notified=False
-        ).all()
-        
-        if not pending_alerts:
-            print(f"ℹ️ No pending alerts for {product_name}")
-            return
-
-        for alert in pending_alerts:
-            message_body = (f"🌿 *FARM RESTOCK ALERT*\n\n"
-                            f"Hi! Good news from the farm: *{product_name}* is back in stock! "
-                            f"({new_qty} units available). 🚜\n\n"
-                            f"Would you like to place an order?")
-            
-            url = f"https://graph.facebook.com/v24.0/{phone_id}/messages"
-            headers = {"Authorization": f"Bearer {access_token}"}
-            payload = {
-                "messaging_product": "whatsapp",
-                "to": alert.customer_phone,
-                "type": "text",
-                "text": {"body": message_body}
-            }
-            
-            try:
-                response = requests.post(url, json=payload, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    # Mark notified so they don't get duplicate messages
-                    alert.is_notified = True 
-                    alert.notified_at = datetime.now(pytz.timezone('Asia/Singapore'))
-                    print(f"✅ Alert sent and DB marked for {alert.customer_phone}")
-                else:
-                    print(f"❌ WhatsApp API Error {response.status_code}: {response.text}")
-            except Exception as e:
-                print(f"❌ Broadcast Connection Error: {e}")
-        
-        db.session.commit() # Save all notified flags to leafplant.db
-
-    # ==============================================================================
-    # 2. PRODUCT UPDATE ROUTE (TRIGGERS BROADCAST)
+    # 1. PRODUCT UPDATE ROUTE (TRIGGERS BROADCAST)
     # ==============================================================================
     @app.route('/admin/update-stock-level', methods=['POST'])
     def update_stock_level():
@@ -127,12 +92,12 @@ def create_app():
         # 3. TRIGGER BROADCAST: If transitioned from OOS to In Stock
         if old_status == "Out of Stock" and product.status == "In Stock" and new_qty > 0:
             print(f"🚀 Triggering alerts for {product.name}...")
-            send_restock_broadcast(product.name, new_qty)
+            notify_restocked([product.name])
                 
         return redirect('/admin/dashboard#products')
 
     # ==============================================================================
-    # 3. FARM REPORT ROUTE (CSV EXPORT)
+    # 2. FARM REPORT ROUTE (CSV EXPORT)
     # ==============================================================================
     @app.route('/admin/generate-farm-report')
     def generate_farm_report():
@@ -163,24 +128,30 @@ def create_app():
         )
 
     # ==============================================================================
-    # 4. LEADER DASHBOARD ROUTE
+    # 3. LEADER DASHBOARD ROUTE
     # ==============================================================================
     @app.route('/leader')
+    @query_budget(8)
     def leader():
         leader_data = GroupLeader.query.first() 
         if not leader_data:
             return "No leader found. Please configure leaders in the Admin Panel."
 
-        orders = WhatsAppOrder.query.filter_by(leader_id=leader_data.id).all()
+        # buyer is joined in: the table shows order.buyer.name on every row
+        orders = WhatsAppOrder.query.options(joinedload(WhatsAppOrder.buyer))\
+            .filter_by(leader_id=leader_data.id).all()
         neighbors = Customer.query.filter_by(leader_id=leader_data.id).all()
         pending_leads = WhatsAppLead.query.filter(WhatsAppLead.neighborhood.ilike(f"%{leader_data.area}%")).all()
 
-        total_sales = sum(o.total_price for o in orders if o.order_status == 'Confirmed')
-        pending_commission = total_sales * 0.111
+        # Running totals from the commission ledger (no per-order re-summing)
+        balance = leader_balance(leader_data.id)
+        total_sales = balance.lifetime_sales
+        pending_commission = balance.open_amount + balance.unpaid_amount
         
         sgt = pytz.timezone('Asia/Singapore')
         today = datetime.now(sgt).date()
         today_orders_count = sum(1 for o in orders if o.timestamp.date() == today)
+        counts = status_counts(leader_data.id)
 
         return render_template('leader.html', 
                                leader=leader_data,
@@ -189,34 +160,43 @@ def create_app():
                                pending_leads=pending_leads,
                                total_sales=total_sales,
                                pending_commission=pending_commission,
-                               today_orders_count=today_orders_count)
+                               today_orders_count=today_orders_count,
+                               status_counts=counts,
+                               open_orders_count=sum(counts[s] for s in OPEN_STATUSES),
+                               transitions=TRANSITIONS)
 
     # ==============================================================================
-    # 5. GLOBAL PUBLIC ROUTES
+    # 4. GLOBAL PUBLIC ROUTES (Served from the rendered-page cache, see pages/)
     # ==============================================================================
     @app.route('/')
-    def index(): return render_template('index.html')
+    def index(): return render_page('index.html')
 
     @app.route('/about')
-    def about(): return render_template('about.html')
-
-    @app.route('/product')
-    def product():
-        all_products = Product.query.all() 
-        return render_template('product.html', products=all_products)
+    def about(): return render_page('about.html')
 
     @app.route('/article')
-    def article(): return render_template('article.html')
+    def article(): return render_page('article.html')
 
     @app.route('/account')
-    def account(): return render_template('account.html')
+    def account(): return render_page('account.html')
 
     @app.route('/favicon.ico')
     def favicon_root():
-        return send_from_directory(os.path.join(app.root_path, 'static', 'image'), 'favicon.png')
+        return serve_file(os.path.join(app.root_path, 'static', 'image'), 'favicon.png', 'image/png')
 
+    # One PRAGMA when the file is up to date; create/upgrade only when behind
     with app.app_context():
-        db.create_all()
+        ensure_schema()
+
+    # ==============================================================================
+    # 5. BACKGROUND SCHEDULER (Packing list, restock sweep, rollups)
+    # ==============================================================================
+    # Opt-in so CLI scripts and tests don't spawn threads. Safe with several
+    # workers: each job takes a DB lease before running.
+    if os.getenv('ENABLE_SCHEDULER') == '1':
+        from scheduler.jobs import build_scheduler
+        app.extensions['scheduler'] = build_scheduler(app)
+        app.extensions['scheduler'].start()
 
     return app
 
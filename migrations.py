@@ -0,0 +1,241 @@
+import os
+import zlib
+from sqlalchemy import text
+from models import db, get_sg_time, WhatsAppOrder
+
+# ==============================================================================
+# SCHEMA UPGRADES FOR EXISTING leafplant.db FILES
+# ==============================================================================
+# db.create_all() only creates missing tables - it never adds columns or indexes
+# to a table that already exists. Each step below is idempotent and runs right
+# after create_all(), so old database files pick up new constraints safely.
+
+def _has_column(conn, table, column):
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+    return any(row[1] == column for row in rows)
+
+# --- STEP 1: One StockAlert row per (phone, product) ---
+def _dedupe_stock_alerts(conn):
+    # Keep the newest row of each duplicate group, still pending if any copy was pending
+    conn.execute(text("""
+        UPDATE stock_alert SET is_notified = 0, notified_at = NULL
+        WHERE id IN (
+            SELECT MAX(id) FROM stock_alert
+            GROUP BY customer_phone, product_name
+            HAVING MIN(is_notified) = 0 AND COUNT(*) > 1
+        )
+    """))
+    conn.execute(text("""
+        DELETE FROM stock_alert
+        WHERE id NOT IN (SELECT MAX(id) FROM stock_alert GROUP BY customer_phone, product_name)
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_alert_phone_product "
+        "ON stock_alert (customer_phone, product_name)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_stock_alert_product_pending "
+        "ON stock_alert (product_name, is_notified)"
+    ))
+
+# --- STEP 2: Idempotency key on WhatsApp orders ---
+def _add_order_idempotency_key(conn):
+    if not _has_column(conn, 'whats_app_order', 'idempotency_key'):
+        conn.execute(text("ALTER TABLE whats_app_order ADD COLUMN idempotency_key VARCHAR(120)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_whats_app_order_idempotency_key "
+        "ON whats_app_order (idempotency_key)"
+    ))
+
+# --- STEP 3: Product.updated_at for catalog caching ---
+def _add_product_updated_at(conn):
+    if not _has_column(conn, 'product', 'updated_at'):
+        conn.execute(text("ALTER TABLE product ADD COLUMN updated_at DATETIME"))
+        conn.execute(text("UPDATE product SET updated_at = :now"), {"now": get_sg_time().replace(tzinfo=None)})
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_product_updated_at ON product (updated_at)"))
+
+# --- STEP 4: Admin inbox indexes ---
+def _add_inquiry_indexes(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_contact_inquiry_status_id ON contact_inquiry (status, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_contact_inquiry_created_at ON contact_inquiry (created_at)"
+    ))
+
+# --- STEP 5: Time-range index for analytics loads ---
+def _add_order_timestamp_index(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_whats_app_order_timestamp ON whats_app_order (timestamp)"
+    ))
+
+# --- STEP 6: Seed the commission ledger from existing confirmed orders ---
+def _seed_commission_ledger(conn):
+    if conn.execute(text("SELECT 1 FROM commission_entry LIMIT 1")).first():
+        return
+    # commission_earned was stored per order at write time; older rows may lack it
+    conn.execute(text("""
+        INSERT INTO commission_entry (leader_id, order_id, kind, sales_amount, rate, amount, created_at)
+        SELECT leader_id, id, 'accrual', total_price,
+               CASE WHEN total_price > 0 THEN COALESCE(commission_earned, total_price * 0.111) / total_price ELSE 0 END,
+               ROUND(COALESCE(commission_earned, total_price * 0.111), 2), timestamp
+        FROM whats_app_order
+        WHERE leader_id IS NOT NULL AND order_status = 'Confirmed'
+    """))
+    conn.execute(text("""
+        INSERT OR IGNORE INTO commission_balance
+            (leader_id, open_sales, open_amount, unpaid_amount, paid_amount,
+             lifetime_sales, lifetime_amount, order_count, updated_at)
+        SELECT leader_id, ROUND(SUM(sales_amount), 2), ROUND(SUM(amount), 2), 0, 0,
+               ROUND(SUM(sales_amount), 2), ROUND(SUM(amount), 2), COUNT(*), :now
+        FROM commission_entry GROUP BY leader_id
+    """), {"now": get_sg_time().replace(tzinfo=None)})
+
+# --- STEP 7: Order lifecycle (status index, history column, status counts) ---
+def _add_order_lifecycle(conn):
+    if not _has_column(conn, 'whats_app_order', 'status_changed_at'):
+        conn.execute(text("ALTER TABLE whats_app_order ADD COLUMN status_changed_at DATETIME"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_whats_app_order_order_status ON whats_app_order (order_status)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_whats_app_order_leader_status "
+        "ON whats_app_order (leader_id, order_status, timestamp)"
+    ))
+    if conn.execute(text("SELECT 1 FROM order_status_count LIMIT 1")).first():
+        return
+    conn.execute(text("""
+        INSERT INTO order_status_count (leader_id, status, count)
+        SELECT COALESCE(leader_id, 0), order_status, COUNT(*)
+        FROM whats_app_order WHERE order_status IS NOT NULL
+        GROUP BY COALESCE(leader_id, 0), order_status
+    """))
+
+# --- STEP 8: order_history view (live + archived orders, see retention/) ---
+def _create_order_history_view(conn):
+    # Recreated every time: it lists columns, so it must follow the live table
+    columns = ', '.join(c.name for c in WhatsAppOrder.__table__.columns)
+    conn.execute(text("DROP VIEW IF EXISTS order_history"))
+    conn.execute(text(f"""
+        CREATE VIEW order_history AS
+        SELECT {columns} FROM whats_app_order
+        UNION ALL
+        SELECT {columns} FROM archived_whats_app_order
+    """))
+
+# --- STEP 9: Full-text search (FTS5 indexes over inquiries, customers, orders) ---
+# External content tables: the index holds tokens only and reads the text back
+# from the real table (snippets). Triggers keep it in sync; the UPDATE trigger
+# only fires when an indexed column changes, so status updates cost nothing.
+SEARCH_INDEXES = {
+    # FTS table: (content table, indexed columns) - see admin/search.py
+    'contact_inquiry_fts': ('contact_inquiry', ('name', 'email', 'message')),
+    'customer_fts': ('customer', ('name', 'phone')),
+    'whats_app_order_fts': ('whats_app_order', ('product_name',)),
+}
+
+def _add_search_indexes(conn):
+    for fts, (table, columns) in SEARCH_INDEXES.items():
+        names = ', '.join(columns)
+        new_values = ', '.join(f"new.{c}" for c in columns)
+        old_values = ', '.join(f"old.{c}" for c in columns)
+        existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": fts}).first()
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});
+            END
+        """))
+        if not existed:
+            # Index the rows that were there before the triggers
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+# --- STEP 10: Commission rate change marker (leader/commission.py cache key) ---
+def _add_commission_rate_updated_at(conn):
+    if not _has_column(conn, 'commission_rate', 'updated_at'):
+        conn.execute(text("ALTER TABLE commission_rate ADD COLUMN updated_at DATETIME"))
+        conn.execute(text("UPDATE commission_rate SET updated_at = :now"), {"now": get_sg_time().replace(tzinfo=None)})
+
+UPGRADE_STEPS = [
+    _dedupe_stock_alerts,
+    _add_order_idempotency_key,
+    _add_product_updated_at,
+    _add_inquiry_indexes,
+    _add_order_timestamp_index,
+    _seed_commission_ledger,
+    _add_order_lifecycle,
+    _create_order_history_view,
+    _add_search_indexes,
+    _add_commission_rate_updated_at,
+]
+
+def upgrade_schema():
+    with db.engine.begin() as conn:
+        for step in UPGRADE_STEPS:
+            step(conn)
+
+# ==============================================================================
+# SCHEMA STAMP (Apps check one PRAGMA at boot instead of running create_all)
+# ==============================================================================
+# The stamp is a checksum of every table/column/index in models.py plus the
+# upgrade step names, kept in SQLite's PRAGMA user_version. It changes whenever
+# a model or step changes, so a fresh checkout or a pull with new tables still
+# gets its schema on the next boot - but a worker booting against an
+# up-to-date file no longer reflects and re-checks every table.
+#   python -m migrations   -> create/upgrade now (e.g. before starting workers)
+#   AUTO_MIGRATE=0         -> apps never touch the schema, only warn if behind
+def schema_stamp():
+    parts = []
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(table.name + ':' + ','.join(c.name for c in table.columns))
+        parts.extend(sorted(index.name for index in table.indexes))
+    parts.extend(step.__name__ for step in UPGRADE_STEPS)
+    return zlib.crc32('|'.join(parts).encode()) & 0x7FFFFFFF  # user_version is a signed 32-bit int
+
+def schema_is_current():
+    with db.engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar() == schema_stamp()
+
+def init_db():
+    # create_all + every upgrade step, then stamp the file
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if not conn.execute(text("SELECT 1 FROM sqlite_master LIMIT 1")).first():
+            # Brand-new file: incremental auto-vacuum lets retention/ shrink it
+            # page by page later (this can only be set before the first table)
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+    db.create_all()
+    upgrade_schema()
+    with db.engine.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {schema_stamp()}"))
+
+def ensure_schema():
+    # Called by the apps at boot (inside an app context)
+    if schema_is_current():
+        return False
+    if os.getenv('AUTO_MIGRATE', '1') == '0':
+        print("⚠️ Database schema is out of date - run: python -m migrations")
+        return False
+    init_db()
+    print("✅ Database schema created/upgraded")
+    return True
+
+if __name__ == '__main__':
+    from main import create_app
+    with create_app().app_context():
+        init_db()
+        print(f"✅ Schema up to date (stamp {schema_stamp()})")
@@ -25,18 +25,27 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 # 1. WEBSITE DATA: Customer Service (Web Form)
 # ==============================================================================
 class ContactInquiry(db.Model):
+    __table_args__ = (
+        # Inbox filters + per-status counts are index-only scans on (status, id)
+        db.Index('ix_contact_inquiry_status_id', 'status', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20))
     message = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='Pending') 
-    created_at = db.Column(db.DateTime, default=get_sg_time)
+    created_at = db.Column(db.DateTime, default=get_sg_time, index=True)
 
 # ==============================================================================
 # 2. WHATSAPP DATA: Sales & Lead Intake
 # ==============================================================================
 class WhatsAppOrder(db.Model):
+    __table_args__ = (
+        db.Index('uq_whats_app_order_idempotency_key', 'idempotency_key', unique=True),
+        # Leader bulk actions + status filters: (leader, status, day) is one index range
+        db.Index('ix_whats_app_order_leader_status', 'leader_id', 'order_status', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'))
@@ -46,8 +55,13 @@ class WhatsAppOrder(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     commission_earned = db.Column(db.Float, default=0.0)
-    order_status = db.Column(db.String(50), default='New Order')
-    timestamp = db.Column(db.DateTime, default=get_sg_time)
+    order_status = db.Column(db.String(50), default='New Order', index=True)  # See orders/lifecycle.py
+    status_changed_at = db.Column(db.DateTime, nullable=True)
+    timestamp = db.Column(db.DateTime, default=get_sg_time, index=True)
+    # "<turn>:<line no>" - the turn is the inbound WhatsApp message that the
+    # confirmed summary came from, so a retried webhook or a repeated "yes"
+    # hits the unique index instead of creating a second order
+    idempotency_key = db.Column(db.String(120), nullable=True)
 
 class WhatsAppLead(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -68,6 +82,19 @@ class Product(db.Model):
     status = db.Column(db.String(50), default='In Stock')
     image_file = db.Column(db.String(100), nullable=False, default='default_product.jpg')
     category = db.Column(db.String(50), nullable=False, default='leafy')
+    # Bumped on every write (ORM or Core UPDATE); drives catalog ETag/Last-Modified
+    updated_at = db.Column(db.DateTime, default=get_sg_time, onupdate=get_sg_time, index=True)
+
+class ProductVelocity(db.Model):
+    # Exponentially decayed sales rates (units/day), updated in O(1) by each
+    # order commit - see products/velocity.py. Rates are stored as of
+    # last_sale_at and decayed to "now" when read.
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    fast_rate = db.Column(db.Float, default=0.0)   # ~1 day memory: reacts to spikes
+    slow_rate = db.Column(db.Float, default=0.0)   # ~7 day memory: steady demand
+    units_sold = db.Column(db.Integer, default=0)
+    first_sale_at = db.Column(db.DateTime, nullable=True)
+    last_sale_at = db.Column(db.DateTime, nullable=True)
 
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -86,9 +113,245 @@ class GroupLeader(db.Model):
     leader_orders = db.relationship('WhatsAppOrder', backref='handling_leader', lazy=True)
 
 class StockAlert(db.Model):
+    # One subscription per (phone, product): re-subscribing re-arms the same row
+    __table_args__ = (
+        db.Index('uq_stock_alert_phone_product', 'customer_phone', 'product_name', unique=True),
+        db.Index('ix_stock_alert_product_pending', 'product_name', 'is_notified'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_phone = db.Column(db.String(20), nullable=False)
     product_name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=get_sg_time) 
     is_notified = db.Column(db.Boolean, default=False, nullable=False)
-    notified_at = db.Column(db.DateTime, nullable=True)
\ No newline at end of file
+    notified_at = db.Column(db.DateTime, nullable=True)
+
+class ConversationState(db.Model):
+    # Where a customer is in the WhatsApp sales flow. Shared by every webhook
+    # worker (and survives restarts) so short replies like "YES" or "3" can be
+    # resolved without the LLM. Rows past expires_at are treated as absent.
+    phone = db.Column(db.String(20), primary_key=True)
+    state = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.Text, default='{}')
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=get_sg_time)
+
+class ConversationSummary(db.Model):
+    # Rolling, fixed-size digest of a customer's conversation (cart, product
+    # being asked about, last confirmed order). Older turns are folded into it
+    # so the sales prompt only replays the last few messages verbatim - see
+    # whatsapp/compactor.py.
+    phone = db.Column(db.String(20), primary_key=True)
+    summary = db.Column(db.Text, default='{}')
+    folded_turns = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=get_sg_time)
+
+class RateLimitBucket(db.Model):
+    # Shared token buckets for the webhook rate limiter, used only with
+    # RATE_LIMIT_BACKEND=sqlite (several worker processes). A bucket is stored
+    # as the time it would be full again (epoch seconds), see whatsapp/ratelimit.py.
+    key = db.Column(db.String(40), primary_key=True)   # "phone:<number>" / "global"
+    full_at = db.Column(db.Float, nullable=False, default=0.0)
+    notice_until = db.Column(db.Float, default=0.0)
+
+# ==============================================================================
+# 4. BACKGROUND JOBS: Scheduler State, Run History & Rollups
+# ==============================================================================
+class JobState(db.Model):
+    # One row per scheduled job. locked_by/locked_until act as a lease so only
+    # one worker (or one process) runs a given job at a time.
+    name = db.Column(db.String(100), primary_key=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+class JobRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, default=get_sg_time)
+    duration_ms = db.Column(db.Float, default=0.0)
+    rows_read = db.Column(db.Integer, default=0)
+    rows_written = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='Success')
+    error = db.Column(db.Text, nullable=True)
+
+class DailySalesRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.String(10), nullable=False, index=True)  # YYYY-MM-DD (SGT)
+    leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'))
+    product_name = db.Column(db.String(100), nullable=False)
+    order_count = db.Column(db.Integer, default=0)
+    total_qty = db.Column(db.Integer, default=0)
+    total_sales = db.Column(db.Float, default=0.0)
+
+# ==============================================================================
+# 5. ANALYTICS: Materialized demand tables (rebuilt by analytics/engine.py)
+# ==============================================================================
+# scope is 'product' (key = product name) or 'leader' (key = leader id).
+# Readers only ever see a complete refresh: each run replaces all rows in one
+# transaction.
+class DemandCurvePoint(db.Model):
+    __table_args__ = (
+        db.Index('ix_demand_curve_scope_key_day', 'scope', 'key', 'day'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD (SGT)
+    qty = db.Column(db.Float, default=0.0)
+    sales = db.Column(db.Float, default=0.0)
+    rolling_7d = db.Column(db.Float, default=0.0)
+
+class DemandForecast(db.Model):
+    __table_args__ = (
+        db.Index('ix_demand_forecast_scope_key', 'scope', 'key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    label = db.Column(db.String(100))
+    avg_daily_qty = db.Column(db.Float, default=0.0)    # Last 28 days
+    trend_pct = db.Column(db.Float, nullable=True)      # Last 7 days vs the 7 before
+    sell_through = db.Column(db.Float, nullable=True)   # Sold / (sold + on hand), products only
+    forecast_day = db.Column(db.String(10), nullable=False)
+    forecast_qty = db.Column(db.Float, default=0.0)
+    source_max_id = db.Column(db.Integer, default=0)    # Newest order id the run saw
+    computed_at = db.Column(db.DateTime, default=get_sg_time)
+
+class DemandSeasonality(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    factor = db.Column(db.Float, default=1.0)
+
+# ==============================================================================
+# 6. COMMISSION LEDGER: Rates, running balances, entries & payout periods
+# ==============================================================================
+# Written in the same transaction as each confirmed order (leader/commission.py),
+# so dashboards and payout reports read one balance row per leader instead of
+# summing every order.
+class CommissionRate(db.Model):
+    # Most specific match wins: leader+product > product > leader > global default
+    __table_args__ = (
+        db.Index('uq_commission_rate_scope', 'leader_id', 'product_name', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'), nullable=True)
+    product_name = db.Column(db.String(100), nullable=True)
+    rate = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, default=get_sg_time, onupdate=get_sg_time)  # Workers' rate caches key on it
+
+class CommissionBalance(db.Model):
+    leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'), primary_key=True)
+    open_sales = db.Column(db.Float, default=0.0)      # Current (not yet closed) period
+    open_amount = db.Column(db.Float, default=0.0)
+    unpaid_amount = db.Column(db.Float, default=0.0)   # Closed periods awaiting payout
+    paid_amount = db.Column(db.Float, default=0.0)
+    lifetime_sales = db.Column(db.Float, default=0.0)
+    lifetime_amount = db.Column(db.Float, default=0.0)
+    order_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=get_sg_time, onupdate=get_sg_time)
+
+class CommissionEntry(db.Model):
+    __table_args__ = (
+        db.Index('ix_commission_entry_leader_period', 'leader_id', 'period_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('whats_app_order.id'), nullable=True, index=True)
+    kind = db.Column(db.String(20), default='accrual')  # accrual / reversal / adjustment
+    sales_amount = db.Column(db.Float, default=0.0)
+    rate = db.Column(db.Float, default=0.0)
+    amount = db.Column(db.Float, default=0.0)
+    period_id = db.Column(db.Integer, db.ForeignKey('commission_period.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=get_sg_time)
+
+class CommissionPeriod(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    leader_id = db.Column(db.Integer, db.ForeignKey('group_leader.id'), nullable=False, index=True)
+    closed_at = db.Column(db.DateTime, default=get_sg_time)
+    sales_amount = db.Column(db.Float, default=0.0)
+    amount = db.Column(db.Float, default=0.0)
+    entry_count = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='Closed')  # Closed -> Paid
+    paid_at = db.Column(db.DateTime, nullable=True)
+
+# ==============================================================================
+# 7. ORDER LIFECYCLE: Status history & per-leader status counts
+# ==============================================================================
+# Both are written in the same transaction as the status change (see
+# orders/lifecycle.py). Dashboards read OrderStatusCount instead of counting
+# orders; leader_id 0 holds orders without a leader.
+class OrderTransition(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('whats_app_order.id'), nullable=False, index=True)
+    from_status = db.Column(db.String(50))
+    to_status = db.Column(db.String(50), nullable=False)
+    actor = db.Column(db.String(100))   # "leader:3", "admin", "whatsapp"...
+    created_at = db.Column(db.DateTime, default=get_sg_time)
+
+class OrderStatusCount(db.Model):
+    leader_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0)
+
+# ==============================================================================
+# 8. OUTBOX: Every outbound WhatsApp message, written with the change behind it
+#    (plus the inbound messages still waiting for their coalesced turn)
+# ==============================================================================
+# Rows are added in the same transaction as the order / alert update and sent
+# later by whatsapp/outbox.py (Pending -> Sending -> Sent, or Dead after
+# MAX_ATTEMPTS). dedup_key stops the same reply being queued twice.
+class OutboundMessage(db.Model):
+    __table_args__ = (
+        db.Index('uq_outbound_message_dedup_key', 'dedup_key', unique=True),
+        db.Index('ix_outbound_message_status_due', 'status', 'next_attempt_at'),
+        db.Index('ix_outbound_message_phone_status', 'to_phone', 'status'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    to_phone = db.Column(db.String(20), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    kind = db.Column(db.String(30), default='reply')   # reply / order / restock
+    dedup_key = db.Column(db.String(120), nullable=True)
+    status = db.Column(db.String(20), default='Pending')
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Lease on a Sending row
+    last_error = db.Column(db.String(300), nullable=True)
+    created_at = db.Column(db.DateTime, default=get_sg_time)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+# Inbound messages held by the coalescer (whatsapp/inbound.py): written before
+# the webhook answers Meta, deleted with the turn's reply, replayed at startup.
+class PendingInbound(db.Model):
+    __table_args__ = (
+        db.Index('uq_pending_inbound_msg_id', 'msg_id', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    msg_id = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.Integer, default=0)  # Meta's send time (epoch seconds)
+    profile_name = db.Column(db.String(100), nullable=True)
+    received_at = db.Column(db.DateTime, default=get_sg_time)
+
+# ==============================================================================
+# 9. ARCHIVE: Closed orders, notified alerts and resolved inquiries past retention
+# ==============================================================================
+# Same columns as the live table (ids kept, no foreign keys or unique indexes)
+# plus archived_at. Rows are moved here in batches by retention/archive.py;
+# reports that span history read the order_history view (live UNION ALL
+# archive, created in migrations.py).
+def archive_table(live, *indexes):
+    columns = [db.Column(c.name, c.type, primary_key=c.primary_key) for c in live.columns]
+    return db.Table('archived_' + live.name, db.metadata, *columns,
+                    db.Column('archived_at', db.DateTime), *indexes)
+
+archived_orders = archive_table(WhatsAppOrder.__table__,
+                                db.Index('ix_archived_whats_app_order_timestamp', 'timestamp'))
+archived_order_transitions = archive_table(OrderTransition.__table__,
+                                           db.Index('ix_archived_order_transition_order_id', 'order_id'))
+archived_stock_alerts = archive_table(StockAlert.__table__)
+archived_inquiries = archive_table(ContactInquiry.__table__,
+                                   db.Index('ix_archived_contact_inquiry_created_at', 'created_at'))
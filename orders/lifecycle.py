@@ -0,0 +1,160 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import update, select, insert, func, literal, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, get_sg_time, WhatsAppOrder, OrderTransition, OrderStatusCount, Product
+from leader.commission import reverse_commission
+
+# ==============================================================================
+# ORDER LIFECYCLE (Confirmed -> Packing -> Out for Delivery -> Delivered)
+# ==============================================================================
+# Every status change is one set-based UPDATE, whether it moves one order or a
+# whole drop. In the same transaction it writes the OrderTransition history and
+# moves the OrderStatusCount aggregate, so dashboards never count orders.
+CONFIRMED = 'Confirmed'
+PACKING = 'Packing'
+OUT_FOR_DELIVERY = 'Out for Delivery'
+DELIVERED = 'Delivered'
+CANCELLED = 'Cancelled'
+STATUSES = [CONFIRMED, PACKING, OUT_FOR_DELIVERY, DELIVERED, CANCELLED]
+OPEN_STATUSES = [CONFIRMED, PACKING, OUT_FOR_DELIVERY]
+
+# Forward moves may skip steps (a leader can go straight to Delivered).
+# Nothing leaves Delivered or Cancelled.
+TRANSITIONS = {
+    'New Order': {CONFIRMED, CANCELLED},  # Legacy column default
+    CONFIRMED: {PACKING, OUT_FOR_DELIVERY, DELIVERED, CANCELLED},
+    PACKING: {OUT_FOR_DELIVERY, DELIVERED, CANCELLED},
+    OUT_FOR_DELIVERY: {DELIVERED, CANCELLED},
+    DELIVERED: set(),
+    CANCELLED: set(),
+}
+
+class InvalidTransition(Exception):
+    pass
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+def sources_for(to_status):
+    if to_status not in STATUSES:
+        raise InvalidTransition(f"Unknown order status '{to_status}'")
+    return sorted(status for status, targets in TRANSITIONS.items() if to_status in targets)
+
+# ==============================================================================
+# 1. STATUS COUNTS (Aggregate, moved in the same transaction)
+# ==============================================================================
+def bump_counts(deltas):
+    # deltas: {(leader_id or 0, status): +/- n}
+    for (leader_id, status), delta in deltas.items():
+        if not delta:
+            continue
+        stmt = sqlite_insert(OrderStatusCount).values(leader_id=leader_id, status=status, count=delta)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['leader_id', 'status'],
+            set_={'count': OrderStatusCount.count + stmt.excluded.count}
+        ))
+
+def record_new_orders(orders, actor='whatsapp'):
+    # Called by finalize_order before its commit
+    now = sg_now()
+    db.session.execute(insert(OrderTransition), [
+        dict(order_id=o.id, from_status=None, to_status=o.order_status, actor=actor, created_at=now)
+        for o in orders
+    ])
+    deltas = {}
+    for o in orders:
+        key = (o.leader_id or 0, o.order_status)
+        deltas[key] = deltas.get(key, 0) + 1
+    bump_counts(deltas)
+
+def status_counts(leader_id=None):
+    query = db.session.query(OrderStatusCount.status, func.sum(OrderStatusCount.count))
+    if leader_id is not None:
+        query = query.filter(OrderStatusCount.leader_id == leader_id)
+    counts = {status: 0 for status in STATUSES}
+    counts.update({status: int(n or 0) for status, n in query.group_by(OrderStatusCount.status).all()})
+    return counts
+
+# ==============================================================================
+# 2. TRANSITIONS (One UPDATE per call, any number of orders)
+# ==============================================================================
+def _order_filters(sources, leader_id=None, day=None, order_ids=None):
+    filters = [WhatsAppOrder.order_status.in_(sources)]
+    if leader_id is not None:
+        filters.append(WhatsAppOrder.leader_id == leader_id)
+    if day is not None:
+        start = datetime.combine(day, time.min)
+        filters += [WhatsAppOrder.timestamp >= start, WhatsAppOrder.timestamp < start + timedelta(days=1)]
+    if order_ids is not None:
+        filters.append(WhatsAppOrder.id.in_(list(order_ids)))
+    return filters
+
+def _release_cancelled(filters):
+    # Stock goes back on the shelf and the leader's commission is clawed back
+    rows = db.session.execute(
+        select(WhatsAppOrder.id, WhatsAppOrder.leader_id, WhatsAppOrder.product_name,
+               WhatsAppOrder.quantity, WhatsAppOrder.total_price, WhatsAppOrder.commission_earned)
+        .where(*filters)
+    ).all()
+
+    returned = {}
+    for row in rows:
+        returned[row.product_name] = returned.get(row.product_name, 0) + row.quantity
+    for name, qty in returned.items():
+        db.session.execute(
+            update(Product).where(Product.name == name)
+            .values(available_qty=Product.available_qty + qty,
+                    status=case((Product.available_qty + qty > 0, "In Stock"), else_=Product.status))
+        )
+    reverse_commission(rows)
+
+def bulk_transition(to_status, leader_id=None, day=None, order_ids=None, actor=None):
+    sources = sources_for(to_status)
+    filters = _order_filters(sources, leader_id, day, order_ids)
+    now = sg_now()
+
+    # History first: the INSERT takes SQLite's write lock, so the rows it copies
+    # are exactly the rows the UPDATE below moves
+    db.session.execute(insert(OrderTransition).from_select(
+        ['order_id', 'from_status', 'to_status', 'actor', 'created_at'],
+        select(WhatsAppOrder.id, WhatsAppOrder.order_status, literal(to_status), literal(actor), literal(now))
+        .where(*filters)
+    ))
+    moved_from = db.session.execute(
+        select(func.coalesce(WhatsAppOrder.leader_id, 0), WhatsAppOrder.order_status, func.count())
+        .where(*filters).group_by(WhatsAppOrder.leader_id, WhatsAppOrder.order_status)
+    ).all()
+    if to_status == CANCELLED:
+        _release_cancelled(filters)
+
+    moved = db.session.execute(
+        update(WhatsAppOrder).where(*filters)
+        .values(order_status=to_status, status_changed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    deltas = {}
+    for leader, status, n in moved_from:
+        deltas[(leader, status)] = deltas.get((leader, status), 0) - n
+        deltas[(leader, to_status)] = deltas.get((leader, to_status), 0) + n
+    bump_counts(deltas)
+    db.session.commit()
+
+    if moved:
+        print(f"📦 {moved} order(s) -> {to_status} ({actor or 'system'})")
+    return moved
+
+def transition_order(order_id, to_status, actor=None, leader_id=None):
+    order = db.session.get(WhatsAppOrder, order_id)
+    if order is None or (leader_id is not None and order.leader_id != leader_id):
+        return None
+    if to_status not in TRANSITIONS.get(order.order_status, ()):
+        raise InvalidTransition(f"Order #{order_id} can't move from {order.order_status} to {to_status}")
+    if not bulk_transition(to_status, order_ids=[order_id], actor=actor):
+        # Someone else moved it between our read and the UPDATE
+        raise InvalidTransition(f"Order #{order_id} was just updated elsewhere - please refresh")
+    db.session.refresh(order)
+    return order
+
+def order_history(order_id):
+    return OrderTransition.query.filter_by(order_id=order_id).order_by(OrderTransition.id.asc()).all()
@@ -0,0 +1,181 @@
+import io
+import csv
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+import pytz
+from sqlalchemy import func, or_
+from models import db, WhatsAppOrder, GroupLeader, Customer
+from orders.lifecycle import CANCELLED
+
+# ==============================================================================
+# PICK LISTS (Harvest-day packing per leader -> customer -> product)
+# ==============================================================================
+# 1. One grouped query over the day's orders, already sorted for packing
+#    (drop point, then customer, then product).
+# 2. A single pass over those rows builds the nested pick lists plus the van
+#    loading totals per leader and for the whole run.
+# 3. The built batch is cached per day and reused until the day's orders change
+#    (new order, or a status change such as a cancellation).
+# CSV / XLSX / HTML are all rendered row by row from the cached batch.
+PICK_CACHE_DAYS = 3
+CSV_HEADER = ['Drop', 'Leader', 'Area', 'Customer', 'Phone', 'Product', 'Qty', 'Amount']
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def sg_today():
+    return datetime.now(pytz.timezone('Asia/Singapore')).date()
+
+def day_range(day):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+def mask_phone(phone):
+    # Packers only need enough to tell two neighbours apart
+    phone = str(phone or '').split('.')[0]
+    return f"•••• {phone[-4:]}" if len(phone) > 4 else phone
+
+# ==============================================================================
+# 1. BUILD (One grouped query, one pass)
+# ==============================================================================
+def _day_filters(day):
+    start, end = day_range(day)
+    return [WhatsAppOrder.timestamp >= start, WhatsAppOrder.timestamp < end]
+
+def day_signature(day):
+    # Changes whenever an order lands on this day or one of them changes status
+    return tuple(db.session.query(
+        func.max(WhatsAppOrder.id), func.count(WhatsAppOrder.id), func.max(WhatsAppOrder.status_changed_at)
+    ).filter(*_day_filters(day)).one())
+
+def _grouped_rows(day):
+    return db.session.query(
+        WhatsAppOrder.leader_id, GroupLeader.name, GroupLeader.area, GroupLeader.phone,
+        WhatsAppOrder.customer_phone, func.max(Customer.name),
+        WhatsAppOrder.product_name,
+        func.sum(WhatsAppOrder.quantity), func.sum(WhatsAppOrder.total_price), func.count(WhatsAppOrder.id)
+    ).outerjoin(GroupLeader, WhatsAppOrder.leader_id == GroupLeader.id)\
+     .outerjoin(Customer, WhatsAppOrder.customer_id == Customer.id)\
+     .filter(*_day_filters(day))\
+     .filter(or_(WhatsAppOrder.order_status.is_(None), WhatsAppOrder.order_status != CANCELLED))\
+     .group_by(WhatsAppOrder.leader_id, WhatsAppOrder.customer_phone, WhatsAppOrder.product_name)\
+     .order_by(WhatsAppOrder.leader_id.is_(None), GroupLeader.area, GroupLeader.name,
+               func.max(Customer.name), WhatsAppOrder.customer_phone, WhatsAppOrder.product_name)\
+     .all()
+
+def _add_totals(target, product, qty, amount, orders):
+    target['qty'] += qty
+    target['amount'] += amount
+    target['orders'] += orders
+    if product is not None:
+        target['products'][product] = target['products'].get(product, 0) + qty
+
+def build_batch(day, signature=None):
+    batch = {'day': day.isoformat(), 'signature': signature, 'leaders': [],
+             'qty': 0, 'amount': 0.0, 'orders': 0, 'products': {}}
+    leader = customer = None
+
+    for (leader_id, leader_name, area, leader_phone, phone, customer_name,
+         product, qty, amount, orders) in _grouped_rows(day):
+        qty, amount = int(qty or 0), round(amount or 0.0, 2)
+
+        # Rows arrive sorted, so a new leader/customer simply starts a new group
+        if leader is None or leader['leader_id'] != leader_id:
+            leader = {'leader_id': leader_id, 'drop': len(batch['leaders']) + 1,
+                      'name': leader_name or 'Unassigned', 'area': area or '-',
+                      'phone': str(leader_phone or '').split('.')[0],
+                      'customers': [], 'qty': 0, 'amount': 0.0, 'orders': 0, 'products': {}}
+            batch['leaders'].append(leader)
+            customer = None
+        if customer is None or customer['phone'] != phone:
+            customer = {'name': customer_name or 'Walk-in', 'phone': phone, 'masked_phone': mask_phone(phone),
+                        'lines': [], 'qty': 0, 'amount': 0.0, 'orders': 0, 'products': {}}
+            leader['customers'].append(customer)
+
+        customer['lines'].append({'product': product, 'qty': qty, 'amount': amount})
+        for target in (customer, leader, batch):
+            _add_totals(target, product, qty, amount, orders)
+
+    # Van loading: product totals sorted by name, per drop and for the whole run
+    for target in [batch] + batch['leaders']:
+        target['amount'] = round(target['amount'], 2)
+        target['products'] = sorted(target['products'].items())
+    return batch
+
+def get_batch(day=None):
+    day = day or sg_today()
+    signature = day_signature(day)
+    with _cache_lock:
+        cached = _cache.get(day)
+        if cached is not None and cached['signature'] == signature:
+            _cache.move_to_end(day)
+            return cached
+
+    batch = build_batch(day, signature)
+    with _cache_lock:
+        _cache[day] = batch
+        _cache.move_to_end(day)
+        while len(_cache) > PICK_CACHE_DAYS:
+            _cache.popitem(last=False)
+    return batch
+
+def select_leader(batch, leader_id=None):
+    # A single leader's pick list keeps the batch shape so every renderer works on it
+    if leader_id is None:
+        return batch
+    leaders = [l for l in batch['leaders'] if l['leader_id'] == leader_id]
+    picked = dict(batch, leaders=leaders)
+    picked.update({k: leaders[0][k] if leaders else v for k, v in
+                   (('qty', 0), ('amount', 0.0), ('orders', 0), ('products', []))})
+    return picked
+
+# ==============================================================================
+# 2. RENDERERS (Row by row from the batch)
+# ==============================================================================
+def iter_rows(batch):
+    for leader in batch['leaders']:
+        for customer in leader['customers']:
+            for line in customer['lines']:
+                yield [leader['drop'], leader['name'], leader['area'], customer['name'], customer['masked_phone'],
+                       line['product'], line['qty'], f"{line['amount']:.2f}"]
+        for product, qty in leader['products']:
+            yield [leader['drop'], leader['name'], leader['area'], 'VAN TOTAL', '', product, qty, '']
+    for product, qty in batch['products']:
+        yield ['', 'ALL DROPS', '', 'VAN TOTAL', '', product, qty, '']
+
+def iter_csv(batch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for row in iter_rows(batch):
+        writer.writerow(row)
+        if buffer.tell() > 16_384:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def write_csv(batch, path):
+    with open(path, mode='w', newline='', encoding='utf-8') as file:
+        for chunk in iter_csv(batch):
+            file.write(chunk)
+
+def xlsx_bytes(batch):
+    # Write-only workbook: rows are streamed into the sheet XML, not held as cells
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Pick List')
+    sheet.append(CSV_HEADER)
+    for row in iter_rows(batch):
+        sheet.append(row[:7] + [float(row[7]) if row[7] else None])
+
+    van = workbook.create_sheet('Van Load')
+    van.append(['Drop', 'Leader', 'Product', 'Qty'])
+    for leader in batch['leaders']:
+        for product, qty in leader['products']:
+            van.append([leader['drop'], leader['name'], product, qty])
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
@@ -0,0 +1,163 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app, render_template, request, make_response
+from assets import DIST_DIR, manifest_mtime
+
+# Optional: brotli bodies for browsers that accept them
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ==============================================================================
+# RENDERED-PAGE CACHE (Static marketing pages)
+# ==============================================================================
+# index/about/article/account only change when their template (or the asset
+# manifest they link to) changes. Each page is rendered once per version,
+# compressed once, and then served from memory with ETag/Last-Modified - so a
+# broadcast spike never touches Jinja. Versions are keyed on file mtimes, so
+# editing a template or running assets.build picks up the new output.
+PAGE_CACHE_SIZE = 32
+PAGE_MAX_AGE = 300  # Browsers revalidate after 5 minutes (cheap 304s)
+COMPRESS_MIN_BYTES = 512
+SNAPSHOT_DIR = os.getenv('PAGE_SNAPSHOT_DIR') or os.path.join(DIST_DIR, 'pages')
+CACHED_TEMPLATES = ['index.html', 'about.html', 'article.html', 'account.html']
+
+class CachedPage:
+    def __init__(self, version, body, mimetype, last_modified):
+        self.version = version
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.bodies = {None: body}
+
+    def compress(self):
+        body = self.bodies[None]
+        if len(body) < COMPRESS_MIN_BYTES:
+            return self
+        self.bodies['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+        return self
+
+_pages = OrderedDict()
+_lock = threading.Lock()
+
+def _cache_get(name, version):
+    with _lock:
+        page = _pages.get(name)
+        if page is None or page.version != version:
+            return None
+        _pages.move_to_end(name)
+        return page
+
+def _cache_put(name, page):
+    with _lock:
+        _pages[name] = page
+        _pages.move_to_end(name)
+        while len(_pages) > PAGE_CACHE_SIZE:
+            _pages.popitem(last=False)
+
+def clear_page_cache():
+    with _lock:
+        _pages.clear()
+
+# ==============================================================================
+# 1. VERSIONING (Template mtime + asset manifest mtime)
+# ==============================================================================
+def template_path(template):
+    return os.path.join(current_app.root_path, current_app.template_folder, template)
+
+def page_version(source_path):
+    source_mtime = os.path.getmtime(source_path)
+    assets_mtime = manifest_mtime() or 0
+    version = hashlib.sha1(f"{source_mtime}|{assets_mtime}".encode()).hexdigest()[:12]
+    last_modified = datetime.fromtimestamp(int(max(source_mtime, assets_mtime)), timezone.utc)
+    return version, last_modified
+
+# ==============================================================================
+# 2. ON-DISK SNAPSHOTS (Optional, survive restarts)
+# ==============================================================================
+# python -m pages renders every page into SNAPSHOT_DIR. When that folder
+# exists, a fresh worker loads the pre-rendered bytes instead of rendering,
+# and new versions are written back to it.
+SNAPSHOT_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+def snapshot_path(name, version):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.{version}")
+
+def load_snapshot(name, version, mimetype, last_modified):
+    path = snapshot_path(name, version)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        page = CachedPage(version, f.read(), mimetype, last_modified)
+    for encoding, suffix in SNAPSHOT_SUFFIXES.items():
+        if os.path.isfile(path + suffix):
+            with open(path + suffix, 'rb') as f:
+                page.bodies[encoding] = f.read()
+    return page
+
+def save_snapshot(name, page):
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return
+    path = snapshot_path(name, page.version)
+    for encoding, body in page.bodies.items():
+        tmp_path = path + SNAPSHOT_SUFFIXES.get(encoding, '') + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, tmp_path[:-4])
+
+# ==============================================================================
+# 3. SERVING
+# ==============================================================================
+def get_page(name, source_path, build, mimetype):
+    version, last_modified = page_version(source_path)
+    page = _cache_get(name, version)
+    if page is None:
+        page = load_snapshot(name, version, mimetype, last_modified)
+        if page is None:
+            page = CachedPage(version, build(), mimetype, last_modified)
+            if mimetype.startswith('text/'):
+                page.compress()
+            save_snapshot(name, page)
+        _cache_put(name, page)
+    return page
+
+def respond(page):
+    # 304 before picking a body: revalidations cost one stat() per file
+    if request.if_none_match.contains(page.etag) or (
+            not request.if_none_match and request.if_modified_since
+            and request.if_modified_since >= page.last_modified):
+        response = make_response('', 304)
+    else:
+        accepted = request.accept_encodings
+        encoding = next((e for e in ('br', 'gzip') if e in page.bodies and accepted[e]), None)
+        response = make_response(page.bodies[encoding])
+        response.mimetype = page.mimetype
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.headers['Cache-Control'] = f'public, max-age={PAGE_MAX_AGE}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def build_template_page(template):
+    name = os.path.splitext(template)[0]
+    return get_page(name, template_path(template),
+                    lambda: render_template(template).encode('utf-8'), 'text/html')
+
+def render_page(template):
+    return respond(build_template_page(template))
+
+def serve_file(directory, filename, mimetype):
+    def read():
+        with open(os.path.join(directory, filename), 'rb') as f:
+            return f.read()
+    page = get_page(filename, os.path.join(directory, filename), read, mimetype)
+    return respond(page)
@@ -0,0 +1,26 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import create_app
+from pages import SNAPSHOT_DIR, CACHED_TEMPLATES, build_template_page, clear_page_cache
+
+# ==============================================================================
+# PRE-RENDER STATIC PAGES TO DISK
+# ==============================================================================
+# Usage: python -m pages   (run after python -m assets.build on deploy)
+# Every worker then starts with the rendered + compressed pages on disk.
+def main():
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    app = create_app()
+    with app.test_request_context('/'):
+        clear_page_cache()
+        for template in CACHED_TEMPLATES:
+            page = build_template_page(template)
+            sizes = ", ".join(f"{enc or 'raw'} {len(body) / 1024:.1f} KB" for enc, body in page.bodies.items())
+            print(f"📄 {template} [{page.version}]: {sizes}")
+    print(f"✅ Snapshots written to {SNAPSHOT_DIR}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import hashlib
+from collections import OrderedDict
+import pytz
+from flask import Blueprint, render_template, request, jsonify, make_response
+from sqlalchemy import event, func
+from models import db, Product
+from querystats import query_budget
+
+catalog_bp = Blueprint('catalog', __name__)
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+FRAGMENT_CACHE_SIZE = 128
+
+# ==============================================================================
+# 1. CATALOG QUERY (Server-side filters + keyset pagination)
+# ==============================================================================
+# Pages are keyed on Product.id ("after" = last id of the previous page), so
+# page 50 costs the same as page 1 - no OFFSET scans.
+def query_products(category=None, search=None, after_id=None, limit=PAGE_SIZE):
+    query = Product.query
+    if category and category != 'all':
+        query = query.filter(func.lower(Product.category) == category.lower())
+    if search:
+        query = query.filter(Product.name.ilike(f"%{search}%"))
+    if after_id:
+        query = query.filter(Product.id > after_id)
+
+    rows = query.order_by(Product.id.asc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def catalog_fingerprint():
+    # One indexed aggregate: any insert/update/delete changes count or max(updated_at)
+    count, last_updated = db.session.query(func.count(Product.id), func.max(Product.updated_at)).one()
+    return count, last_updated
+
+def read_catalog_args():
+    category = (request.args.get('category') or 'all').strip().lower()
+    search = (request.args.get('q') or '').strip()
+    after_id = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return category, search, after_id, limit
+
+def make_etag(fingerprint, *args):
+    raw = "|".join(str(part) for part in (*fingerprint, *args))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def conditional(response, etag, last_updated):
+    # Browsers revalidate every time, but get a 304 while the catalog is unchanged
+    response.set_etag(etag)
+    if last_updated:
+        response.last_modified = pytz.timezone('Asia/Singapore').localize(last_updated).astimezone(pytz.utc)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# ==============================================================================
+# 2. RENDERED GRID FRAGMENT CACHE
+# ==============================================================================
+# Keyed on (fingerprint, filters, cursor). A product write changes the
+# fingerprint, so stale fragments are never served, and ORM writes in this
+# process also clear the cache straight away.
+_fragment_cache = OrderedDict()
+
+def invalidate_fragments(*_args):
+    _fragment_cache.clear()
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Product, _event_name, invalidate_fragments)
+
+def render_grid(fingerprint, category, search, after_id, limit):
+    key = (fingerprint, category, search, after_id, limit)
+    if key in _fragment_cache:
+        _fragment_cache.move_to_end(key)
+        return _fragment_cache[key]
+
+    products, next_cursor = query_products(category, search, after_id, limit)
+    html = render_template('_product_grid.html', products=products)
+    _fragment_cache[key] = (html, next_cursor)
+    if len(_fragment_cache) > FRAGMENT_CACHE_SIZE:
+        _fragment_cache.popitem(last=False)
+    return html, next_cursor
+
+# ==============================================================================
+# 3. ROUTES
+# ==============================================================================
+@catalog_bp.route('/product')
+@query_budget(3)
+def product():
+    category, search, after_id, limit = read_catalog_args()
+    fingerprint = catalog_fingerprint()
+    partial = request.args.get('partial') == '1'
+    etag = make_etag(fingerprint, category, search, after_id, limit, partial)
+
+    # Repeat visitor with an unchanged catalog: skip rendering entirely
+    if request.if_none_match.contains(etag):
+        return conditional(make_response('', 304), etag, fingerprint[1])
+
+    grid_html, next_cursor = render_grid(fingerprint, category, search, after_id, limit)
+    if partial:
+        # "Load more" button appends this fragment to the grid
+        response = make_response(grid_html)
+        response.headers['X-Next-Cursor'] = str(next_cursor or '')
+    else:
+        response = make_response(render_template(
+            'product.html', grid_html=grid_html, next_cursor=next_cursor,
+            category=category, search=search, limit=limit
+        ))
+    return conditional(response, etag, fingerprint[1])
+
+@catalog_bp.route('/api/products')
+@query_budget(3)
+def products_api():
+    category, search, after_id, limit = read_catalog_args()
+    fingerprint = catalog_fingerprint()
+    etag = make_etag(fingerprint, 'json', category, search, after_id, limit)
+
+    if request.if_none_match.contains(etag):
+        return conditional(make_response('', 304), etag, fingerprint[1])
+
+    products, next_cursor = query_products(category, search, after_id, limit)
+    response = jsonify({
+        'items': [{
+            'id': p.id,
+            'name': p.name,
+            'price': p.price,
+            'category': p.category,
+            'available_qty': p.available_qty,
+            'status': p.status,
+            'image_file': p.image_file
+        } for p in products],
+        'next_cursor': next_cursor
+    })
+    return conditional(response, etag, fingerprint[1])
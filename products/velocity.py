@@ -0,0 +1,142 @@
+import os
+import sys
+import math
+from datetime import timedelta
+from models import db, Product, ProductVelocity, WhatsAppOrder, get_sg_time
+
+# ==============================================================================
+# STOCK VELOCITY ENGINE (Low-stock prediction)
+# ==============================================================================
+# Each product keeps two exponentially decayed consumption rates:
+#     rate(now) = rate(last_sale) * exp(-elapsed / tau) + qty / tau
+# so recording a sale is one primary-key read + one write per order line, with
+# no rescans of order history. Reads decay the stored rates to "now" and
+# project time-to-stockout from current stock.
+FAST_TAU_DAYS = 1.0
+SLOW_TAU_DAYS = 7.0
+MIN_HISTORY_DAYS = 1.0   # Bias correction floor: one early sale isn't a trend
+HARVEST_LEAD_DAYS = float(os.getenv('HARVEST_LEAD_DAYS', 1))  # Farm needs this long to restock
+LOW_STOCK_DAYS = float(os.getenv('LOW_STOCK_DAYS', 3))
+COVER_DAYS = 3           # Suggested harvest covers this many days of demand
+
+SIGNAL_ORDER = {'out': 0, 'critical': 1, 'low': 2, 'ok': 3, 'idle': 4}
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+def _days_between(earlier, later):
+    return max((later - earlier).total_seconds() / 86400, 0.0)
+
+def decayed(rate, since, now, tau):
+    if not rate or since is None:
+        return 0.0
+    return rate * math.exp(-_days_between(since, now) / tau)
+
+# ==============================================================================
+# 1. WRITE PATH (Called inside the order transaction)
+# ==============================================================================
+def apply_sale(row, qty, now):
+    row.fast_rate = decayed(row.fast_rate, row.last_sale_at, now, FAST_TAU_DAYS) + qty / FAST_TAU_DAYS
+    row.slow_rate = decayed(row.slow_rate, row.last_sale_at, now, SLOW_TAU_DAYS) + qty / SLOW_TAU_DAYS
+    row.units_sold = (row.units_sold or 0) + qty
+    row.first_sale_at = row.first_sale_at or now
+    row.last_sale_at = now
+
+def record_sales(sold, now=None):
+    # sold: {product_id: units}. Caller commits (finalize_order), so the rates
+    # move together with the stock they describe.
+    now = now or sg_now()
+    rows = {row.product_id: row for row in
+            ProductVelocity.query.filter(ProductVelocity.product_id.in_(list(sold))).all()}
+
+    for product_id, qty in sold.items():
+        row = rows.get(product_id)
+        if row is None:
+            row = ProductVelocity(product_id=product_id, fast_rate=0.0, slow_rate=0.0, units_sold=0)
+            db.session.add(row)
+        apply_sale(row, qty, now)
+
+# ==============================================================================
+# 2. READ PATH (Rates as of now + stockout projection)
+# ==============================================================================
+def current_rates(velocity, now):
+    if velocity is None or velocity.last_sale_at is None:
+        return 0.0, 0.0
+    # A young product hasn't filled its averaging window yet: scale the estimate up
+    age = max(_days_between(velocity.first_sale_at or velocity.last_sale_at, now), MIN_HISTORY_DAYS)
+    rates = []
+    for rate, tau in ((velocity.fast_rate, FAST_TAU_DAYS), (velocity.slow_rate, SLOW_TAU_DAYS)):
+        rates.append(decayed(rate, velocity.last_sale_at, now, tau) / (1 - math.exp(-age / tau)))
+    return rates[0], rates[1]
+
+def classify(available, status, days_left):
+    if available <= 0 or status == "Out of Stock":
+        return 'out'
+    if days_left is None:
+        return 'idle'
+    if days_left <= HARVEST_LEAD_DAYS:
+        return 'critical'
+    if days_left <= LOW_STOCK_DAYS:
+        return 'low'
+    return 'ok'
+
+def stock_signals(at_risk_only=False, now=None):
+    now = now or sg_now()
+    rows = db.session.query(Product, ProductVelocity)\
+        .outerjoin(ProductVelocity, ProductVelocity.product_id == Product.id).all()
+
+    signals = []
+    for product, velocity in rows:
+        fast, slow = current_rates(velocity, now)
+        # Plan against the higher rate, so a sudden rush shows up straight away
+        rate = max(fast, slow)
+        available = max(product.available_qty or 0, 0)
+        days_left = available / rate if rate > 0 else None
+        signal = classify(available, product.status, days_left)
+        if at_risk_only and signal not in ('out', 'critical', 'low'):
+            continue
+        signals.append({
+            'id': product.id,
+            'name': product.name,
+            'available_qty': available,
+            'fast_rate': round(fast, 2),
+            'slow_rate': round(slow, 2),
+            'days_to_stockout': None if days_left is None else round(days_left, 1),
+            'stockout_at': None if days_left is None else
+                (now + timedelta(days=days_left)).isoformat(timespec='minutes'),
+            'signal': signal,
+            'suggested_harvest': max(math.ceil(rate * COVER_DAYS - available), 0),
+        })
+    signals.sort(key=lambda s: (SIGNAL_ORDER[s['signal']], s['days_to_stockout'] or 0))
+    return signals
+
+# ==============================================================================
+# 3. ONE-OFF BOOTSTRAP FROM ORDER HISTORY
+# ==============================================================================
+# Only needed once for a database that had orders before this table existed:
+#     python -m products.velocity
+def rebuild_velocity(days=28):
+    since = sg_now() - timedelta(days=days)
+    ids = dict(db.session.query(Product.name, Product.id).all())
+    orders = db.session.query(WhatsAppOrder.product_name, WhatsAppOrder.quantity, WhatsAppOrder.timestamp)\
+        .filter(WhatsAppOrder.timestamp >= since).order_by(WhatsAppOrder.timestamp.asc()).all()
+
+    rows, replayed = {}, 0
+    for name, qty, timestamp in orders:
+        if name in ids:
+            row = rows.setdefault(ids[name], ProductVelocity(
+                product_id=ids[name], fast_rate=0.0, slow_rate=0.0, units_sold=0))
+            apply_sale(row, qty, timestamp.replace(tzinfo=None))
+            replayed += 1
+
+    ProductVelocity.query.delete()
+    db.session.add_all(rows.values())
+    db.session.commit()
+    print(f"✅ Velocity rebuilt from {replayed} orders (last {days} days)")
+    return replayed
+
+if __name__ == '__main__':
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from main import create_app
+    with create_app().app_context():
+        rebuild_velocity()
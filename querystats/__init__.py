@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from models import db
+
+# ==============================================================================
+# QUERY STATS (SQL count + time per request, per-route query budgets)
+# ==============================================================================
+# - Every request gets an X-Query-Count header and a Server-Timing "db" entry,
+#   and each endpoint keeps running totals (see /admin/api/query-stats).
+# - Views declare how many statements they may run with @query_budget(n),
+#   placed under the @route decorator. Going over the budget logs a warning;
+#   with QUERY_BUDGET_STRICT=1 (test/check_query_budgets.py) the request fails.
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+MAX_RECORDED_STATEMENTS = 50
+
+_endpoint_stats = {}
+_stats_lock = threading.Lock()
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget(limit):
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+# ==============================================================================
+# 1. ENGINE HOOKS (Only count statements run inside a request)
+# ==============================================================================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_stats' in g:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started or not has_request_context() or 'query_stats' not in g:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    stats = g.query_stats
+    stats['count'] += 1
+    stats['time_ms'] += elapsed_ms
+    if len(stats['statements']) < MAX_RECORDED_STATEMENTS:
+        stats['statements'].append((round(elapsed_ms, 2), ' '.join(statement.split())[:300]))
+
+# ==============================================================================
+# 2. REQUEST HOOKS
+# ==============================================================================
+def _start_request():
+    g.query_stats = {'count': 0, 'time_ms': 0.0, 'statements': [], 'started': time.perf_counter()}
+
+def _finish_request(response):
+    stats = g.pop('query_stats', None)
+    if stats is None:
+        return response
+
+    total_ms = (time.perf_counter() - stats['started']) * 1000
+    response.headers['X-Query-Count'] = str(stats['count'])
+    response.headers['Server-Timing'] = (f'db;dur={stats["time_ms"]:.1f};desc="{stats["count"]} queries", '
+                                         f'app;dur={total_ms:.1f}')
+    endpoint = request.endpoint or 'unknown'
+    record_endpoint(endpoint, stats['count'], stats['time_ms'], total_ms)
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats['count'] > budget:
+        message = f"{endpoint} ran {stats['count']} queries (budget {budget})"
+        if current_app.config.get('QUERY_BUDGET_STRICT'):
+            statements = '\n'.join(f"  {ms:>7.2f} ms  {sql}" for ms, sql in stats['statements'])
+            raise QueryBudgetExceeded(f"{message}:\n{statements}")
+        print(f"⚠️ Query budget: {message}")
+    elif total_ms > SLOW_REQUEST_MS:
+        print(f"🐢 Slow request: {endpoint} {total_ms:.0f} ms ({stats['count']} queries, {stats['time_ms']:.0f} ms in SQL)")
+    return response
+
+def record_endpoint(endpoint, count, db_ms, total_ms):
+    with _stats_lock:
+        row = _endpoint_stats.setdefault(endpoint, {'requests': 0, 'queries': 0, 'max_queries': 0,
+                                                    'db_ms': 0.0, 'total_ms': 0.0})
+        row['requests'] += 1
+        row['queries'] += count
+        row['max_queries'] = max(row['max_queries'], count)
+        row['db_ms'] += db_ms
+        row['total_ms'] += total_ms
+
+def endpoint_stats():
+    with _stats_lock:
+        rows = [dict(endpoint=name, **row) for name, row in _endpoint_stats.items()]
+    for row in rows:
+        row['budget'] = getattr(current_app.view_functions.get(row['endpoint']), 'query_budget', None)
+        row['avg_queries'] = round(row['queries'] / row['requests'], 1)
+        row['avg_db_ms'] = round(row.pop('db_ms') / row['requests'], 2)
+        row['avg_ms'] = round(row.pop('total_ms') / row['requests'], 2)
+    return sorted(rows, key=lambda r: r['avg_ms'], reverse=True)
+
+def track_engine(engine):
+    # Also used for engines outside Flask-SQLAlchemy (the reporting snapshot)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+def init_query_stats(app):
+    app.config.setdefault('QUERY_BUDGET_STRICT', os.getenv('QUERY_BUDGET_STRICT') == '1')
+    with app.app_context():
+        track_engine(db.engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
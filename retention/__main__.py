@@ -0,0 +1,26 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import create_app
+from retention.archive import run_retention, enable_incremental_vacuum
+
+# ==============================================================================
+# RETENTION FROM THE COMMAND LINE
+# ==============================================================================
+# Usage:
+#   python -m retention            -> archive + compact now (same as the job)
+#   python -m retention --vacuum   -> one-off: switch an existing leafplant.db
+#                                     to incremental auto-vacuum (full VACUUM,
+#                                     run it while the apps are stopped)
+def main(argv):
+    app = create_app()
+    with app.app_context():
+        if '--vacuum' in argv:
+            changed = enable_incremental_vacuum()
+            print("✅ Incremental auto-vacuum enabled" if changed else "ℹ️ Already in incremental auto-vacuum mode")
+        run_retention()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,169 @@
+import os
+import time
+from datetime import timedelta
+from sqlalchemy import select, literal, text, table, column
+from models import (db, get_sg_time, WhatsAppOrder, OrderTransition, StockAlert, ContactInquiry, OutboundMessage,
+                    archived_orders, archived_order_transitions, archived_stock_alerts, archived_inquiries)
+from orders.lifecycle import DELIVERED, CANCELLED
+
+# ==============================================================================
+# RETENTION: move old rows out of the live tables, then compact the file
+# ==============================================================================
+# - Closed orders (Delivered / Cancelled) older than ORDER_RETENTION_DAYS move
+#   to archived_whats_app_order, together with their status history
+# - Notified stock alerts older than ALERT_RETENTION_DAYS and resolved
+#   inquiries older than INQUIRY_RETENTION_DAYS move to their archive tables
+# - Sent outbox messages older than OUTBOX_RETENTION_DAYS are deleted
+# Each batch of ARCHIVE_BATCH_SIZE rows is one short transaction (copy, then
+# delete by id), with a pause in between so order commits get the write lock.
+# Afterwards the freed pages are handed back with PRAGMA incremental_vacuum,
+# a few thousand pages per run, and the touched tables are re-ANALYZEd.
+ORDER_RETENTION_DAYS = int(os.getenv('ORDER_RETENTION_DAYS', 180))
+ALERT_RETENTION_DAYS = int(os.getenv('ALERT_RETENTION_DAYS', 30))
+INQUIRY_RETENTION_DAYS = int(os.getenv('INQUIRY_RETENTION_DAYS', 180))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 14))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_PAUSE_SECONDS = 0.05
+MAX_BATCHES_PER_RUN = 200
+VACUUM_PAGES_PER_RUN = 4000  # 16 MB with 4 KB pages
+
+CLOSED_STATUSES = (DELIVERED, CANCELLED)
+
+# Live + archived orders (a view, see migrations.py). Reports spanning more
+# than ORDER_RETENTION_DAYS select from this instead of whats_app_order.
+order_history = table('order_history', *[column(c.name, c.type) for c in WhatsAppOrder.__table__.columns])
+
+def history_table():
+    # The view only exists once migrations.upgrade_schema() has run; a file
+    # built with plain create_all() has no archive yet, so the live table is
+    # the whole history
+    exists = db.session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'order_history'")).first()
+    return order_history if exists else WhatsAppOrder.__table__
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+# ==============================================================================
+# 1. BATCHED MOVES
+# ==============================================================================
+def copy_rows(live, archive, ids, now):
+    names = [c.name for c in live.columns]
+    db.session.execute(archive.insert().from_select(
+        names + ['archived_at'],
+        select(*[live.c[name] for name in names], literal(now)).where(live.c.id.in_(ids))
+    ))
+
+def move_in_batches(live, archive, conditions, batch_size=ARCHIVE_BATCH_SIZE, with_batch=None):
+    # Oldest ids first; each batch commits on its own
+    moved = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        ids = db.session.execute(select(live.c.id).where(*conditions)
+                                 .order_by(live.c.id).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        now = sg_now()
+        copy_rows(live, archive, ids, now)
+        if with_batch:
+            with_batch(ids, now)
+        db.session.execute(live.delete().where(live.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+        time.sleep(ARCHIVE_PAUSE_SECONDS)
+    return moved
+
+def _move_transitions(order_ids, now):
+    # Same transaction as the orders: history never outlives or precedes its order
+    transitions = OrderTransition.__table__
+    ids = db.session.execute(select(transitions.c.id).where(transitions.c.order_id.in_(order_ids))).scalars().all()
+    if ids:
+        copy_rows(transitions, archived_order_transitions, ids, now)
+        db.session.execute(transitions.delete().where(transitions.c.id.in_(ids)))
+
+def archive_orders(days=ORDER_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    orders = WhatsAppOrder.__table__
+    cutoff = sg_now() - timedelta(days=days)
+    return move_in_batches(orders, archived_orders,
+                           [orders.c.order_status.in_(CLOSED_STATUSES), orders.c.timestamp < cutoff],
+                           batch_size, with_batch=_move_transitions)
+
+def archive_alerts(days=ALERT_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    alerts = StockAlert.__table__
+    cutoff = sg_now() - timedelta(days=days)
+    return move_in_batches(alerts, archived_stock_alerts,
+                           [alerts.c.is_notified == True, alerts.c.notified_at < cutoff], batch_size)
+
+def archive_inquiries(days=INQUIRY_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    inquiries = ContactInquiry.__table__
+    cutoff = sg_now() - timedelta(days=days)
+    return move_in_batches(inquiries, archived_inquiries,
+                           [inquiries.c.status == 'Resolved', inquiries.c.created_at < cutoff], batch_size)
+
+def purge_sent_messages(days=OUTBOX_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    messages = OutboundMessage.__table__
+    cutoff = sg_now() - timedelta(days=days)
+    deleted = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        ids = db.session.execute(select(messages.c.id).where(messages.c.status == 'Sent', messages.c.sent_at < cutoff)
+                                 .order_by(messages.c.id).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        db.session.execute(messages.delete().where(messages.c.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+        time.sleep(ARCHIVE_PAUSE_SECONDS)
+    return deleted
+
+# ==============================================================================
+# 2. COMPACTION (Incremental vacuum + fresh planner stats)
+# ==============================================================================
+def autocommit():
+    # VACUUM and these PRAGMAs can't run inside a transaction
+    return db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+
+def compact(tables, max_pages=VACUUM_PAGES_PER_RUN):
+    with autocommit() as conn:
+        incremental = conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+        free_before = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if incremental and free_before:
+            # Frees one page per step and the driver only steps it once:
+            # executescript runs it to completion
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        free_after = conn.execute(text("PRAGMA freelist_count")).scalar()
+        for name in tables:
+            conn.execute(text(f"ANALYZE {name}"))
+    if not incremental and free_after:
+        # Free pages are still reused for new rows; only the file doesn't shrink
+        print("ℹ️ leafplant.db is not in incremental auto-vacuum mode - run python -m retention --vacuum once")
+    return {'pages_freed': free_before - free_after, 'free_pages_left': free_after}
+
+def enable_incremental_vacuum():
+    # One-off full VACUUM (locks the file while it rewrites it): run it at a
+    # quiet time. New databases are created in this mode (migrations.init_db).
+    with autocommit() as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return False
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+    return True
+
+# ==============================================================================
+# 3. ONE RUN (Scheduler job: retention)
+# ==============================================================================
+def run_retention():
+    started = time.perf_counter()
+    moved = {
+        'orders': archive_orders(),
+        'alerts': archive_alerts(),
+        'inquiries': archive_inquiries(),
+        'outbox_purged': purge_sent_messages(),
+    }
+    touched = [name for name, count in (('whats_app_order', moved['orders']), ('order_transition', moved['orders']),
+                                        ('stock_alert', moved['alerts']), ('contact_inquiry', moved['inquiries']),
+                                        ('outbound_message', moved['outbox_purged'])) if count]
+    result = dict(moved, **compact(touched))
+    print(f"✅ Retention: {result} in {time.perf_counter() - started:.1f}s")
+    return result
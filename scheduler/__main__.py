@@ -0,0 +1,38 @@
+import sys
+import time
+from main import create_app
+from scheduler.jobs import build_scheduler
+
+# Usage:
+#   python -m scheduler                  -> run the scheduler in the foreground
+#   python -m scheduler run <job_name>   -> run one job right now (ignores its schedule)
+#   python -m scheduler list             -> show registered jobs and schedules
+def main(argv):
+    app = create_app()
+    scheduler = build_scheduler(app)
+
+    if len(argv) >= 2 and argv[0] == 'run':
+        if argv[1] not in scheduler.jobs:
+            print(f"Unknown job '{argv[1]}'. Available: {', '.join(scheduler.jobs)}")
+            return 1
+        run = scheduler.run_job(argv[1], force=True)
+        if run is None:
+            print(f"⏳ {argv[1]} is already running on another worker.")
+            return 0
+        return 0 if run.status == 'Success' else 1
+
+    if argv and argv[0] == 'list':
+        for job in scheduler.jobs.values():
+            print(f"{job.name:<20} {job.schedule.expression}")
+        return 0
+
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,141 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import update, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, JobState, JobRun, get_sg_time
+from scheduler.cron import CronSchedule
+
+def sg_now():
+    # Naive SGT timestamp: SQLite stores DateTime columns without tz info
+    return get_sg_time().replace(tzinfo=None)
+
+# How far back a missed slot still runs (a slow tick, a restart, a long job
+# holding the loop). Older slots are skipped, not replayed one by one.
+CATCH_UP_MINUTES = int(os.getenv('SCHEDULER_CATCH_UP_MINUTES', 60))
+
+class ScheduledJob:
+    def __init__(self, name, cron, func, lock_seconds):
+        self.name = name
+        self.schedule = CronSchedule(cron)
+        self.func = func
+        self.lock_seconds = lock_seconds
+
+    def due_slot(self, now):
+        return self.schedule.latest(now, CATCH_UP_MINUTES)
+
+# ==============================================================================
+# IN-PROCESS JOB SCHEDULER
+# ==============================================================================
+# - Schedules are cron expressions (SGT). Each tick runs a job if its most
+#   recent slot (up to CATCH_UP_MINUTES back) is newer than its last run, so a
+#   tick that lands in the next minute doesn't lose the slot.
+# - Last-run state lives in the job_state table, so restarts don't re-run jobs.
+# - A job only runs if this worker wins the lease UPDATE on its job_state row,
+#   so several gunicorn workers can all run the scheduler safely.
+# - Every run is recorded in job_run with its duration and row counts.
+class Scheduler:
+    def __init__(self, app, tick_seconds=30):
+        self.app = app
+        self.tick_seconds = tick_seconds
+        self.jobs = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def register(self, name, cron, func, lock_seconds=900):
+        self.jobs[name] = ScheduledJob(name, cron, func, lock_seconds)
+
+    def _ensure_state_rows(self):
+        for name in self.jobs:
+            db.session.execute(sqlite_insert(JobState).values(name=name).on_conflict_do_nothing())
+        db.session.commit()
+
+    def _acquire_lock(self, job, now, slot):
+        conditions = [
+            JobState.name == job.name,
+            or_(JobState.locked_until.is_(None), JobState.locked_until < now),
+        ]
+        if slot is not None:
+            # Checked inside the same UPDATE so two workers can't both run this slot
+            conditions.append(or_(JobState.last_run_at.is_(None), JobState.last_run_at < slot))
+
+        result = db.session.execute(
+            update(JobState).where(*conditions).values(
+                locked_by=self.worker_id,
+                locked_until=now + timedelta(seconds=job.lock_seconds)
+            )
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def run_job(self, name, force=False, now=None):
+        job = self.jobs[name]
+        with self.app.app_context():
+            now = now or sg_now()
+            slot = None if force else job.due_slot(now)
+            if not force and slot is None:
+                return None
+
+            self._ensure_state_rows()
+            if not self._acquire_lock(job, now, slot):
+                return None
+
+            started = time.perf_counter()
+            status, error, stats = 'Success', None, {}
+            try:
+                stats = job.func() or {}
+            except Exception as e:
+                db.session.rollback()
+                status, error = 'Failed', str(e)
+                print(f"❌ Job {name} failed: {e}")
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            run = JobRun(
+                job_name=name,
+                started_at=now,
+                duration_ms=duration_ms,
+                rows_read=stats.get('rows_read', 0),
+                rows_written=stats.get('rows_written', 0),
+                status=status,
+                error=error
+            )
+            db.session.add(run)
+            db.session.execute(
+                update(JobState).where(JobState.name == name).values(
+                    last_run_at=now, last_status=status, locked_by=None, locked_until=None
+                )
+            )
+            db.session.commit()
+            print(f"⏱️ Job {name}: {status} in {duration_ms:.0f} ms "
+                  f"(read {run.rows_read}, wrote {run.rows_written})")
+            return run
+
+    def run_pending(self):
+        # One clock reading per pass: a slow job mustn't push the next one past its minute
+        now = sg_now()
+        for name in list(self.jobs):
+            try:
+                self.run_job(name, now=now)
+            except Exception as e:
+                print(f"❌ Scheduler error on {name}: {e}")
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            self.run_pending()
+            self._stop_event.wait(self.tick_seconds)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="leafplant-scheduler", daemon=True)
+        self._thread.start()
+        print(f"🗓️ Scheduler started on {self.worker_id} with {len(self.jobs)} jobs")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
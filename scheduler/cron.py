@@ -0,0 +1,82 @@
+# ==============================================================================
+# CRON SCHEDULE PARSER (minute hour day-of-month month day-of-week)
+# ==============================================================================
+# Supports the usual subset: "*", "*/15", "5", "1,15,30", "9-17", "9-17/2".
+# Day-of-week uses cron numbering (0 or 7 = Sunday, 1 = Monday ... 6 = Saturday).
+from datetime import timedelta
+
+FIELD_RANGES = [
+    (0, 59),   # minute
+    (0, 23),   # hour
+    (1, 31),   # day of month
+    (1, 12),   # month
+    (0, 7),    # day of week
+]
+
+def _parse_field(expr, low, high):
+    values = set()
+    for part in expr.split(','):
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = int(step_str)
+            if step <= 0:
+                raise ValueError(f"Invalid cron step: {step_str}")
+
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = end = int(part)
+
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value '{expr}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got: '{expression}'")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, dows = (
+            _parse_field(f, low, high) for f, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        # Normalise Sunday (7 -> 0)
+        self.weekdays = frozenset(d % 7 for d in dows)
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def matches(self, dt):
+        if dt.minute not in self.minutes or dt.hour not in self.hours or dt.month not in self.months:
+            return False
+
+        cron_weekday = (dt.weekday() + 1) % 7  # Python: Monday=0, cron: Sunday=0
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+
+        # Standard cron rule: if both day fields are restricted, either may match
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def latest(self, dt, lookback_minutes):
+        # Most recent matching minute <= dt, or None if none in the last lookback_minutes
+        slot = dt.replace(second=0, microsecond=0)
+        earliest = slot - timedelta(minutes=lookback_minutes)
+        while slot >= earliest:
+            if slot.hour not in self.hours:
+                slot = slot.replace(minute=0) - timedelta(minutes=1)  # Straight to the previous hour
+                continue
+            if self.matches(slot):
+                return slot
+            slot -= timedelta(minutes=1)
+        return None
+
+    def __repr__(self):
+        return f"CronSchedule('{self.expression}')"
@@ -0,0 +1,142 @@
+import os
+from datetime import datetime, timedelta
+import pytz
+from models import db, WhatsAppOrder, DailySalesRollup
+from scheduler.core import Scheduler
+from whatsapp.alerts import notify_restocked
+from whatsapp.outbox import drain_all
+from whatsapp.state import purge_expired_states
+from orders.picklists import get_batch, write_csv, xlsx_bytes
+
+REPORT_DIR = os.getenv('REPORT_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'reports')))
+
+# Default schedules (SGT). Override with e.g. JOB_SCHEDULE_RESTOCK_SWEEP="*/5 * * * *"
+DEFAULT_SCHEDULES = {
+    'packing_list': '0 22 * * *',
+    'restock_sweep': '*/10 * * * *',
+    'daily_rollup': '5 * * * *',
+    'state_cleanup': '30 * * * *',
+    'demand_analytics': '15 * * * *',
+    'outbox_sweep': '* * * * *',
+    'retention': '45 3 * * *',
+    'snapshot': '*/15 * * * *',
+}
+
+def _today_str(offset_days=0):
+    sgt = pytz.timezone('Asia/Singapore')
+    return (datetime.now(sgt) + timedelta(days=offset_days)).strftime('%Y-%m-%d')
+
+# ==============================================================================
+# JOB 1: DAILY PICK LIST (CSV + XLSX, per leader -> customer -> product)
+# ==============================================================================
+def packing_list_job():
+    batch = get_batch()
+    if not batch['leaders']:
+        print("ℹ️ No orders found to pack for today.")
+        return {'rows_read': 0, 'rows_written': 0}
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    base = os.path.join(REPORT_DIR, f"pick_list_{batch['day']}")
+    write_csv(batch, base + '.csv')
+    try:
+        workbook = xlsx_bytes(batch)
+        with open(base + '.xlsx', 'wb') as file:
+            file.write(workbook)
+    except ImportError:
+        print("⚠️ openpyxl not installed - wrote the CSV pick list only.")
+    print(f"✅ Pick List Generated: {base}.csv ({batch['orders']} orders, {len(batch['leaders'])} drops)")
+    return {'rows_read': batch['orders'], 'rows_written': len(batch['leaders'])}
+
+# ==============================================================================
+# JOB 2: RESTOCK SWEEP (Alerts whose product is back in stock)
+# ==============================================================================
+def restock_sweep_job():
+    # One join over pending alerts, one grouped message per customer
+    result = notify_restocked()
+    return {'rows_read': result['ready'], 'rows_written': result['alerts']}
+
+# ==============================================================================
+# JOB 3: DAILY SALES ROLLUP (Yesterday + Today, per leader & product)
+# ==============================================================================
+def daily_rollup_job():
+    rows_read = rows_written = 0
+    for day in (_today_str(-1), _today_str()):
+        totals = db.session.query(
+            WhatsAppOrder.leader_id,
+            WhatsAppOrder.product_name,
+            db.func.count(WhatsAppOrder.id),
+            db.func.sum(WhatsAppOrder.quantity),
+            db.func.sum(WhatsAppOrder.total_price)
+        ).filter(db.func.strftime('%Y-%m-%d', WhatsAppOrder.timestamp) == day)\
+         .group_by(WhatsAppOrder.leader_id, WhatsAppOrder.product_name).all()
+
+        # Replace the day's rollup in one transaction so readers never see half a day
+        DailySalesRollup.query.filter_by(day=day).delete()
+        for leader_id, product_name, order_count, total_qty, total_sales in totals:
+            db.session.add(DailySalesRollup(
+                day=day, leader_id=leader_id, product_name=product_name,
+                order_count=order_count, total_qty=total_qty or 0, total_sales=total_sales or 0.0
+            ))
+        db.session.commit()
+        rows_read += len(totals)
+        rows_written += len(totals)
+    return {'rows_read': rows_read, 'rows_written': rows_written}
+
+# ==============================================================================
+# JOB 4: EXPIRED CONVERSATION STATE CLEANUP
+# ==============================================================================
+def state_cleanup_job():
+    deleted = purge_expired_states()
+    return {'rows_read': deleted, 'rows_written': deleted}
+
+# ==============================================================================
+# JOB 5: DEMAND ANALYTICS (Curves, seasonality, next-day forecast)
+# ==============================================================================
+def demand_analytics_job():
+    # Imported here so pandas is only loaded in the process that runs the job
+    from analytics.engine import refresh_demand_analytics
+    return refresh_demand_analytics()
+
+# ==============================================================================
+# JOB 6: OUTBOX SWEEP (Retries due + anything queued by a process without a dispatcher)
+# ==============================================================================
+def outbox_sweep_job():
+    stats = drain_all()
+    return {'rows_read': stats['claimed'], 'rows_written': stats['sent'] + stats['dead']}
+
+# ==============================================================================
+# JOB 7: RETENTION (Archive old closed rows in batches, then compact)
+# ==============================================================================
+def retention_job():
+    from retention.archive import run_retention
+    result = run_retention()
+    moved = result['orders'] + result['alerts'] + result['inquiries'] + result['outbox_purged']
+    return {'rows_read': moved, 'rows_written': moved}
+
+# ==============================================================================
+# JOB 8: REPORTING SNAPSHOT (Online backup copy for heavy reports + daily backup)
+# ==============================================================================
+def snapshot_job():
+    from snapshot.backup import take_snapshot
+    result = take_snapshot()
+    pages = result['pages'] if result else 0
+    return {'rows_read': pages, 'rows_written': pages}
+
+
+JOBS = {
+    'packing_list': packing_list_job,
+    'restock_sweep': restock_sweep_job,
+    'daily_rollup': daily_rollup_job,
+    'state_cleanup': state_cleanup_job,
+    'demand_analytics': demand_analytics_job,
+    'outbox_sweep': outbox_sweep_job,
+    'retention': retention_job,
+    'snapshot': snapshot_job,
+}
+
+def build_scheduler(app):
+    scheduler = Scheduler(app)
+    for name, func in JOBS.items():
+        cron = os.getenv(f"JOB_SCHEDULE_{name.upper()}", DEFAULT_SCHEDULES[name])
+        scheduler.register(name, cron, func)
+    return scheduler
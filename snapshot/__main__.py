@@ -0,0 +1,19 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import create_app
+from snapshot.backup import take_snapshot
+
+# ==============================================================================
+# SNAPSHOT FROM THE COMMAND LINE
+# ==============================================================================
+# Usage:
+#   python -m snapshot   -> refresh the reporting snapshot now (same as the job)
+def main():
+    app = create_app()
+    with app.app_context():
+        return 0 if take_snapshot() else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import os
+import glob
+import time
+import shutil
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from models import db, get_sg_time
+from querystats import track_engine
+
+# ==============================================================================
+# REPORTING SNAPSHOT + BACKUPS (SQLite online backup API)
+# ==============================================================================
+# - take_snapshot() copies the live file into leafplant_reporting.db with the
+#   backup API, SNAPSHOT_PAGES_PER_STEP pages at a time. The read lock is only
+#   held for one step, and the progress callback pauses between steps, so the
+#   webhook's order commits get in between.
+# - A commit on the live file makes SQLite start the copy over. The copy then
+#   retries with bigger steps and no pause (SNAPSHOT_ESCALATE x the pages), and
+#   finally in one pass (writers wait for it through busy_timeout), so a busy
+#   evening makes each lock a bit longer but can't starve the snapshot.
+# - The copy is written to a .tmp file, checked with PRAGMA quick_check, then
+#   swapped in with os.replace. Readers never see a half-written snapshot.
+# - The first snapshot of each day is also kept in backups/ (BACKUP_KEEP_DAYS).
+# Heavy reports read the snapshot through report_source()/report_connection()
+# when it is younger than SNAPSHOT_MAX_AGE_MINUTES, and fall back to the live
+# file otherwise. ?source=live on a report asks for up-to-the-minute data.
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH')  # Default: <live name>_reporting.db next to the live file
+BACKUP_DIR = os.getenv('BACKUP_DIR')        # Default: backups/ next to the live file
+BACKUP_KEEP_DAYS = int(os.getenv('BACKUP_KEEP_DAYS', 7))
+SNAPSHOT_PAGES_PER_STEP = int(os.getenv('SNAPSHOT_PAGES_PER_STEP', 256))  # 1 MB with 4 KB pages
+SNAPSHOT_STEP_PAUSE = float(os.getenv('SNAPSHOT_STEP_PAUSE', 0.01))
+SNAPSHOT_ESCALATE = 16
+SNAPSHOT_MAX_AGE_MINUTES = int(os.getenv('SNAPSHOT_MAX_AGE_MINUTES', 60))
+REPORT_SOURCE = os.getenv('REPORT_SOURCE', 'snapshot')  # snapshot / live
+
+SGT = pytz.timezone('Asia/Singapore')
+
+class SnapshotRestarted(Exception):
+    pass
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+# ==============================================================================
+# 1. PATHS
+# ==============================================================================
+def live_path():
+    path = db.engine.url.database
+    return None if not path or path == ':memory:' else os.path.abspath(path)
+
+def snapshot_path():
+    if SNAPSHOT_PATH:
+        return SNAPSHOT_PATH
+    return os.path.splitext(live_path())[0] + '_reporting.db'
+
+def backup_dir():
+    return BACKUP_DIR or os.path.join(os.path.dirname(live_path()), 'backups')
+
+def snapshot_taken_at():
+    # The file's mtime: written when the last step finished, and no commit can
+    # have landed after the copy started (it would have restarted it)
+    if not live_path():
+        return None
+    try:
+        mtime = os.path.getmtime(snapshot_path())
+    except OSError:
+        return None
+    return datetime.fromtimestamp(mtime, SGT).replace(tzinfo=None)
+
+# ==============================================================================
+# 2. TAKING A SNAPSHOT
+# ==============================================================================
+def _copy(source, target, pages, pause, progress):
+    last = {'remaining': None}
+
+    def on_step(status, remaining, total):
+        progress['steps'] += 1
+        progress['pages'] = total
+        if last['remaining'] is not None and remaining > last['remaining']:
+            # Someone committed to the live file: SQLite started the copy over
+            raise SnapshotRestarted()
+        last['remaining'] = remaining
+        if remaining and pause:
+            time.sleep(pause)  # Lock is released between steps: let writers in
+
+    source.backup(target, pages=pages, progress=on_step)
+
+def keep_daily_backup(path, taken_at):
+    # Copies the finished snapshot (nobody writes to it), never the live file
+    folder = backup_dir()
+    os.makedirs(folder, exist_ok=True)
+    name = os.path.splitext(os.path.basename(live_path()))[0]
+    target = os.path.join(folder, f"{name}_{taken_at:%Y-%m-%d}.db")
+    if os.path.exists(target):
+        return None
+    shutil.copyfile(path, target)
+    for old in sorted(glob.glob(os.path.join(folder, f"{name}_*.db")))[:-BACKUP_KEEP_DAYS]:
+        os.remove(old)
+    return target
+
+def take_snapshot(pages=SNAPSHOT_PAGES_PER_STEP, pause=SNAPSHOT_STEP_PAUSE):
+    if not live_path():
+        print("ℹ️ Snapshot skipped: the database is not a file")
+        return None
+    path = snapshot_path()
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    # Small paced steps first; each restart means bigger steps, then one pass
+    attempts = [(pages, pause), (pages * SNAPSHOT_ESCALATE, 0), (-1, 0)] if pages > 0 else [(-1, 0)]
+    progress = {'steps': 0, 'restarts': 0, 'pages': 0}
+    started = time.perf_counter()
+    raw = db.engine.raw_connection()
+    try:
+        target = sqlite3.connect(tmp)
+        try:
+            for step_pages, step_pause in attempts:
+                try:
+                    _copy(raw.driver_connection, target, step_pages, step_pause, progress)
+                    break
+                except SnapshotRestarted:
+                    progress['restarts'] += 1
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        raw.close()
+
+    if check != 'ok':
+        os.remove(tmp)
+        print(f"❌ Snapshot failed quick_check ({check}) - kept the previous one")
+        return None
+    os.replace(tmp, path)
+    taken_at = snapshot_taken_at()
+    backup = keep_daily_backup(path, taken_at)
+
+    result = dict(progress, pages_per_step=step_pages, seconds=round(time.perf_counter() - started, 2), backup=backup)
+    print(f"✅ Reporting snapshot: {result['pages']:,} pages in {result['steps']} steps "
+          f"({result['restarts']} restarts, last pass {step_pages} pages/step) in {result['seconds']}s")
+    return result
+
+# ==============================================================================
+# 3. READING REPORTS (Snapshot when fresh, live file otherwise)
+# ==============================================================================
+_engines = {}
+
+def snapshot_engine():
+    path = snapshot_path()
+    engine = _engines.get(path)
+    if engine is None:
+        # immutable=1: the file is only ever replaced, never written in place, so
+        # readers skip locking. NullPool: every report opens the current file.
+        uri = Path(path).as_uri() + '?mode=ro&immutable=1'
+        engine = create_engine('sqlite://', poolclass=NullPool,
+                               creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False))
+        track_engine(engine)
+        _engines[path] = engine
+    return engine
+
+def report_source(requested=None):
+    # ('snapshot', taken_at) or ('live', None)
+    if (requested or REPORT_SOURCE) == 'snapshot':
+        taken_at = snapshot_taken_at()
+        if taken_at and sg_now() - taken_at <= timedelta(minutes=SNAPSHOT_MAX_AGE_MINUTES):
+            return 'snapshot', taken_at
+    return 'live', None
+
+def report_connection(source):
+    return (snapshot_engine() if source == 'snapshot' else db.engine).connect()
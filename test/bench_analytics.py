@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import tempfile
+from datetime import timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from flask import Flask
+from models import db, Product, GroupLeader, DemandForecast, DemandCurvePoint
+from analytics.engine import refresh_demand_analytics, sg_today, HISTORY_DAYS
+from migrations import init_db
+
+# ==============================================================================
+# BENCHMARK: demand analytics over a large synthetic order history
+# ==============================================================================
+# Run: python test/bench_analytics.py [orders]   (default 2,000,000)
+# Builds a throwaway SQLite file in the temp folder - leafplant.db is untouched.
+PRODUCTS = 40
+LEADERS = 25
+
+def seed_orders(total):
+    rng = np.random.default_rng(7)
+    start = sg_today() - timedelta(days=HISTORY_DAYS - 1)
+    day_offsets = rng.integers(0, HISTORY_DAYS, total)
+    # Weekend bump so the seasonality factors have something to find
+    weekend = np.array([(start + timedelta(days=int(d))).weekday() >= 5 for d in range(HISTORY_DAYS)])
+    keep = rng.random(total) < np.where(weekend[day_offsets], 1.0, 0.7)
+    day_offsets = np.sort(day_offsets[keep])  # Orders arrive in time order, like production
+    n = len(day_offsets)
+
+    products = rng.integers(1, PRODUCTS + 1, n)
+    leaders = rng.integers(1, LEADERS + 1, n)
+    qty = rng.integers(1, 6, n)
+    days = [(start + timedelta(days=d)).isoformat() for d in range(HISTORY_DAYS)]
+
+    rows = ((f"{days[d]} 10:{i % 60:02d}:00.000000", int(l), f"9{i:07d}", f"Crop {p}", int(q), float(q) * 3.2)
+            for i, (d, p, l, q) in enumerate(zip(day_offsets, products, leaders, qty)))
+    raw = db.engine.raw_connection()
+    raw.cursor().executemany(
+        "INSERT INTO whats_app_order (timestamp, leader_id, customer_phone, product_name, quantity, total_price, order_status) "
+        "VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')", rows)
+    raw.commit()
+    raw.close()
+    return n
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_analytics.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    db.init_app(app)
+
+    with app.app_context():
+        init_db()  # Same schema as production, order_history view included
+        for p in range(1, PRODUCTS + 1):
+            db.session.add(Product(name=f"Crop {p}", price=3.2, available_qty=50))
+        for l in range(1, LEADERS + 1):
+            db.session.add(GroupLeader(name=f"Leader {l}", phone=f"8{l:07d}", area=f"Area {l}"))
+        db.session.commit()
+
+        started = time.perf_counter()
+        n = seed_orders(total)
+        print(f"Seeded {n:,} orders in {time.perf_counter() - started:.1f}s ({db_path})")
+
+        started = time.perf_counter()
+        stats = refresh_demand_analytics(force=True)
+        print(f"Refresh: {time.perf_counter() - started:.2f}s | {stats}")
+
+        started = time.perf_counter()
+        refresh_demand_analytics()
+        print(f"Unchanged re-run: {(time.perf_counter() - started) * 1000:.1f} ms (watermark skip)")
+
+        top = DemandForecast.query.filter_by(scope='product').order_by(DemandForecast.forecast_qty.desc()).first()
+        print(f"Top forecast: {top.label} {top.forecast_qty} units on {top.forecast_day} "
+              f"(avg {top.avg_daily_qty}/day, sell-through {top.sell_through})")
+        print(f"Curve points: {DemandCurvePoint.query.count():,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import io
+import time
+import tempfile
+import threading
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# BENCHMARK: per-phone message coalescing (AI turns vs inbound messages)
+# ==============================================================================
+# Run: python test/bench_coalescing.py [phones]
+# Every phone types a 3-message burst, one webhook POST per message. One extra
+# phone never stops typing, to show the max-latency cap, and its turns must
+# run in the order the messages were sent, and every stored burst must be gone
+# from pending_inbound once answered. Offline: throwaway SQLite file, no
+# OpenAI key, no WhatsApp credentials.
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_coalesce.db')
+os.environ['OPENAI_API_KEY'] = ''
+os.environ['WHATSAPP_ACCESS_TOKEN'] = ''
+os.environ.setdefault('COALESCE_WINDOW_MS', '400')
+os.environ.setdefault('COALESCE_MAX_LATENCY_MS', '1500')
+os.environ['RATE_LIMIT_PHONE_BURST'] = os.environ['RATE_LIMIT_GLOBAL_BURST'] = '100000'  # Limits off
+
+from sqlalchemy import event
+from models import db, Customer, GroupLeader, Product, PendingInbound, set_sqlite_pragma
+from migrations import upgrade_schema
+from whatsapp.app import app, coalescer
+
+BURST = ["hi", "can i order", "2 mao bai"]
+GAP_SECONDS = 0.15
+
+def post(client, phone, msg_no, body):
+    client.post('/webhook', json={'entry': [{'changes': [{'value': {'messages': [
+        {'from': phone, 'id': f"wamid.{phone}.{msg_no}", 'type': 'text',
+         'timestamp': str(int(time.time())), 'text': {'body': body}}]}}]}]})
+
+def customer_typing(phone):
+    client = app.test_client()
+    for i, body in enumerate(BURST):
+        post(client, phone, i, body)
+        time.sleep(GAP_SECONDS)
+
+def chatty_typing(phone, seconds=4.0):
+    client = app.test_client()
+    started, i = time.monotonic(), 0
+    while time.monotonic() - started < seconds:
+        post(client, phone, i, f"message {i}")
+        i += 1
+        time.sleep(GAP_SECONDS)
+
+def record_turns(turns):
+    # Wraps the app's handler: message numbers per phone, in the order turns ran
+    handler = coalescer.handler
+    def recording(phone, messages):
+        turns.setdefault(phone, []).extend(int(m.id.rsplit('.', 1)[1]) for m in messages)
+        handler(phone, messages)
+    coalescer.handler = recording
+
+def main():
+    phones = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    started_on_import = coalescer._thread is not None
+    turns = {}
+    record_turns(turns)
+    with app.app_context():
+        event.listen(db.engine, "connect", set_sqlite_pragma)
+        db.create_all()
+        upgrade_schema()
+        leader = GroupLeader(name='Bench Leader', phone='80000000', area='Bedok')
+        db.session.add_all([leader, Product(name='Mao Bai', price=3.2, available_qty=500)])
+        db.session.commit()
+        db.session.add_all([Customer(name=f"Neighbour {c}", phone=f"9{c:07d}", leader_id=leader.id) for c in range(phones)])
+        db.session.commit()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # "credentials missing" per reply
+        threads = [threading.Thread(target=customer_typing, args=(f"9{c:07d}",)) for c in range(phones)]
+        threads.append(threading.Thread(target=chatty_typing, args=("98888888",)))
+        for t in threads: t.start()
+        for t in threads: t.join()
+        coalescer.stop()
+
+    stats = coalescer.stats
+    print(f"Window {os.environ['COALESCE_WINDOW_MS']} ms, max latency {os.environ['COALESCE_MAX_LATENCY_MS']} ms")
+    print(f"{stats['messages']} inbound messages -> {stats['turns']} AI turns / outbound replies "
+          f"({stats['messages'] / max(stats['turns'], 1):.1f}x fewer)")
+    print(f"Longest wait from first message to its turn: {stats['max_wait_ms']:.0f} ms")
+    in_order = all(numbers == sorted(numbers) for numbers in turns.values())
+    with app.app_context():
+        pending = PendingInbound.query.count()  # Every answered burst leaves pending_inbound
+    print(f"Threads started on import: {'yes' if started_on_import else 'no'} | "
+          f"turns in send order per phone: {'yes' if in_order else 'NO'} | phones still tracked: {len(coalescer._waiting)} | pending inbound rows: {pending}")
+    sys.exit(0 if in_order and not started_on_import and not coalescer._waiting and not pending else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Offline verifier with a Google-like round trip, set before the app is imported
+os.environ['RECAPTCHA_VERIFIER'] = 'local'
+os.environ.setdefault('LOCAL_RECAPTCHA_LATENCY_MS', '80')
+
+from main import create_app
+from models import db, ContactInquiry
+from contact.verify import get_verifier
+from contact.writer import InquiryWriter
+
+# ==============================================================================
+# LOAD TEST: contact form (sync insert vs write-behind queue)
+# ==============================================================================
+# Run: python test/bench_contact_form.py [submissions] [threads]
+# Uses the local reCAPTCHA stand-in, so no network access is needed.
+# Rows are tagged with a bench email and deleted afterwards.
+BENCH_EMAIL = 'loadtest@example.com'
+
+def submit_many(app, total, threads, token_prefix):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(worker_no):
+        client = app.test_client()
+        for i in range(worker_no, total, threads):
+            form = {
+                'name': f'Bench {i}',
+                'email': BENCH_EMAIL,
+                'message': 'Load test inquiry from the bench script.',
+                'g-recaptcha-response': f'{token_prefix}-{i}',
+            }
+            started = time.perf_counter()
+            client.post('/contact', data=form)
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    # 1. Synchronous insert + commit per request (old behaviour)
+    app.extensions.pop('inquiry_writer', None)
+    p50, p95 = submit_many(app, total, threads, 'sync')
+    print(f"Sync insert:   p50 {p50:.1f} ms | p95 {p95:.1f} ms")
+
+    # 2. Write-behind queue
+    writer = InquiryWriter(app)
+    app.extensions['inquiry_writer'] = writer
+    p50, p95 = submit_many(app, total, threads, 'queued')
+    writer.stop()
+    print(f"Write-behind:  p50 {p50:.1f} ms | p95 {p95:.1f} ms | "
+          f"{writer.stats['written']} rows in {writer.stats['batches']} batches")
+
+    # 3. Double submit: same token twice -> one verifier call, one row
+    app.extensions.pop('inquiry_writer', None)  # Stopped above: insert directly so the count is final
+    calls = []
+    verifier = get_verifier()
+    original = verifier.verify
+    verifier.verify = lambda *a: calls.append(1) or original(*a)
+    client = app.test_client()
+    for _ in range(2):
+        client.post('/contact', data={'name': 'Bench dup', 'email': BENCH_EMAIL,
+                                      'message': 'Double click on the send button.',
+                                      'g-recaptcha-response': 'double-click-token'})
+    with app.app_context():
+        saved = ContactInquiry.query.filter_by(email=BENCH_EMAIL, name='Bench dup').count()
+    print(f"Double submit: {len(calls)} verifier call(s), {saved} inquiry saved for 2 posts")
+
+    with app.app_context():
+        deleted = ContactInquiry.query.filter_by(email=BENCH_EMAIL).delete()
+        db.session.commit()
+        print(f"🧹 Removed {deleted} bench inquiries")
+
+if __name__ == "__main__":
+    main()
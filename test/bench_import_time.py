@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# COLD START: import time per entry point (fails on regression)
+# ==============================================================================
+# Run: python test/bench_import_time.py
+# Every entry point is imported in a fresh interpreter (best of RUNS) against a
+# throwaway, already-migrated database. The check fails if one goes over its
+# budget, or if it pulls in a heavy package that should only load on first
+# use. Budgets are roughly 2x this machine's times - raise one only with a
+# reason.
+RUNS = 3
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_POINTS = {
+    # name: (code timed in the child, budget ms)
+    'main (import)': ("import main", 1500),
+    'main.create_app()': ("import main; main.create_app()", 1700),
+    'whatsapp.app (webhook)': ("import whatsapp.app", 1500),
+    'scheduler.jobs': ("import scheduler.jobs", 1500),
+    'admin.routes': ("import admin.routes", 1500),
+}
+# Loaded lazily by the code paths that need them (LLM turn, first send,
+# analytics job, XLSX export) - never at import
+LAZY_MODULES = ('openai', 'requests', 'pandas', 'numpy', 'openpyxl')
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+{code}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{'ms': elapsed, 'lazy_loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def run_child(code, env):
+    out = subprocess.run([sys.executable, '-c', CHILD.format(code=code, lazy=LAZY_MODULES)],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'import_time.db'),
+               CONTACT_WRITE_BEHIND='0')
+    # Migrate once up front, so create_app() is timed the way workers boot
+    subprocess.run([sys.executable, '-m', 'migrations'], cwd=ROOT, env=env, capture_output=True, check=True)
+
+    failed = False
+    print(f"{'Entry point':<26} {'best ms':>8} {'budget':>7}")
+    for name, (code, budget) in ENTRY_POINTS.items():
+        results = [run_child(code, env) for _ in range(RUNS)]
+        best = min(r['ms'] for r in results)
+        lazy = sorted(set(m for r in results for m in r['lazy_loaded']))
+        status = 'OK'
+        if best > budget:
+            status, failed = 'SLOW', True
+        if lazy:
+            status, failed = f"LOADS {', '.join(lazy)}", True
+        print(f"{name:<26} {best:>8.0f} {budget:>7}  {status}")
+
+    print("❌ Cold start regressed" if failed else "✅ All entry points within budget")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
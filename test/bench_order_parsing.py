@@ -0,0 +1,75 @@
+import os
+import sys
+import re
+import timeit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import event
+from models import db, Product
+from whatsapp.catalog import CatalogIndex
+from whatsapp.orders import parse_data_tags, resolve_order_lines
+
+# ==============================================================================
+# BENCHMARK: [[DATA:]] parsing + order-line resolution (old vs new)
+# ==============================================================================
+# Run: python test/bench_order_parsing.py
+# Uses an in-memory SQLite DB, so it never touches leafplant.db.
+CROPS = ["Mao Bai", "Jiu Bai Cai", "Xiao Bai Cai", "Red Pak Choy", "Cos Lettuce",
+         "Lollo Bionda Lettuce", "Chris Green Lettuce", "Mizuna"]
+
+AI_REPLY = ("Wonderful! Your order is confirmed 🌿 [[STATUS: CONFIRMED]]\n"
+            "[[DATA: Mao Bai | 3 | $10.20]]\n[[DATA: cos lettuce | 2 packs | 6.00]]\n"
+            "[[DATA: Lollo Bionda Lettuce | 1 | 3.20]]\n[[DATA: Red Pak Choy | 4 | 16.80]]")
+
+def legacy_parse(ai_reply):
+    lines = []
+    for match in re.findall(r"\[\[DATA:\s*(.*?)\s*\]\]", ai_reply):
+        parts = [p.strip() for p in match.split("|")]
+        if len(parts) != 3: continue
+        item_name, qty_str, total_str = parts[0], re.sub(r"[^\d]", "", parts[1]), re.sub(r"[^\d.]", "", parts[2])
+        if qty_str and total_str:
+            lines.append((item_name, int(qty_str), float(total_str)))
+    return lines
+
+def legacy_lookup(lines):
+    # Old deduct_stock_db: one fuzzy ilike query per line
+    return [Product.query.filter(Product.name.ilike(f"%{name}%")).first() for name, _, _ in lines]
+
+def main():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        for i in range(200):
+            name = CROPS[i] if i < len(CROPS) else f"Test Crop {i}"
+            db.session.add(Product(name=name, price=3.0, available_qty=1000, status="In Stock"))
+        db.session.commit()
+
+        queries = []
+        event.listen(db.engine, "before_cursor_execute", lambda *a: queries.append(1))
+
+        n = 2000
+        t_old_parse = timeit.timeit(lambda: legacy_parse(AI_REPLY), number=n)
+        t_new_parse = timeit.timeit(lambda: parse_data_tags(AI_REPLY), number=n)
+
+        catalog = CatalogIndex.load()
+        parsed_old, parsed_new = legacy_parse(AI_REPLY), parse_data_tags(AI_REPLY)
+
+        queries.clear()
+        t_old_lookup = timeit.timeit(lambda: legacy_lookup(parsed_old), number=200)
+        old_queries = len(queries) / 200
+
+        queries.clear()
+        t_new_lookup = timeit.timeit(lambda: resolve_order_lines(parsed_new, catalog), number=200)
+        new_queries = len(queries) / 200
+
+        print(f"Parse  x{n}:  legacy {t_old_parse * 1000:.1f} ms | precompiled {t_new_parse * 1000:.1f} ms")
+        print(f"Lookup x200:  legacy {t_old_lookup * 1000:.1f} ms ({old_queries:.0f} queries/order) | "
+              f"catalog {t_new_lookup * 1000:.1f} ms ({new_queries:.0f} queries/order)")
+        print("Resolved:", [(row.name, qty, total) for row, qty, total in resolve_order_lines(parsed_new, catalog)])
+
+if __name__ == "__main__":
+    main()
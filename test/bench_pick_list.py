@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, time as dtime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, GroupLeader, Customer
+from orders.picklists import get_batch, iter_csv, xlsx_bytes, sg_today
+
+# ==============================================================================
+# BENCHMARK: harvest-day pick lists over a busy day of orders
+# ==============================================================================
+# Run: python test/bench_pick_list.py [orders]   (default 10,000)
+# Builds a throwaway SQLite file in the temp folder - leafplant.db is untouched.
+LEADERS = 30
+CUSTOMERS_PER_LEADER = 40
+PRODUCTS = ['Bak Choy', 'Cai Xin', 'Cos Lettuce', 'Kai Lan', 'Kang Kong', 'Mao Bai', 'Spinach', 'Xiao Bai Cai']
+
+def seed_day(total):
+    rng = random.Random(7)
+    start = datetime.combine(sg_today(), dtime.min)
+    rows = []
+    for i in range(total):
+        leader = rng.randint(1, LEADERS)
+        customer = (leader - 1) * CUSTOMERS_PER_LEADER + rng.randint(1, CUSTOMERS_PER_LEADER)
+        qty = rng.randint(1, 5)
+        rows.append((f"{start.date()} {i * 8 // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000000",
+                     leader, customer, f"9{customer:07d}", rng.choice(PRODUCTS), qty, qty * 3.2))
+    raw = db.engine.raw_connection()
+    raw.cursor().executemany(
+        "INSERT INTO whats_app_order (timestamp, leader_id, customer_id, customer_phone, product_name, quantity, total_price, order_status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'Confirmed')", rows)
+    raw.commit()
+    raw.close()
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_pick_list.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        for l in range(1, LEADERS + 1):
+            db.session.add(GroupLeader(name=f"Leader {l}", phone=f"8{l:07d}", area=f"Block {l}"))
+        for c in range(1, LEADERS * CUSTOMERS_PER_LEADER + 1):
+            db.session.add(Customer(name=f"Neighbour {c}", phone=f"9{c:07d}", leader_id=(c - 1) // CUSTOMERS_PER_LEADER + 1))
+        db.session.commit()
+        seed_day(total)
+
+        started = time.perf_counter()
+        batch = get_batch()
+        built = time.perf_counter() - started
+        csv_bytes = sum(len(chunk) for chunk in iter_csv(batch))
+        rendered = time.perf_counter() - started
+        print(f"Build: {built * 1000:.0f} ms | + CSV ({csv_bytes:,} bytes): {rendered * 1000:.0f} ms | "
+              f"{batch['orders']:,} orders, {len(batch['leaders'])} drops")
+
+        started = time.perf_counter()
+        get_batch()
+        print(f"Cached re-run: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        try:
+            started = time.perf_counter()
+            size = len(xlsx_bytes(batch))
+            print(f"XLSX: {(time.perf_counter() - started) * 1000:.0f} ms ({size:,} bytes)")
+        except ImportError:
+            print("XLSX: skipped (openpyxl not installed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, Product
+from whatsapp.compactor import (empty_summary, note_user_message, note_asked_about, note_cart,
+                                note_order, fold_history, compact_prompt)
+from whatsapp.orders import parse_data_tags, strip_tags
+
+# ==============================================================================
+# BENCHMARK: sales prompt size per turn (raw history[-6:] vs compacted)
+# ==============================================================================
+# Run: python test/bench_prompt_tokens.py [turns]
+# Replays a long scripted conversation through both prompt builders. Tokens
+# come from tiktoken when it is installed, otherwise ~4 characters per token.
+PRODUCTS = ['Mao Bai', 'Kai Lan', 'Cos Lettuce', 'Bak Choy', 'Cai Xin', 'Spinach', 'Kang Kong', 'Xiao Bai Cai']
+SYSTEM_PROMPT = "You are 'Leaf Plant Sales AI'. SALES FLOW RULES: ... " + "\n".join(
+    f"- {name}: $3.20 | 120 units (AVAILABLE)" for name in PRODUCTS)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+    def count_tokens(messages):
+        return sum(len(_encoding.encode(m['content'])) + 4 for m in messages)
+except ImportError:
+    def count_tokens(messages):
+        return sum(len(m['content']) // 4 + 4 for m in messages)
+
+def scripted_turn(i):
+    a, b = PRODUCTS[i % len(PRODUCTS)], PRODUCTS[(i + 3) % len(PRODUCTS)]
+    user = [f"hi, do you have {a}?", f"2 {a} and 1 {b} please", "what else is fresh today?", "yes"][i % 4]
+    lines = "".join(f"• {name}: {q} units = ${q * 3.2:.2f}\n" for name, q in ((a, 2), (b, 1)))
+    reply = (f"Here's your order summary, Sam: 🌿\n\n{lines}\n*Subtotal:* $9.60\n\n"
+             f"Our {b} was harvested this morning and is super crisp - perfect for soups and stir-fries! "
+             f"Would you like to add some {PRODUCTS[(i + 5) % len(PRODUCTS)]} too? 😊\n\nShall I proceed with this order for you?"
+             f"[[DATA: {a} | 2 | 6.40]][[DATA: {b} | 1 | 3.20]]")
+    return user, reply, [(a, 2), (b, 1)]
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_prompt.db')
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Product(name=name, price=3.2, available_qty=120) for name in PRODUCTS])
+        db.session.commit()
+
+        raw_history, compact_history, summary = [], [], empty_summary()
+        raw_sizes, compact_sizes = [], []
+        for i in range(turns):
+            user, reply, lines = scripted_turn(i)
+
+            # Before: raw last 6 messages, unbounded history
+            raw_sizes.append(count_tokens([{"role": "system", "content": SYSTEM_PROMPT}, *raw_history[-6:],
+                                           {"role": "user", "content": user}]))
+            # After: summary + last few messages
+            note_user_message(summary, user)
+            if i % 4 == 0:
+                note_asked_about(summary, PRODUCTS[i % len(PRODUCTS)])
+            compact_sizes.append(count_tokens(compact_prompt(SYSTEM_PROMPT, summary, compact_history, user)))
+            note_cart(summary, parse_data_tags(reply))
+            if user == "yes":
+                note_order(summary, lines, f"turn-{i}")
+
+            for history in (raw_history, compact_history):
+                history += [{"role": "user", "content": user}, {"role": "assistant", "content": strip_tags(reply)}]
+            fold_history(compact_history, summary)
+
+    def describe(sizes):
+        tail = sizes[len(sizes) // 2:]
+        return f"avg {sum(sizes) / len(sizes):.0f}, max {max(sizes)}, steady-state spread {max(tail) - min(tail)}"
+
+    print(f"{turns} turns, tokens per prompt")
+    print(f"  raw history[-6:]:  {describe(raw_sizes)}")
+    print(f"  compacted:         {describe(compact_sizes)}")
+    print(f"  saving:            {100 - sum(compact_sizes) * 100 / sum(raw_sizes):.0f}% per turn")
+    print(f"  in-memory history: {len(raw_history)} messages before, {len(compact_history)} after "
+          f"({summary['folded_turns']} turns folded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# BENCHMARK: webhook rate limiter (cost per check, memory, degrade steps)
+# ==============================================================================
+# Run: python test/bench_rate_limiter.py [phones] [checks]
+# Uses a fake clock so the numbers don't depend on how fast this machine is.
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_ratelimit.db')
+
+from flask import Flask
+from models import db
+from whatsapp.ratelimit import RateLimiter, MemoryBuckets, SQLiteBuckets, Limit, ALLOW, NOTICE, DROP
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+    def __call__(self):
+        return self.now
+
+def bench_memory(phones, checks):
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBuckets(), clock=clock)
+    rng = random.Random(3)
+    numbers = [f"65{rng.randint(80000000, 99999999)}" for _ in range(phones)]
+
+    started = time.perf_counter()
+    for i in range(checks):
+        clock.now += 0.001  # 1,000 inbound messages a second
+        limiter.check_message(numbers[i % phones])
+    elapsed = time.perf_counter() - started
+
+    # Same traffic again into a fresh limiter, this time measuring memory
+    limiter = RateLimiter(MemoryBuckets(), clock=clock)
+    tracemalloc.start()
+    for i in range(checks):
+        clock.now += 0.001
+        limiter.check_message(numbers[i % phones])
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracked = limiter.backend.tracked()
+    clock.now += 600  # Everyone quiet for 10 minutes: all buckets refilled
+    limiter.check_message('6580000000')
+    print(f"Memory backend: {checks:,} checks over {phones:,} phones -> "
+          f"{elapsed / checks * 1e6:.2f} µs/check")
+    print(f"  {tracked:,} buckets held in {memory / 1024 / 1024:.1f} MB "
+          f"({memory / max(tracked, 1):.0f} B/phone); after 10 quiet minutes: {limiter.backend.tracked()}")
+
+def degrade_steps():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBuckets(), phone_limit=Limit(10, 8), clock=clock)
+    decisions = {ALLOW: 0, NOTICE: 0, DROP: 0}
+    for _ in range(200):  # A looping bot: 200 messages in 20 seconds
+        clock.now += 0.1
+        decisions[limiter.check_message('6591234567')] += 1
+    neighbour = limiter.check_message('6598765432')
+    print(f"Spammer, 200 messages in 20s: {decisions[ALLOW]} answered, {decisions[NOTICE]} canned reply, "
+          f"{decisions[DROP]} dropped | neighbour meanwhile: {neighbour}")
+
+    limiter = RateLimiter(MemoryBuckets(), global_limit=Limit(300, 60), clock=clock)
+    decisions = {ALLOW: 0, NOTICE: 0, DROP: 0}
+    for i in range(1000):  # Estate-wide rush: 1,000 turns from 250 phones in 10s
+        clock.now += 0.01
+        decisions[limiter.check_turn(f"659{i % 250:07d}")] += 1
+    print(f"Rush, 1,000 AI turns in 10s: {decisions[ALLOW]} answered, {decisions[NOTICE]} busy replies, "
+          f"{decisions[DROP]} dropped")
+
+def bench_sqlite(checks):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        clock = FakeClock()
+        limiter = RateLimiter(SQLiteBuckets(), clock=clock)
+        started = time.perf_counter()
+        for i in range(checks):
+            clock.now += 0.01
+            limiter.check_message(f"659{i % 500:07d}")
+        elapsed = time.perf_counter() - started
+        print(f"SQLite backend: {checks:,} checks -> {elapsed / checks * 1e3:.2f} ms/check "
+              f"({limiter.snapshot()['tracked_phones']} rows)")
+
+if __name__ == "__main__":
+    phones = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    checks = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    bench_memory(phones, checks)
+    degrade_steps()
+    bench_sqlite(2_000)
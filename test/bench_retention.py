@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+from datetime import timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# BENCHMARK: retention (archive in batches while orders keep coming in)
+# ==============================================================================
+# Run: python test/bench_retention.py [orders]
+# Seeds a year of orders into a throwaway database, then archives everything
+# closed and older than ORDER_RETENTION_DAYS while a second thread keeps
+# committing new orders. Reports the slowest order commit during the run (how
+# long the archive ever held the write lock), and checks that the all-time
+# monthly report adds up to the same totals before and after.
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_retention.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['CONTACT_WRITE_BEHIND'] = '0'
+os.environ['OUTBOX_DISPATCHER'] = '0'
+
+from sqlalchemy import text, select
+from main import create_app
+from models import db, WhatsAppOrder, OrderTransition, GroupLeader, get_sg_time
+from orders.lifecycle import DELIVERED, CANCELLED, CONFIRMED
+from retention import archive
+
+PRODUCTS = ['Mao Bai', 'Kai Lan', 'Cos Lettuce', 'Xiao Bai Cai', 'Bayam']
+
+def seed(total):
+    rng = random.Random(11)
+    now = get_sg_time().replace(tzinfo=None)
+    db.session.add(GroupLeader(name='Bench Leader', phone='80000000', area='Bedok'))
+    db.session.commit()
+    rows = []
+    for i in range(total):
+        age = timedelta(days=365 * (total - i) / total)  # Oldest first, like real ids
+        status = rng.choice([DELIVERED, DELIVERED, DELIVERED, CANCELLED, CONFIRMED])
+        qty = rng.randint(1, 5)
+        rows.append({'customer_id': 1, 'leader_id': 1, 'customer_phone': f"9{i % 900:07d}",
+                     'product_name': rng.choice(PRODUCTS), 'quantity': qty, 'total_price': qty * 2.5,
+                     'order_status': status, 'timestamp': now - age, 'idempotency_key': f"seed:{i}"})
+    db.session.execute(WhatsAppOrder.__table__.insert(), rows)
+    ids = db.session.execute(select(WhatsAppOrder.id, WhatsAppOrder.order_status, WhatsAppOrder.timestamp)).all()
+    db.session.execute(OrderTransition.__table__.insert(),
+                       [{'order_id': i, 'from_status': None, 'to_status': s, 'actor': 'seed', 'created_at': ts}
+                        for i, s, ts in ids])
+    db.session.commit()
+
+def monthly_totals(client):
+    lines = client.get('/admin/reports/monthly-sales').get_data(as_text=True).strip().splitlines()[1:]
+    return sorted(lines)
+
+def file_pages():
+    with db.engine.connect() as conn:
+        return conn.execute(text("PRAGMA page_count")).scalar(), conn.execute(text("PRAGMA freelist_count")).scalar()
+
+def writer(app, stop, latencies):
+    # Stand-in for the webhook: one small order commit every 20 ms
+    with app.app_context():
+        n = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            db.session.add(WhatsAppOrder(customer_id=1, leader_id=1, customer_phone='90000001', product_name='Mao Bai',
+                                         quantity=1, total_price=2.5, order_status=CONFIRMED,
+                                         idempotency_key=f"live:{n}"))
+            db.session.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+            n += 1
+            time.sleep(0.02)
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 60_000
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        seed(total)
+        before = monthly_totals(client)
+        live_before = WhatsAppOrder.query.count()
+        pages_before, _ = file_pages()
+
+        stop, latencies = threading.Event(), []
+        thread = threading.Thread(target=writer, args=(app, stop, latencies))
+        thread.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        moved = archive.archive_orders()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        thread.join()
+        result = archive.compact(['whats_app_order', 'order_transition'])
+        pages_after, free_after = file_pages()
+
+        # Take the writer's orders out of the comparison: they are all this month
+        db.session.execute(text("DELETE FROM whats_app_order WHERE idempotency_key LIKE 'live:%'"))
+        db.session.commit()
+        after = monthly_totals(client)
+        live_after = WhatsAppOrder.query.count()
+        orphans = db.session.execute(text(
+            "SELECT COUNT(*) FROM order_transition t LEFT JOIN whats_app_order o ON o.id = t.order_id WHERE o.id IS NULL"
+        )).scalar()
+
+    latencies.sort()
+    print(f"Archived {moved:,} of {total:,} orders in {elapsed:.2f}s "
+          f"({archive.ARCHIVE_BATCH_SIZE} per batch); live table {live_before:,} -> {live_after:,}")
+    print(f"Concurrent order commits: {len(latencies)}, median {latencies[len(latencies) // 2]:.1f} ms, "
+          f"slowest {latencies[-1]:.1f} ms")
+    print(f"File: {pages_before:,} -> {pages_after:,} pages ({result['pages_freed']:,} freed, {free_after:,} free left)")
+    print(f"Orphaned status history rows: {orphans}")
+    ok = before == after and orphans == 0
+    print("✅ Monthly report identical before/after archiving" if ok else "❌ Monthly report changed after archiving")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
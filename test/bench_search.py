@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import random
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# BENCHMARK: admin search (FTS5) vs. LIKE '%term%'
+# ==============================================================================
+# Run: python test/bench_search.py [inquiries] [customers] [orders]
+# Seeds a throwaway database (the sync triggers index every row as it is
+# inserted), then times /admin/api/search (all three scopes) for a few typical
+# admin searches against a LIKE scan of the one column it would need. Common
+# words let LIKE stop after 20 rows; rare ones make it read the whole table.
+# Also checks that updates and deletes reach the index, and fails if a search
+# averages over BUDGET_MS.
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['CONTACT_WRITE_BEHIND'] = '0'
+os.environ['OUTBOX_DISPATCHER'] = '0'
+
+from sqlalchemy import text
+from main import create_app
+from models import db, ContactInquiry, Customer, WhatsAppOrder, GroupLeader
+
+RUNS = 20
+BUDGET_MS = 50
+FIRST = ['Tan', 'Lim', 'Lee', 'Ng', 'Wong', 'Goh', 'Chua', 'Koh', 'Teo', 'Ong', 'Siti', 'Nur', 'Raj', 'Kumar', 'Aisyah']
+GIVEN = ['Wei Ling', 'Jun Hao', 'Mei Hua', 'Ahmad', 'Priya', 'Kok Leong', 'Hui Min', 'Farid', 'Xin Yi', 'Daniel']
+PRODUCTS = ['Mao Bai', 'Kai Lan', 'Cos Lettuce', 'Xiao Bai Cai', 'Bayam', 'Mizuna', 'Butterhead', 'Romaine']
+TOPICS = ['delivery to Bedok was late', 'wilted leaves in my kai lan', 'can I change my pickup point',
+          'refund for missing bayam', 'do you deliver to Tampines', 'leader not answering WhatsApp',
+          'wrong quantity of mizuna', 'how do I become a group leader', 'payment by PayNow failed']
+
+SEARCHES = [
+    # (label, query, LIKE column + term for the baseline)
+    ('customer name', 'siti nur', ('customer', 'name', 'Siti Nur')),
+    ('phone prefix', '9123', ('customer', 'phone', '9123')),
+    ('complaint word', 'wilted', ('contact_inquiry', 'message', 'wilted')),
+    ('email', 'priya', ('contact_inquiry', 'email', 'priya')),
+    ('product (orders)', 'bayam', ('whats_app_order', 'product_name', 'bayam')),
+    ('one order number', 'order 123456', ('contact_inquiry', 'message', 'Order #123456')),
+]
+
+def seed(inquiries, customers, orders):
+    rng = random.Random(9)
+    db.session.add(GroupLeader(name='Bench Leader', phone='80000000', area='Bedok'))
+    db.session.commit()
+    names = [f"{rng.choice(GIVEN)} {rng.choice(FIRST)}" for _ in range(customers)]
+    db.session.execute(Customer.__table__.insert(), [
+        {'name': name if i % 50 else f"Siti Nur {name}", 'phone': f"65{80000000 + i * 7 % 20000000}", 'leader_id': 1}
+        for i, name in enumerate(names)])
+    db.session.execute(ContactInquiry.__table__.insert(), [
+        {'name': names[i % customers], 'email': f"{names[i % customers].split()[0].lower()}{i}@example.com",
+         'message': f"Hi, {rng.choice(TOPICS)}. Order #{i} - thanks!", 'status': rng.choice(['Pending', 'Resolved'])}
+        for i in range(inquiries)])
+    db.session.execute(WhatsAppOrder.__table__.insert(), [
+        {'customer_id': i % customers + 1, 'leader_id': 1, 'customer_phone': f"65{80000000 + i % customers}",
+         'product_name': rng.choice(PRODUCTS), 'quantity': 1, 'total_price': 2.5, 'order_status': 'Delivered',
+         'idempotency_key': f"seed:{i}"}
+        for i in range(orders)])
+    db.session.commit()
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        result = fn()
+    return (time.perf_counter() - started) / RUNS * 1000, result
+
+def check_sync(client):
+    customer = db.session.get(Customer, 1)
+    customer.name = 'Zulkifli Renamed'
+    db.session.commit()
+    renamed = client.get('/admin/api/search?scope=customers&q=zulkifli').get_json()['results']['customers']['results']
+    inquiry = ContactInquiry.query.filter(ContactInquiry.message.like('%wilted%')).first()
+    marker = f"#{inquiry.id} "
+    db.session.delete(inquiry)
+    db.session.commit()
+    hits = client.get('/admin/api/search?scope=inquiries&q=wilted&per_page=50').get_json()['results']['inquiries']
+    index_count = db.session.execute(text("SELECT COUNT(*) FROM contact_inquiry_fts")).scalar()
+    return ([r['id'] for r in renamed] == [1] and all(marker not in r['snippet_html'] for r in hits['results'])
+            and index_count == ContactInquiry.query.count())
+
+def main():
+    inquiries = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    customers = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    orders = int(sys.argv[3]) if len(sys.argv) > 3 else 300_000
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(inquiries, customers, orders)
+        print(f"Seeded {inquiries:,} inquiries, {customers:,} customers, {orders:,} orders "
+              f"in {time.perf_counter() - started:.1f}s (indexed by the triggers)")
+
+        email = db.session.get(ContactInquiry, 1234).email  # One person's past inquiries
+        searches = SEARCHES + [('one email', email, ('contact_inquiry', 'email', email))]
+
+        slowest = 0.0
+        print(f"{'Search':<18} {'FTS ms':>7} {'LIKE ms':>8} {'hits/page':>10}")
+        for label, q, (table, column, term) in searches:
+            fts_ms, data = timed(lambda: client.get(f'/admin/api/search?q={q}').get_json())
+            like_ms, _ = timed(lambda: db.session.execute(text(
+                f"SELECT id FROM {table} WHERE {column} LIKE :term ORDER BY id DESC LIMIT 20"),
+                {'term': f"%{term}%"}).all())
+            hits = sum(len(page['results']) for page in data['results'].values())
+            slowest = max(slowest, fts_ms)
+            print(f"{label:<18} {fts_ms:>7.1f} {like_ms:>8.1f} {hits:>10}")
+
+        deep_ms, _ = timed(lambda: client.get('/admin/api/search?scope=orders&q=kai&page=40').get_json())
+        print(f"Page 40 of 'kai' orders: {deep_ms:.1f} ms")
+        synced = check_sync(client)
+
+    print("Index follows updates/deletes" if synced else "❌ Index out of sync with the tables")
+    ok = synced and slowest <= BUDGET_MS
+    print(f"✅ Slowest search {slowest:.1f} ms (budget {BUDGET_MS} ms, all three scopes)" if ok
+          else f"❌ Slowest search {slowest:.1f} ms (budget {BUDGET_MS} ms)")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import io
+import time
+import random
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# REPLAY: batched WhatsApp webhook payloads (throughput + nothing dropped)
+# ==============================================================================
+# Run: python test/bench_webhook_replay.py [payloads] [messages_per_payload]
+# Uses a throwaway SQLite file, no OpenAI key and no WhatsApp credentials, so
+# every reply takes the offline path - this measures the webhook itself.
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_webhook.db')
+os.environ['OPENAI_API_KEY'] = ''
+os.environ['WHATSAPP_ACCESS_TOKEN'] = ''
+os.environ['COALESCE_WINDOW_MS'] = '0'  # Answer inline so the timing covers the full turn
+os.environ['RATE_LIMIT_PHONE_BURST'] = os.environ['RATE_LIMIT_GLOBAL_BURST'] = '100000'  # Limits off
+
+from sqlalchemy import event
+from models import db, Customer, GroupLeader, Product, set_sqlite_pragma
+from migrations import upgrade_schema
+from whatsapp.app import app
+
+CUSTOMERS = 200
+
+def build_payloads(total, per_payload):
+    # Backlog shape: several entries/changes per POST, some redeliveries and media
+    rng = random.Random(7)
+    payloads, expected, msg_no = [], 0, 0
+    for p in range(total):
+        entries = []
+        for e in range(3):
+            messages = []
+            for _ in range(per_payload // 3):
+                msg_no += 1
+                sender = f"9{rng.randint(0, CUSTOMERS * 2):07d}"  # About half are new prospects
+                if rng.random() < 0.05:
+                    messages.append({'from': sender, 'id': f"wamid.{msg_no}", 'type': 'image', 'timestamp': str(msg_no)})
+                else:
+                    messages.append({'from': sender, 'id': f"wamid.{msg_no}", 'type': 'text',
+                                     'timestamp': str(msg_no), 'text': {'body': rng.choice(['hi', 'thanks', '3', 'Do you have Mao Bai?'])}})
+                expected += 1
+            entries.append({'changes': [{'value': {'messages': messages}}]})
+        payloads.append({'entry': entries})
+    # Meta retries: the first few payloads arrive twice
+    payloads += payloads[:max(total // 20, 1)]
+    return payloads, expected
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_payload = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+
+    with app.app_context():
+        event.listen(db.engine, "connect", set_sqlite_pragma)
+        db.create_all()
+        upgrade_schema()
+        leader = GroupLeader(name='Bench Leader', phone='80000000', area='Bedok')
+        db.session.add(leader)
+        db.session.add(Product(name='Mao Bai', price=3.2, available_qty=500))
+        db.session.commit()
+        db.session.add_all([Customer(name=f"Neighbour {c}", phone=f"9{c:07d}", leader_id=leader.id) for c in range(CUSTOMERS)])
+        db.session.commit()
+
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(1))
+
+    payloads, expected = build_payloads(total, per_payload)
+    client = app.test_client()
+    counts = {'processed': 0, 'non_text': 0, 'limited': 0, 'duplicates': 0, 'errors': 0}
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # "credentials missing" per reply
+        for payload in payloads:
+            result = client.post('/webhook', json=payload).get_json()
+            for key in counts:
+                counts[key] += result.get(key, 0)
+    elapsed = time.perf_counter() - started
+
+    handled = counts['processed'] + counts['non_text'] + counts['limited'] + counts['errors']
+    print(f"{len(payloads)} payloads / {handled:,} messages in {elapsed:.2f}s -> "
+          f"{len(payloads) / elapsed:.0f} payloads/s, {handled / elapsed:.0f} messages/s")
+    print(f"Handled {handled:,} of {expected:,} unique messages | {counts}")
+    print(f"SQL statements per message: {len(queries) / max(handled, 1):.1f}")
+
+if __name__ == "__main__":
+    main()
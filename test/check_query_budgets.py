@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ==============================================================================
+# QUERY BUDGET CHECK: dashboards must not grow queries with data size
+# ==============================================================================
+# Run: python test/check_query_budgets.py
+# Seeds a throwaway database at a small and a large size (each in its own
+# process, so no in-process cache carries over), requests every page below in
+# strict mode and fails if a route goes over its @query_budget or runs more
+# queries on the large data set than on the small one.
+SIZES = (6, 90)    # Customers (3 orders each)
+ROUTES = [
+    '/leader',
+    '/leader/dashboard',
+    '/leader/pick-list',
+    '/leader/api/orders/1/history',
+    '/admin/dashboard',
+    '/admin/api/inquiries',
+    '/admin/api/commissions',
+    '/admin/api/stock-signals',
+    '/admin/pick-list',
+    '/admin/pick-list?format=csv',
+    '/admin/api/outbox',
+    '/admin/reports/monthly-sales',
+    '/admin/api/search?q=neighbour',
+    '/product',
+    '/api/products',
+]
+
+def seed(size):
+    from models import db, Product, GroupLeader, Customer, ContactInquiry
+    from whatsapp.orders import finalize_order
+
+    db.session.add_all([Product(name=name, price=3.2, available_qty=100_000, status='In Stock')
+                        for name in ('Mao Bai', 'Cos Lettuce', 'Kai Lan')])
+    leaders = [GroupLeader(name=f"Leader {l}", phone=f"8000000{l}", area=f"Block {l}") for l in range(1, 4)]
+    db.session.add_all(leaders)
+    db.session.commit()
+    customers = [Customer(name=f"Neighbour {c}", phone=f"9{c:07d}", leader_id=leaders[c % 3].id) for c in range(size)]
+    db.session.add_all(customers)
+    db.session.add_all([ContactInquiry(name=f"Visitor {i}", email='visitor@example.com',
+                                       message='Do you deliver to Bedok?') for i in range(size * 3)])
+    db.session.commit()
+
+    for c, customer in enumerate(customers):
+        for i in range(3):
+            finalize_order(customer, customer.phone, [('mao bai', 1), ('kai lan', 2)], f"seed-{c}-{i}")
+
+    # Half the neighbours moved away: their old orders stay with the leader, but
+    # they are no longer in the leader's neighbour list (no identity-map hits)
+    for customer in customers[::2]:
+        customer.leader_id = None
+    db.session.commit()
+
+def measure(size):
+    db_path = os.path.join(tempfile.mkdtemp(), 'budget.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['QUERY_BUDGET_STRICT'] = '1'
+    os.environ['CONTACT_WRITE_BEHIND'] = '0'
+
+    from main import create_app
+    app = create_app()
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    with app.app_context():
+        seed(size)
+
+    client = app.test_client()
+    counts, errors = {}, {}
+    for url in ROUTES:
+        try:
+            response = client.get(url)
+            counts[url] = int(response.headers.get('X-Query-Count', -1))
+        except Exception as e:  # QueryBudgetExceeded (or a broken page)
+            errors[url] = str(e)
+    print(json.dumps({'counts': counts, 'errors': errors}))
+
+def main():
+    results = {}
+    for size in SIZES:
+        out = subprocess.run([sys.executable, __file__, '--size', str(size)],
+                             capture_output=True, text=True, check=True).stdout
+        results[size] = json.loads(out.strip().splitlines()[-1])
+
+    small, large = (results[size] for size in SIZES)
+    failed = False
+    print(f"{'Route':<34} {'queries':>8} {'large':>6}")
+    for url in ROUTES:
+        error = small['errors'].get(url) or large['errors'].get(url)
+        a, b = small['counts'].get(url), large['counts'].get(url)
+        status = 'OK'
+        if error:
+            status, failed = 'FAIL', True
+        elif a != b:
+            status, failed = 'GROWS', True
+        print(f"{url:<34} {a if a is not None else '-':>8} {b if b is not None else '-':>6}  {status}")
+        if error:
+            print('   ' + error.replace('\n', '\n   '))
+
+    print("❌ Query budget check failed" if failed else "✅ All routes within budget")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    if '--size' in sys.argv:
+        measure(int(sys.argv[sys.argv.index('--size') + 1]))
+    else:
+        main()
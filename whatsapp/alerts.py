@@ -0,0 +1,75 @@
+from datetime import datetime
+import pytz
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, StockAlert, Product, get_sg_time
+from whatsapp.outbox import enqueue_message
+
+# ==============================================================================
+# 1. SUBSCRIBE (UPSERT ONE ROW PER PHONE + PRODUCT)
+# ==============================================================================
+def subscribe_stock_alert(customer_phone, product_name):
+    # Saying "yes" twice (or again after a previous restock) re-arms the same row
+    stmt = sqlite_insert(StockAlert).values(
+        customer_phone=str(customer_phone),
+        product_name=product_name,
+        is_notified=False,
+        created_at=get_sg_time()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['customer_phone', 'product_name'],
+        set_={'is_notified': False, 'notified_at': None, 'created_at': stmt.excluded.created_at}
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+# ==============================================================================
+# 2. GROUPED RESTOCK FAN-OUT (ONE MESSAGE PER CUSTOMER)
+# ==============================================================================
+def build_restock_message(items):
+    lines = "\n".join(f"• *{name}* ({qty} units available)" for name, qty in items)
+    return (f"🌿 *FARM RESTOCK ALERT*\n\n"
+            f"Hi! Good news from the farm, these items you asked about are back in stock: 🚜\n\n"
+            f"{lines}\n\n"
+            f"Would you like to place an order?")
+
+def notify_restocked(product_names=None):
+    # Every pending alert whose product is now orderable, in one join
+    ready_query = db.session.query(StockAlert.id, StockAlert.customer_phone, Product.name, Product.available_qty)\
+        .join(Product, Product.name == StockAlert.product_name)\
+        .filter(StockAlert.is_notified == False, Product.available_qty > 0, Product.status == 'In Stock')
+
+    if product_names is not None:
+        # Only customers waiting on one of the restocked products, but their
+        # message still lists everything else of theirs that is back
+        waiting_phones = db.session.query(StockAlert.customer_phone)\
+            .filter(StockAlert.product_name.in_(product_names), StockAlert.is_notified == False)
+        ready_query = ready_query.filter(StockAlert.customer_phone.in_(waiting_phones))
+
+    ready = ready_query.all()
+    if not ready:
+        return {'customers': 0, 'alerts': 0, 'ready': 0}
+
+    # Claim the alerts before queueing anything: the admin stock edit and the
+    # scheduled sweep can read the same pending rows, and only the call whose
+    # UPDATE flips is_notified gets to message the customer. Message rows and
+    # the flags commit together, so an alert is marked notified exactly when
+    # its message is in the outbox.
+    claimed = set(db.session.execute(
+        update(StockAlert)
+        .where(StockAlert.id.in_([row.id for row in ready]), StockAlert.is_notified == False)
+        .values(is_notified=True, notified_at=datetime.now(pytz.timezone('Asia/Singapore')))
+        .returning(StockAlert.id)
+    ).scalars())
+
+    by_phone = {}
+    for alert_id, phone, product_name, qty in ready:
+        if alert_id in claimed:
+            by_phone.setdefault(phone, []).append((product_name, qty))
+
+    for phone, items in by_phone.items():
+        enqueue_message(phone, build_restock_message(items), kind='restock')
+        print(f"✅ Restock alert queued for {phone} ({len(items)} items)")
+    db.session.commit()
+
+    return {'customers': len(by_phone), 'alerts': len(claimed), 'ready': len(ready)}
@@ -8,17 +8,31 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # ==============================================================================
 # 1. Standard Imports FIXED
 # ==============================================================================
-import requests
 import re
 import io
+import uuid
 from datetime import datetime
 from flask import Flask, request, jsonify
-from openai import OpenAI
 from dotenv import load_dotenv
 import pytz
 from models import db, ContactInquiry, Product, Customer, WhatsAppOrder, WhatsAppLead, StockAlert, set_sqlite_pragma, GroupLeader
 from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy import event
+from whatsapp.outbox import enqueue_message, reply_key, init_outbox
+from whatsapp.llm import get_llm_client
+from whatsapp.alerts import subscribe_stock_alert
+from whatsapp.orders import (finalize_order, parse_data_tags, strip_tags, describe_order_problems, OrderValidationError,
+                             is_order_committed, already_secured_reply)
+from whatsapp.webhook import extract_messages, group_by_sender, load_customers
+from whatsapp.coalesce import MessageCoalescer, COALESCE_WINDOW_MS
+from whatsapp.inbound import store_pending, discard_pending, load_pending
+from whatsapp.ratelimit import limiter, ALLOW, NOTICE, SLOW_DOWN_REPLY, BUSY_REPLY
+from whatsapp.compactor import (load_summary, save_summary, note_user_message, note_asked_about, note_cart,
+                                note_order, fold_history, compact_prompt, KEEP_MESSAGES)
+from whatsapp.state import (get_state, set_state, clear_state,
+                            AWAITING_ALERT_CONFIRMATION, AWAITING_QUANTITY, ORDER_SUMMARY_PENDING,
+                            ORDER_JUST_CONFIRMED)
+from migrations import ensure_schema
 
 # ==============================================================================
 # 2. Configuration & Security FIXED
@@ -34,18 +48,16 @@ app = Flask(__name__)
 
 # --- DATABASE CONFIGURATION ---
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, '..', 'leafplant.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, '..', 'leafplant.db'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
-processed_messages = set()
 conversation_history = {} 
-pending_alerts_dict = {}  # Global dictionary for OOS memory
 
-try:
-    client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-except Exception:
-    client = None
+# "3", "3 packs", "x3" etc. as a reply to "how many would you like?"
+QUANTITY_REPLY_RE = re.compile(r"^x?\s*(\d{1,3})\s*(?:x|units?|packs?|pcs|bunch(?:es)?|please|pls)?\s*$")
+
+# The OpenAI client is created on the first AI turn (whatsapp/llm.py)
 
 # ==============================================================================
 # 3. Database Helper Logic FIXED
@@ -60,34 +72,11 @@ def get_inventory_string():
         output += f"- {p.name}: ${p.price} | {p.available_qty} units ({status_label})\n"
     return output
 
-def deduct_stock_db(product_name, qty_to_deduct):
-    product = Product.query.filter(Product.name.ilike(f"%{product_name}%")).first()
-    if product and product.available_qty >= int(qty_to_deduct):
-        product.available_qty -= int(qty_to_deduct)
-        product.status = "Out of Stock" if product.available_qty <= 0 else "In Stock"
-        flag_modified(product, "status")
-        db.session.commit() 
-        return True
-    return False
-
 # ==============================================================================
 # 4. Outgoing Message Helper
 # ==============================================================================
-def send_whatsapp_message(to_phone, message_text):
-    url = f"https://graph.facebook.com/v24.0/{PHONE_NUMBER_ID}/messages"
-    headers = {"Authorization": f"Bearer {YOUR_ACCESS_TOKEN}"}
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": str(to_phone),
-        "type": "text",
-        "text": {"body": message_text}
-    }
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"❌ Error sending WhatsApp: {e}")
-        return False
+# Replies are never sent inline: reply_to_burst queues them in the outbox
+# (whatsapp/outbox.py) and the dispatcher delivers them, with retries.
 
 # ==============================================================================
 # 5. New Prospect Handling
@@ -108,7 +97,7 @@ def handle_new_prospect(customer_number, customer_message, history):
     """
     messages = [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": customer_message}]
     try:
-        completion = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+        completion = get_llm_client().chat.completions.create(model="gpt-4o-mini", messages=messages)
         ai_reply = completion.choices[0].message.content
         name_match = re.search(r"\[\[NAME:\s*(.*?)\]\]", ai_reply)
         addr_match = re.search(r"\[\[ADDRESS:\s*(.*?)\]\]", ai_reply)
@@ -127,8 +116,29 @@ def handle_new_prospect(customer_number, customer_message, history):
 # ==============================================================================
 # 6. AI Sales Engine (STABLE DB UPDATES + STRICT CONFIRMATION LOGIC)
 # ==============================================================================
-def get_openai_response(customer_message, customer_number, customer_obj):
-    if not client: return "AI Offline."
+def build_order_summary(customer_obj, lines):
+    # Deterministic pre-order summary (same shape the LLM uses) + one cross-sell
+    subtotal = 0.0
+    summary = f"Here's your order summary, {customer_obj.name}: 🌿\n\n"
+    for product, qty in lines:
+        subtotal += product.price * qty
+        summary += f"• {product.name}: {qty} units = ${product.price * qty:.2f}\n"
+    summary += f"\n*Subtotal:* ${subtotal:.2f}\n"
+
+    selected = {product.id for product, _ in lines}
+    suggestion = Product.query.filter(
+        Product.status == "In Stock", Product.available_qty > 0, ~Product.id.in_(selected)
+    ).order_by(Product.available_qty.desc()).first()
+    if suggestion:
+        summary += f"\nWould you like to add some {suggestion.name} too? 😊\n"
+    return summary + "\nShall I proceed with this order for you?"
+
+def get_openai_response(customer_message, customer_number, customer_obj, msg_id=None, summary=None):
+    # The inbound WhatsApp message id names this conversation turn; orders are
+    # keyed on the turn whose summary the customer confirmed (see step 9)
+    turn_id = msg_id or uuid.uuid4().hex
+    # Rolling summary of older turns; the caller saves it after the reply
+    summary = summary if summary is not None else load_summary(customer_number)
 
     # --- 1. FORCE LIVE DB SYNC ---
     db.session.expire_all() 
@@ -159,34 +169,83 @@ def get_openai_response(customer_message, customer_number, customer_obj):
         if p.name.lower() in user_input_low:
             mentioned_product = p
             break
+    note_user_message(summary, customer_message)
+    if mentioned_product:
+        note_asked_about(summary, mentioned_product.name)
 
     # --- 5. OOS GATE (STOCK ALERT FIRST) ---
     if mentioned_product:
         if mentioned_product.available_qty <= 0 or mentioned_product.status == "Out of Stock":
-            pending_alerts_dict[customer_number] = mentioned_product.name
+            set_state(customer_number, AWAITING_ALERT_CONFIRMATION, {"product": mentioned_product.name})
             return (
                 f"Oh, I'm so sorry, {customer_obj.name}! 🌱 *{mentioned_product.name}* is sold out. 😕 "
                 "Would you like me to notify you the second it's back? Just say *YES*! 🌿"
             )
 
-    # --- 6. STOCK ALERT CONFIRMATION ---
+    # --- 6. SHORT REPLIES RESOLVED FROM CONVERSATION STATE (NO LLM) ---
     affirmative_words = ["yes", "ok", "alert", "notify", "sure", "want", "yep", "please", "confirm"]
-    if any(word == user_input_low for word in affirmative_words):
-        product_name = pending_alerts_dict.get(customer_number)
-        if product_name:
-            try:
-                db.session.add(StockAlert(customer_phone=str(customer_number), product_name=product_name, is_notified=False))
-                db.session.commit()
-                pending_alerts_dict.pop(customer_number, None)
-                return (f"Done! ✅ I've added you to the list for *{product_name}*. 🌿\n\n"
-                        "In the meantime, would you like to see what else is available? 😊")
-            except Exception: db.session.rollback()
+    is_affirmative = any(word == user_input_low for word in affirmative_words)
+    state, payload = get_state(customer_number)
+
+    # 6a. "YES" to a sold-out item -> stock alert subscription
+    if state == AWAITING_ALERT_CONFIRMATION and is_affirmative:
+        product_name = payload.get("product")
+        try:
+            subscribe_stock_alert(customer_number, product_name)
+            clear_state(customer_number)
+            return (f"Done! ✅ I've added you to the list for *{product_name}*. 🌿\n\n"
+                    "In the meantime, would you like to see what else is available? 😊")
+        except Exception: db.session.rollback()
+
+    # 6b. "3" / "3 packs" after we asked how many -> deterministic summary
+    qty_match = QUANTITY_REPLY_RE.match(user_input_low)
+    if state == AWAITING_QUANTITY and qty_match and int(qty_match.group(1)) > 0:
+        product = Product.query.filter_by(name=payload.get("product")).first()
+        qty = int(qty_match.group(1))
+        if product and product.status == "In Stock" and product.available_qty >= qty:
+            set_state(customer_number, ORDER_SUMMARY_PENDING, {"lines": [[product.name, qty]], "turn": turn_id})
+            note_cart(summary, [(product.name, qty)])
+            return build_order_summary(customer_obj, [(product, qty)])
+
+    # 6c. "YES" to a deterministic summary -> commit the order. The lines are
+    # dropped afterwards: only a bare "YES" straight after the confirmation
+    # (6d) is a repeat, anything else starts over.
+    if state == ORDER_SUMMARY_PENDING and is_affirmative and payload.get("lines"):
+        try:
+            confirmation = finalize_order(customer_obj, customer_number, payload["lines"], payload.get("turn", turn_id),
+                                          reply_key=reply_key(turn_id))
+            set_state(customer_number, ORDER_JUST_CONFIRMED, {"turn": payload.get("turn", turn_id)})
+            note_order(summary, payload["lines"], payload.get("turn", turn_id))
+            return confirmation
+        except OrderValidationError as e:
+            clear_state(customer_number)
+            return describe_order_problems(customer_obj, e)
+        except Exception as e:
+            # Nothing was placed: the summary stays open so "YES" can retry it
+            db.session.rollback()
+            print(f"❌ Order commit failed for {customer_number}: {e}")
+            return (f"Sorry, {customer_obj.name}! 😕 I couldn't place your order just now. "
+                    "Please reply *YES* again in a moment to try once more. 🌿")
+
+    # 6d. A second "YES" right after the confirmation (double send) -> same order
+    if state == ORDER_JUST_CONFIRMED and is_affirmative and is_order_committed(payload.get("turn")):
+        return already_secured_reply(customer_obj)
+
+    # Anything else moves the conversation on: forget the stale state, but
+    # remember the product if they're asking about one without a quantity.
+    # An open summary's turn keys the order it confirms.
+    summary_turn = payload.get("turn") if state == ORDER_SUMMARY_PENDING else None
+    awaiting_quantity = mentioned_product is not None and not any(ch.isdigit() for ch in user_input_low)
+    if awaiting_quantity:
+        set_state(customer_number, AWAITING_QUANTITY, {"product": mentioned_product.name, "turn": turn_id})
+    elif state:
+        clear_state(customer_number)
+
+    client = get_llm_client()
+    if not client: return "AI Offline."
 
     history = conversation_history.get(customer_number, [])
-    is_already_finalized = any("ORDER SECURED" in m["content"] for m in history[-2:])
     
-    leader_name = customer_obj.leader.name if customer_obj.leader else "Test Leader"
-    leader_phone = str(customer_obj.leader.phone).split(".")[0] if customer_obj.leader else "6500000000"
     sg_now = datetime.now(pytz.timezone("Asia/Singapore")).strftime("%A, %d %B %Y")
 
     # --- 7. SYSTEM PROMPT (STRICT SEPARATION OF CONFIRMATION & SUGGESTIONS) ---
@@ -203,55 +262,50 @@ def get_openai_response(customer_message, customer_number, customer_obj):
        - Show the subtotal for currently selected items.
        - Suggest ONE related available item (e.g., "Would you like to add some Mao Bai too?").
        - Ask: "Shall I proceed with this order for you?"
+       - End the summary message with [[STATUS: SUMMARY]].
     3. THE "YES" RULE: If a user says "Yes", "Ok", or "Confirm" without mentioning the cross-sell item, interpret this ONLY as confirming the current summary. DO NOT add the suggested item to the data tags unless they explicitly say "Add [Qty] of [Item]".
     4. CONFIRMATION: Once they agree to a summary, add [[STATUS: CONFIRMED]].
     5. DATA: Output [[DATA: Item | Qty | TotalPrice]] only for confirmed items.
     """
 
-    messages = [{"role": "system", "content": system_prompt}, *history[-6:], {"role": "user", "content": customer_message}]
+    # Fixed size: system prompt + compact summary + the last few messages
+    messages = compact_prompt(system_prompt, summary, history, customer_message)
 
     try:
         completion = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
         ai_reply = completion.choices[0].message.content
         is_ai_confirmed = "[[STATUS: CONFIRMED]]" in ai_reply
-        clean_reply = re.sub(r"\[\[DATA:.*?\]\]", "", ai_reply)
-        clean_reply = re.sub(r"\[\[STATUS:.*?\]\]", "", clean_reply).strip()
-
-        # --- 8. DATA EXTRACTION ---
-        order_matches = re.findall(r"\[\[DATA:\s*(.*?)\s*\]\]", ai_reply)
-        if not order_matches: 
-            for h in reversed(history[-2:]):
-                order_matches = re.findall(r"\[\[DATA:\s*(.*?)\s*\]\]", h.get("content", ""))
-                if order_matches: break
-
-        # --- 9. DATABASE UPDATES ---
-        if order_matches and is_ai_confirmed and not is_already_finalized:
-            order_summary_text, grand_total = "", 0.0
-            pending_db_entries = []
-
-            for match in order_matches:
-                parts = [p.strip() for p in match.split("|")]
-                if len(parts) != 3: continue 
-                item_name, qty_str, total_str = parts[0], re.sub(r"[^\d]", "", parts[1]), re.sub(r"[^\d.]", "", parts[2])
-
-                if qty_str and total_str:
-                    qty, item_total = int(qty_str), float(total_str)
-                    if qty > 0 and deduct_stock_db(item_name, qty):
-                        pending_db_entries.append(WhatsAppOrder(
-                            customer_id=customer_obj.id, leader_id=customer_obj.leader_id,
-                            customer_phone=str(customer_number), product_name=item_name,
-                            quantity=qty, total_price=item_total,
-                            commission_earned=item_total * 0.111, order_status="Confirmed"
-                        ))
-                        order_summary_text += f"• {item_name}: {qty} units = ${item_total:.2f}\n"
-                        grand_total += item_total
-
-            if pending_db_entries:
-                for o in pending_db_entries: db.session.add(o)
-                db.session.commit()
-                return (f"✨ *ORDER SECURED* 🌿\n\nThank you, {customer_obj.name}! 🌟 Your order is confirmed!\n\n"
-                        f"{order_summary_text}*Total Price:* ${grand_total:.2f}\n\n"
-                        f"Delivery via {leader_name} (+{leader_phone}). 😊🌱")
+        is_ai_summary = "[[STATUS: SUMMARY]]" in ai_reply
+        clean_reply = strip_tags(ai_reply)
+
+        # --- 8. DATA EXTRACTION (only the model's [[DATA]] tags) ---
+        # The cart in the summary is guessed from free text ("my 2 kids love
+        # kai lan"), so it is prompt context only and never becomes an order
+        order_lines = parse_data_tags(ai_reply)
+        if order_lines:
+            note_cart(summary, order_lines)
+
+        # --- 9. DATABASE UPDATES (Validated + priced against the catalog) ---
+        # Keyed on the turn that showed the summary, so a second "yes" is a no-op
+        if order_lines and is_ai_confirmed:
+            order_turn = summary_turn or turn_id
+            try:
+                confirmation = finalize_order(customer_obj, customer_number, order_lines, order_turn,
+                                              reply_key=reply_key(turn_id))
+                set_state(customer_number, ORDER_JUST_CONFIRMED, {"turn": order_turn})
+                note_order(summary, order_lines, order_turn)
+                return confirmation
+            except OrderValidationError as e:
+                return describe_order_problems(customer_obj, e)
+        if is_ai_confirmed:
+            # "Confirmed" without the items: nothing was placed, so don't say it was
+            print(f"⚠️ Confirmation without [[DATA]] lines for {customer_number} - not placing an order")
+            return (f"Sorry, {customer_obj.name}! 😕 I couldn't read the items for that order. "
+                    "Could you tell me again what you'd like and how many? 🌿")
+
+        # Only a reply that shows a summary is what a following "yes" confirms
+        if is_ai_summary and not awaiting_quantity:
+            set_state(customer_number, ORDER_SUMMARY_PENDING, {"turn": turn_id})
 
         return clean_reply
     except Exception as e:
@@ -261,35 +315,155 @@ def get_openai_response(customer_message, customer_number, customer_obj):
 # ==============================================================================
 # 7. Webhook Handling
 # ==============================================================================
+def send_canned_reply(customer_number, msg_id, text):
+    # Rate-limit replies skip the LLM and the conversation history
+    enqueue_message(customer_number, text, kind='limit', dedup_key=reply_key(msg_id))
+    db.session.commit()
+
+def admit_messages(customer_number, messages, stats):
+    # Per-phone limit: messages past it never reach the coalescer or the LLM
+    admitted = []
+    for msg in messages:
+        decision = limiter.check_message(customer_number)
+        if decision == ALLOW:
+            admitted.append(msg)
+            continue
+        stats["limited"] += 1
+        if decision == NOTICE:
+            send_canned_reply(customer_number, msg.id, SLOW_DOWN_REPLY)
+    return admitted
+
+def reply_to_burst(customer_number, messages, customer, pending=False):
+    # One turn for the whole burst: texts joined in send order, keyed on the
+    # newest message id (the idempotency key for any order it confirms).
+    # pending: the burst sits in pending_inbound and leaves it with the reply
+    customer_message = "\n".join(m.text for m in messages)
+    turn_id = messages[-1].id
+
+    # Global limit: under a rush, shed turns before they cost an LLM call
+    decision = limiter.check_turn(customer_number)
+    if decision != ALLOW:
+        if pending:
+            discard_pending(messages)
+        if decision == NOTICE:
+            send_canned_reply(customer_number, turn_id, BUSY_REPLY)
+        else:
+            db.session.commit()
+        return
+    summary = load_summary(customer_number) if customer else None
+    if customer:
+        reply = get_openai_response(customer_message, customer_number, customer, turn_id, summary)
+    else:
+        reply = handle_new_prospect(customer_number, customer_message, conversation_history.get(customer_number, [])[-4:])
+
+    if customer_number not in conversation_history: conversation_history[customer_number] = []
+    history = conversation_history[customer_number]
+    history.append({"role": "user", "content": customer_message})
+    history.append({"role": "assistant", "content": reply})
+    # The reply is queued in the outbox and commits with the summary (a no-op
+    # if finalize_order already queued it as the order confirmation)
+    enqueue_message(customer_number, reply, kind='reply', dedup_key=reply_key(turn_id))
+    if pending:
+        discard_pending(messages)
+    # Older turns fold into the summary; only the prompt window stays in memory
+    if summary is not None:
+        fold_history(history, summary)
+        save_summary(customer_number, summary)
+    else:
+        del history[:-KEEP_MESSAGES]
+        db.session.commit()
+
+def process_burst(customer_number, messages):
+    # Called by the coalescer once the phone has gone quiet (own app context)
+    customer = load_customers([customer_number]).get(customer_number)
+    reply_to_burst(customer_number, messages, customer, pending=True)
+
+def replay_pending_inbound():
+    # Bursts a crash/restart left unanswered: back to the coalescer (or answered
+    # here if coalescing has been switched off since)
+    bursts, stale = load_pending()
+    if stale:
+        print(f"🗑️ Dropped {stale} pending inbound message(s) older than the replay window")
+    if not bursts:
+        return
+    print(f"📥 Replaying {sum(len(m) for m in bursts.values())} pending inbound message(s) from {len(bursts)} phone(s)")
+    for sender, texts in bursts.items():
+        if coalescer:
+            coalescer.add(sender, texts)
+            continue
+        try:
+            process_burst(sender, texts)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Replay failed for {sender}: {e}")
+
+coalescer = MessageCoalescer(app, process_burst) if COALESCE_WINDOW_MS > 0 else None
+outbox = init_outbox(app)  # Sends queued replies off the request path
+
 @app.route('/webhook', methods=['POST'])
 def handle_message():
-    data = request.get_json()
-    value = data.get('entry', [{}])[0].get('changes', [{}])[0].get('value', {})
-    if 'messages' not in value: return jsonify({"status": "ignored"}), 200
+    # Always 200: Meta redelivers anything else, and a malformed payload would
+    # only fail again
     try:
-        msg = value['messages'][0]
-        customer_number, msg_id = msg['from'], msg['id']
-        if msg.get('type') != 'text': return jsonify({"status": "non_text"}), 200
-        customer_message = msg['text']['body']
-        if msg_id in processed_messages: return jsonify({"status": "duplicate"}), 200
-        processed_messages.add(msg_id) 
-
-        db.session.expire_all() 
-        customer = Customer.query.filter_by(phone=customer_number).first()
-        if customer:
-            reply = get_openai_response(customer_message, customer_number, customer)
+        return handle_payload(request.get_json(silent=True) or {})
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Webhook payload failed: {e}")
+        return jsonify({"status": "error"}), 200
+
+def handle_payload(data):
+    # Every entry/change/message in the POST, deduped and grouped per sender
+    senders, duplicates = group_by_sender(extract_messages(data))
+    if not senders:
+        return jsonify({"status": "duplicate" if duplicates else "ignored", "duplicates": duplicates}), 200
+
+    stats = {"processed": 0, "queued": 0, "non_text": 0, "limited": 0, "errors": 0, "duplicates": duplicates}
+    bursts = {}
+    for sender, messages in senders.items():
+        texts = [m for m in messages if m.text is not None]
+        stats["non_text"] += len(messages) - len(texts)
+        texts = admit_messages(sender, texts, stats)
+        if texts:
+            bursts[sender] = texts
+
+    # Coalescing on: store the burst, then buffer it and answer Meta straight
+    # away. Meta never redelivers after a 200, so nothing is buffered that a
+    # restart could lose; if the store fails, answer inline instead.
+    if coalescer:
+        try:
+            store_pending(bursts)
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Couldn't store pending inbound messages, answering inline: {e}")
         else:
-            reply = handle_new_prospect(customer_number, customer_message, conversation_history.get(customer_number, [])[-4:])
-
-        if customer_number not in conversation_history: conversation_history[customer_number] = []
-        conversation_history[customer_number].append({"role": "user", "content": customer_message})
-        conversation_history[customer_number].append({"role": "assistant", "content": reply})
-        send_whatsapp_message(customer_number, reply)
-        return jsonify({"status": "ok"}), 200 
-    except Exception: return jsonify({"status": "error"}), 200
+            for sender, texts in bursts.items():
+                coalescer.add(sender, texts)
+                stats["queued"] += len(texts)
+            return jsonify({"status": "queued", **stats}), 200
+
+    db.session.expire_all()
+    customers = load_customers(list(bursts))  # One IN query for the whole payload
+    for sender, texts in bursts.items():
+        # One bad sender must not cost the rest of the batch
+        try:
+            reply_to_burst(sender, texts, customers.get(sender))
+            stats["processed"] += len(texts)
+        except Exception:
+            db.session.rollback()
+            stats["errors"] += len(texts)
+    return jsonify({"status": "ok", **stats}), 200
+
+@app.route('/webhook/stats')
+def webhook_stats():
+    # Rate-limit hits and coalescing since this worker started
+    return jsonify({"rate_limit": limiter.snapshot(),
+                    "coalescing": dict(coalescer.stats) if coalescer else None})
 
 if __name__ == '__main__':
     with app.app_context():
         event.listen(db.engine, "connect", set_sqlite_pragma)
-        db.create_all() 
+        ensure_schema()
+        replay_pending_inbound()
+    if outbox:
+        outbox.start()  # Whatever was still queued when the app last stopped
     app.run(port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import re
+import time
+from collections import namedtuple
+from sqlalchemy import event
+from models import db, Product
+
+# ==============================================================================
+# IN-MEMORY CATALOG INDEX (Item name -> Product id / price)
+# ==============================================================================
+# Order lines from the LLM name products with small variations ("Mao Bai
+# (200g)", "cos lettuces", "maobai"). resolve() accepts only those: an exact
+# match after normalising case, brackets, plurals and spaces, so an item that
+# isn't on the menu is reported instead of becoming a similar product ("baby
+# bok choy" is not "Bok Choy"). Only names/ids are cached - live price and
+# stock are read once per order in whatsapp/orders.py.
+# find_in_text()/match_prefix() are the loose lookups for free text; the
+# conversation compactor uses them for prompt context, never for orders.
+CATALOG_TTL_SECONDS = 30
+
+CatalogEntry = namedtuple('CatalogEntry', ['id', 'name'])
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_BRACKETS_RE = re.compile(r"\(.*?\)")
+
+def normalize_name(name):
+    name = _BRACKETS_RE.sub(" ", name.lower())
+    return _NON_ALNUM_RE.sub(" ", name).strip()
+
+def _singulars(key):
+    # "cos lettuces" -> "cos lettuce", "radishes" -> "radish"
+    forms = []
+    if key.endswith("es"):
+        forms.append(key[:-2])
+    if key.endswith("s"):
+        forms.append(key[:-1])
+    return forms
+
+class CatalogIndex:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_id = {e.id: e for e in self.entries}
+        self.by_key = {}
+        for e in self.entries:
+            key = normalize_name(e.name)
+            self.by_key.setdefault(key, e)
+            self.by_key.setdefault(key.replace(" ", ""), e)
+        # Longest names first so "red pak choy" wins over "pak choy"
+        self._by_length = sorted(((normalize_name(e.name), e) for e in self.entries),
+                                 key=lambda pair: len(pair[0]), reverse=True)
+
+    def _exact(self, key):
+        for candidate in (key, *_singulars(key)):
+            for form in (candidate, candidate.replace(" ", "")):
+                if form in self.by_key:
+                    return self.by_key[form]
+        return None
+
+    def resolve(self, item_name):
+        # Exact after normalising, or None
+        key = normalize_name(item_name)
+        return self._exact(key) if key else None
+
+    def match_prefix(self, text):
+        # "mao bai please" -> Mao Bai: the text starts with a whole product name
+        key = normalize_name(text)
+        for norm, e in self._by_length:
+            if f"{key} ".startswith((norm + " ", norm + "s ")):
+                return e
+        return self.resolve(text)
+
+    def find_in_text(self, text):
+        # Any whole product name mentioned in a message (longest first)
+        key = f" {normalize_name(text)} "
+        for norm, e in self._by_length:
+            if f" {norm} " in key or f" {norm}s " in key:
+                return e
+        return None
+
+    @classmethod
+    def load(cls):
+        rows = db.session.query(Product.id, Product.name).all()
+        return cls(CatalogEntry(*row) for row in rows)
+
+_catalog = None
+_loaded_at = 0.0
+
+def get_catalog():
+    global _catalog, _loaded_at
+    # TTL covers edits made by other processes (e.g. the admin web app)
+    if _catalog is None or time.monotonic() - _loaded_at > CATALOG_TTL_SECONDS:
+        _catalog = CatalogIndex.load()
+        _loaded_at = time.monotonic()
+    return _catalog
+
+def invalidate_catalog(*_args):
+    global _catalog
+    _catalog = None
+
+# Product edits made through the ORM in this process drop the index immediately
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Product, _event_name, invalidate_catalog)
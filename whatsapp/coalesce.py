@@ -0,0 +1,136 @@
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from models import db
+
+# ==============================================================================
+# MESSAGE COALESCING (One AI turn per burst of messages from a phone)
+# ==============================================================================
+# "hi" / "can i order" / "2 mao bai" sent seconds apart become one turn: one
+# inventory refresh, one LLM call and one reply. A phone's burst is flushed
+# once it has been quiet for COALESCE_WINDOW_MS, and never later than
+# COALESCE_MAX_LATENCY_MS after its first message, however chatty the customer
+# is. Turns for the same phone always run one at a time, in order: a phone
+# has at most one turn in the worker pool, and bursts that come due meanwhile
+# wait in that phone's FIFO until it finishes, so one chatty phone with a
+# slow LLM call holds one worker, not all of them. The scheduler thread and
+# the pool start with the first message, not when whatsapp.app is imported.
+# COALESCE_WINDOW_MS=0 turns this off (every webhook is answered inline).
+COALESCE_WINDOW_MS = float(os.getenv('COALESCE_WINDOW_MS', 1500))
+COALESCE_MAX_LATENCY_MS = float(os.getenv('COALESCE_MAX_LATENCY_MS', 4000))
+COALESCE_WORKERS = int(os.getenv('COALESCE_WORKERS', 4))
+
+class Burst:
+    def __init__(self, now):
+        self.messages = []
+        self.first_at = now
+        self.due_at = now
+
+class MessageCoalescer:
+    def __init__(self, app, handler, window_ms=COALESCE_WINDOW_MS,
+                 max_latency_ms=COALESCE_MAX_LATENCY_MS, workers=COALESCE_WORKERS):
+        self.app = app
+        self.handler = handler  # handler(phone, messages), run inside an app context
+        self.window = window_ms / 1000
+        self.max_latency = max(max_latency_ms, window_ms) / 1000
+        self.stats = {'messages': 0, 'turns': 0, 'max_wait_ms': 0.0}
+
+        self.workers = workers
+
+        self._bursts = {}
+        self._waiting = {}  # phone -> deque of due bursts; present while a turn is in the pool
+        self._cond = threading.Condition()
+        self._running = True
+        self._pool = None
+        self._thread = None
+
+    def _ensure_started(self):
+        # Called with self._cond held
+        if self._thread is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='coalesce')
+            self._thread = threading.Thread(target=self._run, name='message-coalescer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def add(self, phone, messages):
+        now = time.monotonic()
+        with self._cond:
+            self._ensure_started()
+            burst = self._bursts.get(phone)
+            if burst is None:
+                burst = self._bursts[phone] = Burst(now)
+            burst.messages.extend(messages)
+            # Quiet period after the latest message, capped by the max-latency deadline
+            burst.due_at = min(now + self.window, burst.first_at + self.max_latency)
+            self.stats['messages'] += len(messages)
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            buffered = sum(len(b.messages) for b in self._bursts.values())
+            return buffered + sum(len(b.messages) for queued in self._waiting.values() for b in queued)
+
+    # --------------------------------------------------------------------------
+    # Scheduler thread: hands due bursts to the worker pool
+    # --------------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running and not self._bursts:
+                    return
+                now = time.monotonic()
+                ready = [(phone, burst) for phone, burst in self._bursts.items() if burst.due_at <= now]
+                if not ready:
+                    next_due = min((b.due_at for b in self._bursts.values()), default=None)
+                    self._cond.wait(None if next_due is None else next_due - now)
+                    continue
+                start = []
+                for phone, burst in ready:
+                    del self._bursts[phone]
+                    if phone in self._waiting:
+                        self._waiting[phone].append(burst)  # Runs after the phone's current turn
+                    else:
+                        self._waiting[phone] = deque()
+                        start.append((phone, burst))
+            for phone, burst in start:
+                self._pool.submit(self._flush, phone, burst)
+
+    def _flush(self, phone, burst):
+        with self.app.app_context():
+            waited_ms = (time.monotonic() - burst.first_at) * 1000
+            try:
+                self.handler(phone, burst.messages)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Coalesced turn for {phone} failed: {e}")
+        with self._cond:
+            self.stats['turns'] += 1
+            self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], round(waited_ms, 1))
+            queued = self._waiting[phone]
+            if not queued:
+                del self._waiting[phone]  # Idle: nothing kept per phone
+                self._cond.notify_all()
+                return
+            next_burst = queued.popleft()
+        # Back of the pool queue, so other phones' turns get a worker first
+        self._pool.submit(self._flush, phone, next_burst)
+
+    def stop(self):
+        # Flush whatever is still buffered before the process exits
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            if self._thread is None:
+                return
+            for burst in self._bursts.values():
+                burst.due_at = 0
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            while self._waiting:  # Queued turns resubmit themselves: let them drain first
+                self._cond.wait()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,148 @@
+import re
+import json
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, ConversationSummary, get_sg_time
+from whatsapp.catalog import get_catalog
+
+# ==============================================================================
+# CONVERSATION COMPACTOR (Fixed-size prompt per turn)
+# ==============================================================================
+# The sales prompt used to replay the raw last 6 messages, so long order
+# summaries made it grow and anything older (quantities discussed earlier) was
+# lost. Now each turn sends:
+#     system prompt + a compact summary + the last KEEP_MESSAGES messages
+# The summary is structured (cart, product being asked about, last confirmed
+# order, other products mentioned), updated incrementally every turn and kept
+# per phone in conversation_summary, so it survives restarts and other workers.
+KEEP_MESSAGES = 4          # Last 2 exchanges (the newest reply in full)
+MAX_MESSAGE_CHARS = 400    # The customer's previous message, clipped beyond this
+MAX_OLDER_CHARS = 160      # Earlier kept messages: their facts are in the summary already
+MAX_CART_LINES = 8
+MAX_TOPICS = 5
+
+# "2 mao bai", "3 packs of kai lan", "x2 cos lettuce"
+QTY_ITEM_RE = re.compile(r"x?(\d{1,3})\s*(?:x|units?|packs?|pcs|bunch(?:es)?)?\s*(?:of\s+)?([a-z][a-z ]{2,40})")
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+def empty_summary():
+    return {'cart': {}, 'asked_about': None, 'topics': [], 'last_order': None}
+
+# ==============================================================================
+# 1. STORAGE (One row per phone)
+# ==============================================================================
+def load_summary(phone):
+    row = db.session.get(ConversationSummary, str(phone))
+    summary = empty_summary()
+    if row:
+        summary.update(json.loads(row.summary or '{}'))
+        summary['folded_turns'] = row.folded_turns or 0
+    return summary
+
+def save_summary(phone, summary):
+    values = {
+        'summary': json.dumps({k: v for k, v in summary.items() if k != 'folded_turns'}, separators=(',', ':')),
+        'folded_turns': summary.get('folded_turns', 0),
+        'updated_at': sg_now(),
+    }
+    stmt = sqlite_insert(ConversationSummary).values(phone=str(phone), **values)
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['phone'], set_=values))
+    db.session.commit()
+
+# ==============================================================================
+# 2. INCREMENTAL UPDATES (Called as the turn happens)
+# ==============================================================================
+def _add_topic(summary, name):
+    topics = [t for t in summary['topics'] if t != name]
+    summary['topics'] = ([name] + topics)[:MAX_TOPICS]
+
+def note_user_message(summary, text, catalog=None):
+    # Quantities typed by the customer go into the cart. It is a guess from
+    # free text, so it only ever reaches the prompt, never an order
+    catalog = catalog or get_catalog()
+    for qty, item in QTY_ITEM_RE.findall((text or '').lower()):
+        entry = catalog.match_prefix(item)
+        if entry and int(qty) > 0:
+            note_cart(summary, [(entry.name, int(qty))], replace=False)
+
+def note_asked_about(summary, product_name):
+    summary['asked_about'] = product_name
+    _add_topic(summary, product_name)
+
+def note_cart(summary, lines, replace=True, catalog=None):
+    # lines: [(item_name, qty)] - from [[DATA]] tags, an order summary or the customer
+    catalog = catalog or get_catalog()
+    cart = {} if replace else dict(summary['cart'])
+    for item_name, qty in lines:
+        entry = catalog.resolve(item_name)
+        name = entry.name if entry else item_name
+        cart[name] = int(qty)
+        _add_topic(summary, name)
+    summary['cart'] = dict(list(cart.items())[-MAX_CART_LINES:])
+
+def note_order(summary, lines, turn_id):
+    summary['last_order'] = {
+        'items': [[name, qty] for name, qty in lines][:MAX_CART_LINES],
+        'turn': turn_id,
+        'at': sg_now().strftime('%Y-%m-%d %H:%M'),
+    }
+    summary['cart'] = {}
+    summary['asked_about'] = None
+
+# ==============================================================================
+# 3. FOLD + PROMPT
+# ==============================================================================
+def fold_history(history, summary, catalog=None):
+    # Trim the in-memory history to the prompt window. Cart/order facts were
+    # already recorded when they happened; the dropped replies only add topics.
+    catalog = catalog or get_catalog()
+    dropped = len(history) - KEEP_MESSAGES
+    if dropped <= 0:
+        return history
+    for message in history[:dropped]:
+        if message.get('role') == 'assistant':
+            entry = catalog.find_in_text(message.get('content', '')[:200])
+            if entry:
+                _add_topic(summary, entry.name)
+    summary['folded_turns'] = summary.get('folded_turns', 0) + dropped // 2
+    del history[:dropped]
+    return history
+
+def render_summary(summary):
+    parts = []
+    if summary['cart']:
+        parts.append("Cart: " +
+                     ", ".join(f"{qty} x {name}" for name, qty in summary['cart'].items()))
+    if summary['asked_about']:
+        parts.append(f"Last asked about: {summary['asked_about']}")
+    order = summary.get('last_order')
+    if order:
+        items = ", ".join(f"{qty} x {name}" for name, qty in order['items'])
+        parts.append(f"Already ordered {order['at']}: {items} (do not re-add)")
+    others = [t for t in summary['topics'] if t not in summary['cart'] and t != summary['asked_about']]
+    if others:
+        parts.append("Also mentioned: " + ", ".join(others))
+    if not parts:
+        return ""
+    return "EARLIER IN THIS CHAT:\n- " + "\n- ".join(parts)
+
+def clip(text, limit=MAX_MESSAGE_CHARS):
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+def compact_prompt(system_prompt, summary, history, user_message):
+    # The current message (maybe a coalesced burst) and the newest reply (maybe
+    # the order summary this message confirms) always go in whole; only the
+    # older messages in the window are clipped
+    summary_text = render_summary(summary)
+    system = f"{system_prompt}\n{summary_text}" if summary_text else system_prompt
+    window = history[-KEEP_MESSAGES:]
+    last = len(window) - 1
+    recent = []
+    for i, m in enumerate(window):
+        if i == last and m['role'] == 'assistant':
+            content = m['content']
+        else:
+            content = clip(m['content'], MAX_MESSAGE_CHARS if i >= last - 1 else MAX_OLDER_CHARS)
+        recent.append({'role': m['role'], 'content': content})
+    return [{"role": "system", "content": system}, *recent, {"role": "user", "content": user_message}]
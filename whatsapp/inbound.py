@@ -0,0 +1,52 @@
+import os
+from datetime import timedelta
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, PendingInbound, get_sg_time
+from whatsapp.webhook import InboundMessage, seen_messages
+
+# ==============================================================================
+# PENDING INBOUND (Coalesced messages survive a restart)
+# ==============================================================================
+# With coalescing on, Meta gets its 200 before the burst has been answered,
+# and it never redelivers a message it got a 200 for. So:
+#  - store:   the burst is written to pending_inbound (one row per message id)
+#             and committed before the webhook answers
+#  - discard: the rows are deleted in the same transaction as the turn's reply
+#  - replay:  at startup, whatever a crash/restart/deploy left behind goes back
+#             to the coalescer. Rows older than PENDING_MAX_AGE_MINUTES are
+#             dropped instead: the customer has moved on, or the turn keeps failing.
+PENDING_MAX_AGE_MINUTES = int(os.getenv('PENDING_INBOUND_MAX_AGE_MINUTES', 60))
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+def store_pending(bursts):
+    # bursts: {phone: [InboundMessage]}. Commits: the rows must exist before the 200.
+    now = sg_now()
+    rows = [dict(msg_id=m.id, phone=phone, body=m.text, timestamp=m.timestamp,
+                 profile_name=m.profile_name, received_at=now)
+            for phone, messages in bursts.items() for m in messages]
+    if rows:
+        db.session.execute(sqlite_insert(PendingInbound).on_conflict_do_nothing(index_elements=['msg_id']), rows)
+        db.session.commit()
+    return len(rows)
+
+def discard_pending(messages):
+    # Not committed here: part of the turn's own transaction
+    db.session.execute(delete(PendingInbound).where(PendingInbound.msg_id.in_([m.id for m in messages])))
+
+def load_pending():
+    # -> ({phone: [InboundMessage oldest first]}, stale rows dropped)
+    cutoff = sg_now() - timedelta(minutes=PENDING_MAX_AGE_MINUTES)
+    stale = db.session.execute(delete(PendingInbound).where(PendingInbound.received_at < cutoff)).rowcount
+    rows = PendingInbound.query.order_by(PendingInbound.phone, PendingInbound.timestamp, PendingInbound.id).all()
+    db.session.commit()
+
+    bursts = {}
+    for row in rows:
+        seen_messages.claim(row.msg_id)  # A late redelivery from Meta is still a duplicate
+        bursts.setdefault(row.phone, []).append(InboundMessage(
+            id=row.msg_id, sender=row.phone, type='text', text=row.body,
+            timestamp=row.timestamp, profile_name=row.profile_name))
+    return bursts, stale
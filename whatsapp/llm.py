@@ -0,0 +1,24 @@
+import os
+import threading
+
+# ==============================================================================
+# OPENAI CLIENT (Created on first use)
+# ==============================================================================
+# Importing the openai package costs more than the rest of the webhook app put
+# together, so it is loaded by the first turn that needs the model rather than
+# by every process that imports whatsapp.app (scripts, benches, workers).
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    # None when OPENAI_API_KEY is not set (the bot answers "AI Offline.")
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=api_key)
+    return _client
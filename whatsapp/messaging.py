@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import namedtuple
+
+# ==============================================================================
+# OUTGOING WHATSAPP MESSAGES (Graph API)
+# ==============================================================================
+# Kept separate from whatsapp/app.py so the admin panel and background jobs can
+# send messages without importing the whole webhook app. Request paths don't
+# call this directly any more: they queue into the outbox (whatsapp/outbox.py)
+# and the dispatcher delivers from there.
+GRAPH_API_URL = "https://graph.facebook.com/v24.0/{phone_id}/messages"
+SEND_TIMEOUT = 10
+
+# ok / retryable / error text for the outbox dispatcher
+DeliveryResult = namedtuple('DeliveryResult', ['ok', 'retryable', 'error'])
+
+# Keep-alive connections to the Graph API, shared by the dispatcher threads.
+# requests is imported with the session, on the first send.
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+    return _session
+
+def credentials_configured():
+    return bool(os.getenv("WHATSAPP_ACCESS_TOKEN") and os.getenv("PHONE_NUMBER_ID"))
+
+def deliver_message(to_phone, message_text):
+    access_token = os.getenv("WHATSAPP_ACCESS_TOKEN")
+    phone_id = os.getenv("PHONE_NUMBER_ID")
+    if not access_token or not phone_id:
+        return DeliveryResult(False, True, "WhatsApp credentials missing")
+
+    url = GRAPH_API_URL.format(phone_id=phone_id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": str(to_phone),
+        "type": "text",
+        "text": {"body": message_text}
+    }
+    session = _get_session()
+    try:
+        response = session.post(url, headers=headers, json=payload, timeout=SEND_TIMEOUT)
+    except Exception as e:  # requests.RequestException and friends: all worth a retry
+        return DeliveryResult(False, True, f"{type(e).__name__}: {e}"[:300])
+    if response.status_code == 200:
+        return DeliveryResult(True, False, None)
+    # Rate limited / Meta having a bad minute: try again later. Anything else
+    # (bad number, message rejected) will fail the same way every time.
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return DeliveryResult(False, retryable, f"HTTP {response.status_code}: {response.text[:250]}")
+
+def send_whatsapp_message(to_phone, message_text):
+    # Immediate send, for scripts; the apps go through the outbox
+    result = deliver_message(to_phone, message_text)
+    if not result.ok:
+        print(f"❌ Error sending WhatsApp: {result.error}")
+    return result.ok
@@ -0,0 +1,163 @@
+import re
+from sqlalchemy import update, case
+from sqlalchemy.exc import IntegrityError
+from models import db, Product, WhatsAppOrder
+from whatsapp.catalog import get_catalog
+from products.velocity import record_sales
+from leader.commission import accrue_commission
+from orders.lifecycle import record_new_orders, CONFIRMED
+from whatsapp.outbox import enqueue_message
+
+# Precompiled once at import (see test/bench_order_parsing.py)
+DATA_TAG_RE = re.compile(r"\[\[DATA:\s*(.*?)\s*\]\]")
+DATA_STRIP_RE = re.compile(r"\[\[DATA:.*?\]\]")
+STATUS_STRIP_RE = re.compile(r"\[\[STATUS:.*?\]\]")
+QTY_RE = re.compile(r"\d+")
+
+class OrderValidationError(Exception):
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+# ==============================================================================
+# 1. PARSE [[DATA: Item | Qty | TotalPrice]] TAGS
+# ==============================================================================
+# The model's TotalPrice is ignored on purpose: prices are recomputed from
+# Product.price when the order is resolved against the catalog.
+def parse_data_tags(text):
+    lines = []
+    for match in DATA_TAG_RE.findall(text or ""):
+        parts = [p.strip() for p in match.split("|")]
+        if len(parts) < 2: continue
+        qty_match = QTY_RE.search(parts[1])
+        if parts[0] and qty_match:
+            lines.append((parts[0], int(qty_match.group())))
+    return lines
+
+def strip_tags(text):
+    return STATUS_STRIP_RE.sub("", DATA_STRIP_RE.sub("", text)).strip()
+
+# ==============================================================================
+# 2. RESOLVE + VALIDATE ALL LINES IN ONE PASS
+# ==============================================================================
+# Names map to product ids through the cached catalog index; live price and
+# stock for every line then come from a single IN query (not one per line).
+# lines: [(item_name, qty), ...] -> [(product_row, qty, line_total), ...]
+# Raises OrderValidationError listing every problem, before anything is written.
+def resolve_order_lines(lines, catalog=None):
+    catalog = catalog or get_catalog()
+    merged, problems = {}, []
+
+    for item_name, qty in lines:
+        entry = catalog.resolve(item_name)
+        if entry is None:
+            problems.append(f"{item_name} isn't on the menu")
+        elif qty <= 0:
+            problems.append(f"quantity for {entry.name} must be at least 1")
+        else:
+            merged[entry.id] = merged.get(entry.id, 0) + qty
+
+    live = {}
+    if merged:
+        live = {row.id: row for row in db.session.query(
+            Product.id, Product.name, Product.price, Product.available_qty, Product.status
+        ).filter(Product.id.in_(list(merged))).all()}
+
+    resolved = []
+    for product_id, qty in merged.items():
+        row = live.get(product_id)
+        if row is None:
+            problems.append(f"{catalog.by_id[product_id].name} is no longer on the menu")
+        elif row.status != "In Stock":
+            # Paused by the admin (or sold out): the unit count isn't orderable
+            problems.append(f"{row.name} is currently unavailable")
+        elif row.available_qty < qty:
+            problems.append(f"only {max(row.available_qty, 0)} units of {row.name} left")
+        else:
+            resolved.append((row, qty, round(row.price * qty, 2)))
+
+    if problems:
+        raise OrderValidationError(problems)
+    if not resolved:
+        raise OrderValidationError(["no items found in the order"])
+    return resolved
+
+# ==============================================================================
+# 3. ORDER COMMIT (Shared by the LLM path and the deterministic state path)
+# ==============================================================================
+# turn_key identifies the summary being confirmed (see get_openai_response).
+# Each order row gets "<turn_key>:<line no>" under a unique index, so confirming
+# the same summary twice - a retried webhook, or the customer saying "yes"
+# again - is a no-op. Stock for every line is deducted with a guarded UPDATE in
+# the same transaction as the order rows, so a line that lost a race rolls back
+# the whole order.
+def order_line_key(turn_key, line_no):
+    return f"{turn_key}:{line_no}"
+
+def is_order_committed(turn_key):
+    # Single lookup on the unique index - no history scan
+    return db.session.query(WhatsAppOrder.id).filter_by(
+        idempotency_key=order_line_key(turn_key, 1)).first() is not None
+
+def already_secured_reply(customer_obj):
+    return f"Your order is already secured, {customer_obj.name}! ✅ We'll see you at delivery. 🌿"
+
+def finalize_order(customer_obj, customer_number, lines, turn_key, reply_key=None):
+    if is_order_committed(turn_key):
+        return already_secured_reply(customer_obj)
+
+    resolved = resolve_order_lines(lines)
+    order_summary_text, grand_total = "", 0.0
+
+    try:
+        # Order rows first: a concurrent duplicate fails here, before any stock moves
+        orders = [WhatsAppOrder(
+            customer_id=customer_obj.id, leader_id=customer_obj.leader_id,
+            customer_phone=str(customer_number), product_name=product.name,
+            quantity=qty, total_price=item_total, order_status=CONFIRMED,
+            idempotency_key=order_line_key(turn_key, line_no)
+        ) for line_no, (product, qty, item_total) in enumerate(resolved, start=1)]
+        db.session.add_all(orders)
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return already_secured_reply(customer_obj)
+
+    for product, qty, item_total in resolved:
+        result = db.session.execute(
+            update(Product)
+            .where(Product.id == product.id, Product.available_qty >= qty)
+            .values(
+                available_qty=Product.available_qty - qty,
+                status=case((Product.available_qty - qty <= 0, "Out of Stock"), else_="In Stock")
+            )
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise OrderValidationError([f"{product.name} just sold out"])
+
+        order_summary_text += f"• {product.name}: {qty} units = ${item_total:.2f}\n"
+        grand_total += item_total
+
+    leader_name = customer_obj.leader.name if customer_obj.leader else "Test Leader"
+    leader_phone = str(customer_obj.leader.phone).split(".")[0] if customer_obj.leader else "6500000000"
+    confirmation = (f"✨ *ORDER SECURED* 🌿\n\nThank you, {customer_obj.name}! 🌟 Your order is confirmed!\n\n"
+                    f"{order_summary_text}*Total Price:* ${grand_total:.2f}\n\n"
+                    f"Delivery via {leader_name} (+{leader_phone}). 😊🌱")
+
+    # Same transaction: velocity for low-stock prediction, the leader's
+    # commission, the order lifecycle history/counts and the confirmation
+    # message itself (queued under the turn's reply key, so the webhook's own
+    # enqueue of this reply is a no-op)
+    record_sales({product.id: qty for product, qty, _ in resolved})
+    accrue_commission(orders)
+    record_new_orders(orders)
+    if reply_key:
+        enqueue_message(customer_number, confirmation, kind='order', dedup_key=reply_key)
+    db.session.commit()
+    return confirmation
+
+def describe_order_problems(customer_obj, error):
+    problems = "\n".join(f"• {p}" for p in error.problems)
+    return (f"Sorry, {customer_obj.name}! 😕 I couldn't confirm that order yet:\n\n{problems}\n\n"
+            "Would you like to adjust it? 🌿")
@@ -0,0 +1,289 @@
+import os
+import random
+import atexit
+import threading
+from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import update, select, or_, and_, event
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, OutboundMessage, get_sg_time
+from whatsapp.messaging import deliver_message, credentials_configured, DeliveryResult
+
+# ==============================================================================
+# TRANSACTIONAL OUTBOX (At-least-once delivery for every outbound message)
+# ==============================================================================
+# Request paths never call the Graph API. They add an outbound_message row in
+# the same transaction as the change it announces (order rows, alert flags,
+# the conversation summary), so a message exists if and only if the change
+# committed. A dispatcher drains the table in batches:
+#  - claim:   one UPDATE ... RETURNING moves due rows to Sending under a lease,
+#             so several workers/processes never send the same row
+#  - send:    up to OUTBOX_CONCURRENCY phones at once, each phone's messages
+#             strictly in order
+#  - settle:  Sent / back to Pending with exponential backoff / Dead after
+#             OUTBOX_MAX_ATTEMPTS (or straight away for a permanent error)
+# A crash mid-send leaves the row in Sending until its lease runs out, then it
+# is sent again - a rare duplicate rather than a lost confirmation.
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', 4))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 5))
+MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 6))
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 600
+LEASE_SECONDS = 60
+
+PENDING, SENDING, SENT, DEAD = 'Pending', 'Sending', 'Sent', 'Dead'
+
+def sg_now():
+    return get_sg_time().replace(tzinfo=None)
+
+def retry_delay(attempts):
+    # 5s, 10s, 20s ... capped at 10 minutes, with jitter so retries spread out
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+# ==============================================================================
+# 1. ENQUEUE (Inside the caller's transaction)
+# ==============================================================================
+def reply_key(turn_id):
+    # One reply per inbound turn: a redelivered webhook can't queue it twice
+    return f"reply:{turn_id}"
+
+def enqueue_message(to_phone, body, kind='reply', dedup_key=None):
+    # Not committed here. Returns False if dedup_key is already queued.
+    now = sg_now()
+    stmt = sqlite_insert(OutboundMessage).values(
+        to_phone=str(to_phone), body=body, kind=kind, dedup_key=dedup_key,
+        status=PENDING, attempts=0, next_attempt_at=now, created_at=now
+    ).on_conflict_do_nothing(index_elements=['dedup_key'])
+    queued = db.session.execute(stmt).rowcount == 1
+    if queued:
+        db.session.info['outbox_queued'] = True
+    return queued
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    # Committed messages go out now instead of at the next poll
+    if session.info.pop('outbox_queued', False):
+        for dispatcher in list(_dispatchers):
+            dispatcher.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('outbox_queued', None)
+
+# ==============================================================================
+# 2. DRAIN (Claim -> send concurrently -> settle)
+# ==============================================================================
+def _due(now, model=OutboundMessage):
+    return or_(
+        and_(model.status == PENDING, model.next_attempt_at <= now),
+        and_(model.status == SENDING, model.locked_until < now),  # Lease expired
+    )
+
+def claim_batch(limit=OUTBOX_BATCH_SIZE):
+    now = sg_now()
+    # A message waits while an earlier one to the same phone is still backing off
+    earlier = aliased(OutboundMessage)
+    blocked = select(earlier.id).where(
+        earlier.to_phone == OutboundMessage.to_phone, earlier.id < OutboundMessage.id,
+        earlier.status.in_((PENDING, SENDING)), ~_due(now, earlier)
+    ).exists()
+    due_ids = select(OutboundMessage.id).where(_due(now), ~blocked).order_by(OutboundMessage.id).limit(limit)
+    rows = db.session.execute(
+        update(OutboundMessage)
+        .where(OutboundMessage.id.in_(due_ids), _due(now))
+        .values(status=SENDING, locked_until=now + timedelta(seconds=LEASE_SECONDS))
+        .returning(OutboundMessage.id, OutboundMessage.to_phone, OutboundMessage.body, OutboundMessage.attempts)
+    ).all()
+    db.session.commit()
+    return sorted(rows, key=lambda r: r.id)
+
+def _send_phone(rows, sender):
+    # One phone's messages in order; stop at the first failure so a later
+    # message never overtakes an earlier one
+    results = []
+    for i, row in enumerate(rows):
+        result = sender(row.to_phone, row.body)
+        results.append((row, result))
+        if not result.ok:
+            results.extend((later, None) for later in rows[i + 1:])
+            break
+    return results
+
+def _settle(results):
+    now = sg_now()
+    sent_ids, held = [], []
+    stats = {'sent': 0, 'retried': 0, 'dead': 0, 'held': 0}
+    for row, result in results:
+        if result is None:
+            held.append(row.id)
+        elif result.ok:
+            sent_ids.append(row.id)
+        else:
+            attempts = row.attempts + 1
+            dead = not result.retryable or attempts >= MAX_ATTEMPTS
+            db.session.execute(
+                update(OutboundMessage).where(OutboundMessage.id == row.id)
+                .values(status=DEAD if dead else PENDING, attempts=attempts, locked_until=None,
+                        last_error=(result.error or '')[:300],
+                        next_attempt_at=None if dead else now + timedelta(seconds=retry_delay(attempts)))
+            )
+            stats['dead' if dead else 'retried'] += 1
+            if dead:
+                print(f"☠️ Outbox message {row.id} to {row.to_phone} dead-lettered: {result.error}")
+    if sent_ids:
+        db.session.execute(
+            update(OutboundMessage).where(OutboundMessage.id.in_(sent_ids))
+            .values(status=SENT, sent_at=now, locked_until=None, last_error=None)
+        )
+    if held:
+        # Behind a failed message for the same phone: back in the queue untouched
+        db.session.execute(
+            update(OutboundMessage).where(OutboundMessage.id.in_(held))
+            .values(status=PENDING, locked_until=None, next_attempt_at=now + timedelta(seconds=RETRY_BASE_SECONDS))
+        )
+    db.session.commit()
+    stats['sent'], stats['held'] = len(sent_ids), len(held)
+    return stats
+
+_missing_credentials_logged = False
+
+def drain_outbox(limit=OUTBOX_BATCH_SIZE, pool=None, sender=None):
+    # One batch. Needs an app context. Returns counts for this batch.
+    global _missing_credentials_logged
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'held': 0}
+    if sender is None:
+        if not credentials_configured():
+            # Leave everything Pending: it goes out once the app is configured
+            if not _missing_credentials_logged:
+                print("⚠️ ALERT: WhatsApp credentials missing. Outbox messages kept until configured.")
+                _missing_credentials_logged = True
+            return stats
+        sender = deliver_message
+
+    rows = claim_batch(limit)
+    if not rows:
+        return stats
+    by_phone = OrderedDict()
+    for row in rows:
+        by_phone.setdefault(row.to_phone, []).append(row)
+
+    own_pool = pool is None
+    pool = pool or ThreadPoolExecutor(max_workers=OUTBOX_CONCURRENCY, thread_name_prefix='outbox-send')
+    try:
+        futures = [pool.submit(_send_phone, phone_rows, sender) for phone_rows in by_phone.values()]
+        results = []
+        for phone_rows, future in zip(by_phone.values(), futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # The sender itself blew up: count it as a retryable failure
+                failure = DeliveryResult(False, True, f"{type(e).__name__}: {e}")
+                results.extend([(phone_rows[0], failure)] + [(r, None) for r in phone_rows[1:]])
+    finally:
+        if own_pool:
+            pool.shutdown(wait=True)
+
+    stats.update(_settle(results))
+    stats['claimed'] = len(rows)
+    return stats
+
+def drain_all(max_batches=20, sender=None):
+    # Scheduler sweep / scripts: keep draining while batches come back full
+    totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'held': 0}
+    for _ in range(max_batches):
+        stats = drain_outbox(sender=sender)
+        for key in totals:
+            totals[key] += stats[key]
+        if stats['claimed'] < OUTBOX_BATCH_SIZE:
+            break
+    return totals
+
+# ==============================================================================
+# 3. BACKGROUND DISPATCHER (Woken by commits, polls for retries)
+# ==============================================================================
+_dispatchers = []
+
+class OutboxDispatcher:
+    def __init__(self, app, sender=None):
+        self.app = app
+        self.sender = sender
+        self.stats = {'batches': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        self._pool = ThreadPoolExecutor(max_workers=OUTBOX_CONCURRENCY, thread_name_prefix='outbox-send')
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        # Started on the first commit that queues a message (or explicitly by
+        # the WhatsApp app), so CLI scripts don't spawn a thread for nothing
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.clear()
+            full_batch = False
+            try:
+                with self.app.app_context():
+                    stats = drain_outbox(pool=self._pool, sender=self.sender)
+                if stats['claimed']:
+                    self.stats['batches'] += 1
+                    for key in ('sent', 'retried', 'dead'):
+                        self.stats[key] += stats[key]
+                full_batch = stats['claimed'] >= OUTBOX_BATCH_SIZE
+            except Exception as e:
+                print(f"❌ Outbox dispatch failed: {e}")
+            if not full_batch:
+                self._wake.wait(OUTBOX_POLL_SECONDS)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LEASE_SECONDS)
+        self._pool.shutdown(wait=True)
+
+def init_outbox(app):
+    # OUTBOX_DISPATCHER=0: queue only, leave sending to the scheduler sweep
+    if os.getenv('OUTBOX_DISPATCHER', '1') == '0':
+        return None
+    dispatcher = OutboxDispatcher(app)
+    _dispatchers.append(dispatcher)
+    app.extensions['outbox'] = dispatcher
+    return dispatcher
+
+# ==============================================================================
+# 4. ADMIN (Counts, dead letters, requeue)
+# ==============================================================================
+def outbox_counts():
+    counts = dict.fromkeys((PENDING, SENDING, SENT, DEAD), 0)
+    counts.update(db.session.query(OutboundMessage.status, db.func.count(OutboundMessage.id))
+                  .group_by(OutboundMessage.status).all())
+    return counts
+
+def dead_letters(limit=50):
+    return OutboundMessage.query.filter_by(status=DEAD)\
+        .order_by(OutboundMessage.id.desc()).limit(limit).all()
+
+def requeue(message_id):
+    # Dead -> Pending with a fresh set of attempts
+    result = db.session.execute(
+        update(OutboundMessage).where(OutboundMessage.id == message_id, OutboundMessage.status == DEAD)
+        .values(status=PENDING, attempts=0, next_attempt_at=sg_now(), last_error=None)
+    )
+    if result.rowcount == 1:
+        db.session.info['outbox_queued'] = True
+    db.session.commit()
+    return result.rowcount == 1
@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from sqlalchemy import update, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, RateLimitBucket
+
+# ==============================================================================
+# WEBHOOK RATE LIMITING (Per-phone + global token buckets, load shedding)
+# ==============================================================================
+# Two limits guard the expensive part of the webhook:
+#  - per phone: every inbound message takes a token (RATE_LIMIT_PHONE_PER_MIN,
+#    bursts of RATE_LIMIT_PHONE_BURST), so one spammer or looping bot can't
+#    burn the LLM budget or hog the workers
+#  - global:    every AI turn takes a token (RATE_LIMIT_GLOBAL_PER_MIN), so a
+#    rush across the whole estate degrades instead of queueing without end
+# Over a limit the webhook degrades in steps: the first hit gets a canned
+# reply (no LLM), further hits within RATE_LIMIT_NOTICE_SECONDS are dropped
+# silently.
+#
+# A bucket is stored as one float: the time it would be full again. Tokens
+# left = burst - (full_at - now) / interval, so a take is one max() and one
+# add, and a bucket that has refilled is the same as no bucket - sweep() drops
+# those, so memory follows the phones active in the last minute or two, not
+# every phone ever seen. RATE_LIMIT_BACKEND=sqlite keeps the buckets in
+# rate_limit_bucket instead, shared by every worker process.
+PHONE_PER_MIN = float(os.getenv('RATE_LIMIT_PHONE_PER_MIN', 10))
+PHONE_BURST = int(os.getenv('RATE_LIMIT_PHONE_BURST', 8))
+GLOBAL_PER_MIN = float(os.getenv('RATE_LIMIT_GLOBAL_PER_MIN', 300))
+GLOBAL_BURST = int(os.getenv('RATE_LIMIT_GLOBAL_BURST', 60))
+NOTICE_SECONDS = float(os.getenv('RATE_LIMIT_NOTICE_SECONDS', 300))
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+SWEEP_SECONDS = 60
+
+ALLOW, NOTICE, DROP = 'allow', 'notice', 'drop'
+
+SLOW_DOWN_REPLY = ("You're sending messages faster than I can keep up! 😅 "
+                   "Give me a minute, then send your message again. 🌿")
+BUSY_REPLY = ("We're helping a lot of neighbours right now! 🌿 "
+              "Please send your message again in a few minutes. 😊")
+
+class Limit:
+    def __init__(self, per_minute, burst):
+        self.interval = 60.0 / per_minute          # Seconds per token
+        self.tolerance = (burst - 1) * self.interval  # How far full_at may run ahead of now
+
+# ==============================================================================
+# 1. BACKENDS (take a token / claim the one canned reply)
+# ==============================================================================
+class MemoryBuckets:
+    def __init__(self):
+        self._full_at = {}       # key -> time the bucket is full again
+        self._notice_until = {}  # key -> end of its silent-drop period (limited keys only)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def take(self, key, limit, now):
+        with self._lock:
+            full_at = max(self._full_at.get(key, now), now)
+            if full_at - now > limit.tolerance:
+                return False
+            self._full_at[key] = full_at + limit.interval
+            return True
+
+    def claim_notice(self, key, now, seconds):
+        with self._lock:
+            if self._notice_until.get(key, 0.0) > now:
+                return False
+            self._notice_until[key] = now + seconds
+            return True
+
+    def sweep(self, now):
+        with self._lock:
+            if now < self._next_sweep:
+                return 0
+            self._next_sweep = now + SWEEP_SECONDS
+            full = [k for k, t in self._full_at.items() if t <= now]
+            for key in full:
+                del self._full_at[key]
+            for key in [k for k, t in self._notice_until.items() if t <= now]:
+                del self._notice_until[key]
+            return len(full)
+
+    def tracked(self):
+        return len(self._full_at)
+
+class SQLiteBuckets:
+    # Same maths as MemoryBuckets, one statement per take. Runs on its own
+    # connection so it never commits the caller's session.
+    def __init__(self):
+        self._next_sweep = 0.0
+
+    def take(self, key, limit, now):
+        full_at = func.max(RateLimitBucket.full_at, now)
+        stmt = sqlite_insert(RateLimitBucket).values(key=key, full_at=now + limit.interval, notice_until=0.0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'full_at': full_at + limit.interval},
+            where=full_at - now <= limit.tolerance
+        )
+        with db.engine.begin() as conn:
+            return conn.execute(stmt).rowcount == 1
+
+    def claim_notice(self, key, now, seconds):
+        with db.engine.begin() as conn:
+            conn.execute(sqlite_insert(RateLimitBucket).values(key=key, full_at=now, notice_until=0.0)
+                         .on_conflict_do_nothing(index_elements=['key']))
+            return conn.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.key == key, RateLimitBucket.notice_until <= now)
+                .values(notice_until=now + seconds)
+            ).rowcount == 1
+
+    def sweep(self, now):
+        if now < self._next_sweep:
+            return 0
+        self._next_sweep = now + SWEEP_SECONDS
+        with db.engine.begin() as conn:
+            return conn.execute(delete(RateLimitBucket).where(
+                RateLimitBucket.full_at <= now, RateLimitBucket.notice_until <= now)).rowcount
+
+    def tracked(self):
+        return db.session.query(func.count(RateLimitBucket.key)).scalar()
+
+# ==============================================================================
+# 2. LIMITER (Decisions + metrics)
+# ==============================================================================
+class RateLimiter:
+    def __init__(self, backend=None, phone_limit=None, global_limit=None,
+                 notice_seconds=NOTICE_SECONDS, clock=time.time):
+        if backend is None:
+            backend = SQLiteBuckets() if RATE_LIMIT_BACKEND == 'sqlite' else MemoryBuckets()
+        self.backend = backend
+        self.phone_limit = phone_limit or Limit(PHONE_PER_MIN, PHONE_BURST)
+        self.global_limit = global_limit or Limit(GLOBAL_PER_MIN, GLOBAL_BURST)
+        self.notice_seconds = notice_seconds
+        self.clock = clock
+        self.stats = {'allowed_messages': 0, 'allowed_turns': 0, 'phone_limited': 0,
+                      'global_limited': 0, 'notices': 0, 'dropped': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, *keys):
+        with self._stats_lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def _limited(self, phone, reason, now):
+        # First hit in the notice period gets the canned reply, the rest are dropped
+        if self.backend.claim_notice(f"notice:{phone}", now, self.notice_seconds):
+            self._count(reason, 'notices')
+            return NOTICE
+        self._count(reason, 'dropped')
+        return DROP
+
+    def check_message(self, phone):
+        # One token per inbound message from this phone
+        now = self.clock()
+        self.backend.sweep(now)
+        if self.backend.take(f"phone:{phone}", self.phone_limit, now):
+            self._count('allowed_messages')
+            return ALLOW
+        return self._limited(phone, 'phone_limited', now)
+
+    def check_turn(self, phone):
+        # One global token per AI turn (a coalesced burst is one turn)
+        now = self.clock()
+        if self.backend.take('global', self.global_limit, now):
+            self._count('allowed_turns')
+            return ALLOW
+        return self._limited(phone, 'global_limited', now)
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['tracked_phones'] = self.backend.tracked()
+        return stats
+
+limiter = RateLimiter()
@@ -0,0 +1,53 @@
+import json
+from datetime import timedelta
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, ConversationState, get_sg_time
+
+# ==============================================================================
+# CONVERSATION STATE MACHINE (PER PHONE, SHARED ACROSS WORKERS)
+# ==============================================================================
+# Replaces the process-local pending_alerts_dict. One small row per phone in
+# the conversation_state table, so a "YES" that lands on another worker (or
+# after a restart) still knows what it is answering.
+AWAITING_ALERT_CONFIRMATION = 'awaiting_alert_confirmation'  # payload: {"product": name}
+AWAITING_QUANTITY = 'awaiting_quantity'                      # payload: {"product": name}
+ORDER_SUMMARY_PENDING = 'order_summary_pending'              # payload: {"lines": [[name, qty], ...], "turn": id}
+ORDER_JUST_CONFIRMED = 'order_just_confirmed'                # payload: {"turn": id}
+
+STATE_TTL = {
+    AWAITING_ALERT_CONFIRMATION: timedelta(minutes=15),
+    AWAITING_QUANTITY: timedelta(minutes=30),
+    ORDER_SUMMARY_PENDING: timedelta(minutes=30),
+    ORDER_JUST_CONFIRMED: timedelta(minutes=5),  # Only a quick double "YES" is a repeat
+}
+
+def _now():
+    # Naive SGT timestamp: SQLite stores DateTime columns without tz info
+    return get_sg_time().replace(tzinfo=None)
+
+def get_state(phone):
+    row = db.session.get(ConversationState, str(phone))
+    if not row or row.expires_at < _now():
+        return None, {}
+    return row.state, json.loads(row.payload or '{}')
+
+def set_state(phone, state, payload=None):
+    now = _now()
+    values = {
+        'state': state,
+        'payload': json.dumps(payload or {}, separators=(',', ':')),
+        'expires_at': now + STATE_TTL[state],
+        'updated_at': now,
+    }
+    stmt = sqlite_insert(ConversationState).values(phone=str(phone), **values)
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['phone'], set_=values))
+    db.session.commit()
+
+def clear_state(phone):
+    ConversationState.query.filter_by(phone=str(phone)).delete()
+    db.session.commit()
+
+def purge_expired_states():
+    deleted = ConversationState.query.filter(ConversationState.expires_at < _now()).delete()
+    db.session.commit()
+    return deleted
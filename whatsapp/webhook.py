@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy.orm import joinedload
+from models import db, Customer
+
+# ==============================================================================
+# WEBHOOK PAYLOAD BATCHING
+# ==============================================================================
+# Meta can pack several entries -> changes -> messages into one POST (a backlog
+# after an outage arrives this way). Every message is extracted, duplicates are
+# dropped (within the payload and against recently seen ids), and the rest are
+# grouped per sender in the order they were sent. Customers for all senders
+# are loaded with one IN query.
+SEEN_MESSAGE_LIMIT = 10_000
+
+InboundMessage = namedtuple('InboundMessage', ['id', 'sender', 'type', 'text', 'timestamp', 'profile_name'])
+
+class SeenMessages:
+    # Recently handled message ids, oldest dropped first once the limit is hit
+    def __init__(self, limit=SEEN_MESSAGE_LIMIT):
+        self.limit = limit
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, msg_id):
+        # True the first time an id is seen, False for every redelivery
+        with self._lock:
+            if msg_id in self._ids:
+                return False
+            self._ids[msg_id] = True
+            while len(self._ids) > self.limit:
+                self._ids.popitem(last=False)
+            return True
+
+seen_messages = SeenMessages()
+
+def parse_timestamp(value):
+    # Meta sends epoch seconds as a string; anything unreadable sorts first
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def extract_messages(payload):
+    messages = []
+    for entry in (payload or {}).get('entry') or []:
+        for change in entry.get('changes') or []:
+            value = change.get('value') or {}
+            names = {c.get('wa_id'): (c.get('profile') or {}).get('name') for c in value.get('contacts') or []}
+            for msg in value.get('messages') or []:
+                if not msg.get('id') or not msg.get('from'):
+                    continue
+                text = (msg.get('text') or {}).get('body') if msg.get('type') == 'text' else None
+                messages.append(InboundMessage(
+                    id=msg['id'], sender=str(msg['from']), type=msg.get('type'), text=text,
+                    timestamp=parse_timestamp(msg.get('timestamp')), profile_name=names.get(msg['from'])
+                ))
+    return messages
+
+def group_by_sender(messages, seen=None):
+    # -> ({sender: [messages oldest first]}, duplicates dropped)
+    seen = seen or seen_messages
+    grouped, duplicates = OrderedDict(), 0
+    for msg in messages:
+        if not seen.claim(msg.id):
+            duplicates += 1
+            continue
+        grouped.setdefault(msg.sender, []).append(msg)
+    for batch in grouped.values():
+        batch.sort(key=lambda m: m.timestamp)  # Stable: same-second messages keep payload order
+    return grouped, duplicates
+
+def load_customers(phones):
+    # One query for every sender in the payload (leader joined: order replies name them)
+    if not phones:
+        return {}
+    rows = Customer.query.options(joinedload(Customer.leader))\
+        .filter(Customer.phone.in_([str(p) for p in phones])).all()
+    return {row.phone: row for row in rows}